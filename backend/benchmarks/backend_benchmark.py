@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from inference_engine import create_backend, load_config
+from preprocessing import IMAGE_EXTENSIONS, open_image
+
+
+def parse_spec(spec):
+    """
+    Turn a backend spec into a config
+
+    A spec is either a JSON config file or `backend[:model_path]`,
+    e.g. `tflite_int8:models/peacock_egg_classifier_int8.tflite`.
+    """
+    if spec.endswith('.json'):
+        return load_config(path=spec)
+    backend, _, model_path = spec.partition(':')
+    return load_config(backend=backend, model_path=model_path or None)
+
+
+def load_images(data_dir, limit):
+    """Decode sample images once; labels follow the sorted class subdirectories when present"""
+    class_names = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    entries = []
+    if class_names:
+        for label, class_name in enumerate(class_names):
+            class_path = os.path.join(data_dir, class_name)
+            entries.extend((os.path.join(class_path, f), label) for f in sorted(os.listdir(class_path))
+                           if f.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        entries = [(os.path.join(data_dir, f), None) for f in sorted(os.listdir(data_dir))
+                   if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+    # Spread the sample over all classes instead of taking only the first one
+    if len(entries) > limit:
+        indices = np.linspace(0, len(entries) - 1, limit).astype(int)
+        entries = [entries[i] for i in indices]
+
+    images = []
+    for path, _ in entries:
+        with open(path, 'rb') as f:
+            images.append(np.asarray(open_image(f.read(), fast=False)))
+    labels = [label for _, label in entries]
+    return images, (np.array(labels) if None not in labels else None)
+
+
+def benchmark_backend(config, images, batch_size, repeat):
+    """
+    Time one backend over the same images
+
+    Returns:
+        Tuple of (result dictionary, predicted probabilities)
+    """
+    start = time.perf_counter()
+    backend = create_backend(config)
+    backend.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    latencies = []
+    outputs = None
+    for _ in range(repeat):
+        run_outputs = []
+        for batch in batches:
+            batch_start = time.perf_counter()
+            run_outputs.append(backend.predict(batch))
+            latencies.append(time.perf_counter() - batch_start)
+        outputs = np.concatenate(run_outputs)
+
+    total = sum(latencies)
+    result = {
+        'backend': backend.describe(),
+        'load_s': load_seconds,
+        'images_per_s': len(images) * repeat / total,
+        'batch_ms_p50': float(np.percentile(latencies, 50) * 1000),
+        'batch_ms_p95': float(np.percentile(latencies, 95) * 1000)
+    }
+    return result, outputs
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare inference backends on the same images')
+    parser.add_argument('--backends', type=str, nargs='+', required=True,
+                        help='Backend specs: config.json files or backend[:model_path] (first one is the reference)')
+    parser.add_argument('--data_dir', type=str, default='dataset', help='Images, optionally in class subdirectories')
+    parser.add_argument('--limit', type=int, default=256, help='Maximum number of images')
+    parser.add_argument('--batch_size', type=int, default=16, help='Images per inference call')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the images per backend')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON output path')
+
+    args = parser.parse_args()
+
+    images, labels = load_images(args.data_dir, args.limit)
+    print(f"Loaded {len(images)} images from {args.data_dir}")
+
+    results = []
+    reference = None
+    for spec in args.backends:
+        result, outputs = benchmark_backend(parse_spec(spec), images, args.batch_size, args.repeat)
+        predicted = np.argmax(outputs, axis=1)
+        if reference is None:
+            reference = outputs
+        result['spec'] = spec
+        result['agreement'] = float(np.mean(predicted == np.argmax(reference, axis=1)))
+        result['max_prob_diff'] = float(np.abs(outputs - reference).max())
+        if labels is not None:
+            result['accuracy'] = float(np.mean(predicted == labels))
+        results.append(result)
+
+    print(f"\n{'='*92}")
+    print("Inference Backend Comparison")
+    print(f"{'='*92}")
+    print(f"{'backend':<36}{'img/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'load s':>8}{'agree':>8}{'accuracy':>10}")
+    for result in results:
+        accuracy = f"{result['accuracy']:.4f}" if 'accuracy' in result else '-'
+        print(f"{result['spec'][:35]:<36}{result['images_per_s']:>9.1f}{result['batch_ms_p50']:>9.2f}"
+              f"{result['batch_ms_p95']:>9.2f}{result['load_s']:>8.2f}{result['agreement']:>8.4f}{accuracy:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from generate_fingerprints_batch import generate_custom_hashes, generate_custom_hashes_batch, pack_custom_hashes
+from preprocessing import IMAGE_EXTENSIONS
+
+
+def legacy_custom_hashes(img_array):
+    """The previous string-building implementation, kept as the parity reference"""
+    if len(img_array.shape) == 3:
+        grayscale = np.mean(img_array, axis=2)
+    else:
+        grayscale = img_array
+
+    grayscale_flat = grayscale.flatten()
+    grayscale_256 = grayscale_flat[:256]
+    average = np.mean(grayscale_256)
+
+    phash = ''.join(['1' if grayscale_256[i] >= average else '0'
+                      for i in range(len(grayscale_256))])
+    dhash = ''.join(['1' if grayscale_256[i + 1] >= grayscale_256[i] else '0'
+                      for i in range(len(grayscale_256) - 1)])
+    ahash = ''.join(['1' if grayscale_256[i] >= 128 else '0'
+                      for i in range(len(grayscale_256))])
+
+    return {
+        'phash': phash.ljust(64, '0'),
+        'dhash': dhash.ljust(64, '0'),
+        'ahash': ahash.ljust(64, '0'),
+        'whash': '0' * 64
+    }
+
+
+def load_images(data_dir, limit):
+    """Sample images resized like generate_fingerprints_batch.py does"""
+    paths = []
+    for root, _, files in os.walk(data_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for path in sorted(paths)[:limit]:
+        with Image.open(path) as img:
+            images.append(np.array(img.resize((224, 224), Image.LANCZOS)))
+    return images
+
+
+def parity_cases(rng):
+    """Synthetic edge cases: modes, ties with the mean and 128, flat images, images under 64 pixels"""
+    cases = [
+        rng.integers(0, 256, (224, 224, 3), dtype=np.uint8),
+        rng.integers(0, 256, (224, 224, 4), dtype=np.uint8),
+        rng.integers(0, 256, (224, 224), dtype=np.uint8),
+        rng.integers(127, 130, (224, 224, 3), dtype=np.uint8),
+        np.full((224, 224, 3), 128, dtype=np.uint8),
+        np.zeros((224, 224), dtype=np.uint8),
+        rng.integers(0, 256, (5, 5, 3), dtype=np.uint8),
+        rng.integers(0, 256, (8, 40), dtype=np.uint8),
+        rng.integers(0, 256, (1, 1, 3), dtype=np.uint8)
+    ]
+    # Gradients make many pixels tie exactly with the mean
+    cases.append(np.tile(np.arange(224, dtype=np.uint8), (224, 1)))
+    cases.append(np.repeat(np.tile(np.arange(0, 256, 2, dtype=np.uint8)[:112].repeat(2), (224, 1))[..., None], 3, axis=2))
+    return cases
+
+
+def check_parity(images):
+    """
+    Compare the vectorized hashes with the legacy function
+
+    Returns:
+        Number of mismatching images
+    """
+    mismatches = 0
+    for image in images:
+        expected = legacy_custom_hashes(image)
+        single = generate_custom_hashes(image)
+        batched = generate_custom_hashes_batch(image[np.newaxis])[0]
+        packed = {
+            name: np.unpackbits(rows[0])[:n_bits]
+            for name, (rows, n_bits) in pack_custom_hashes(image[np.newaxis]).items()
+        }
+        packed_ok = all(
+            ''.join(map(str, packed[name])) == expected[name] for name in packed
+        )
+        if single != expected or batched != expected or not packed_ok:
+            mismatches += 1
+            print(f"  Mismatch for image of shape {image.shape}")
+
+    # Whole stacks must give the same results as one image at a time
+    by_shape = {}
+    for image in images:
+        by_shape.setdefault(image.shape, []).append(image)
+    for shape, group in by_shape.items():
+        if generate_custom_hashes_batch(np.stack(group)) != [legacy_custom_hashes(image) for image in group]:
+            mismatches += 1
+            print(f"  Stack mismatch for shape {shape}")
+    return mismatches
+
+
+def measure(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare the vectorized custom hashes with the legacy implementation')
+    parser.add_argument('--data_dir', type=str, default=None, help='Sample images (random pixels if omitted)')
+    parser.add_argument('--limit', type=int, default=256, help='Maximum number of sample images')
+    parser.add_argument('--iterations', type=int, default=5, help='Timed passes over the images')
+    parser.add_argument('--check', action='store_true', help='Only verify bit-for-bit parity with the legacy function')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.data_dir:
+        images = load_images(args.data_dir, args.limit)
+    else:
+        images = [rng.integers(0, 256, (224, 224, 3), dtype=np.uint8) for _ in range(args.limit)]
+
+    mismatches = check_parity(parity_cases(rng) + images)
+    print(f"Parity: {'OK' if mismatches == 0 else f'{mismatches} mismatches'} "
+          f"({len(images)} images + {len(parity_cases(rng))} edge cases)")
+    if args.check:
+        sys.exit(1 if mismatches else 0)
+
+    rgb = [image for image in images if image.shape == (224, 224, 3)]
+    stack = np.stack(rgb)
+    legacy = measure(lambda: [legacy_custom_hashes(image) for image in rgb], args.iterations)
+    single = measure(lambda: [generate_custom_hashes(image) for image in rgb], args.iterations)
+    batched = measure(lambda: generate_custom_hashes_batch(stack), args.iterations)
+    packed = measure(lambda: pack_custom_hashes(stack), args.iterations)
+
+    print(f"\n{'='*60}")
+    print(f"Custom hashes over {len(rgb)} RGB 224x224 images")
+    print(f"{'='*60}")
+    print(f"{'method':<28}{'ms/image':>12}{'images/sec':>14}{'speedup':>10}")
+    for name, seconds in (('legacy (strings)', legacy), ('vectorized, one at a time', single),
+                          ('vectorized stack', batched), ('vectorized stack, packed', packed)):
+        print(f"{name:<28}{seconds / len(rgb) * 1000:>12.4f}{len(rgb) / seconds:>14.0f}{legacy / seconds:>9.1f}x")
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import data_loader
+import tf_data_loader
+
+
+def keras_batches(generator):
+    for i in range(len(generator)):
+        yield generator[i]
+
+
+def images_per_second(batches, epochs):
+    """
+    Throughput of an input pipeline, iterated `epochs` times after one warm-up epoch
+
+    Args:
+        batches: Callable returning an iterator of (images, labels) batches for one epoch
+
+    Returns:
+        Images per second
+    """
+    for _ in batches():
+        pass
+    count = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for images, _ in batches():
+            count += len(images)
+    return count / (time.perf_counter() - start)
+
+
+def check(data_dir, img_size, batch_size, split_file):
+    """Both loaders must list the same files with the same labels, and give the same test images"""
+    ok = True
+    keras_subsets = data_loader.load_data(data_dir, img_size, batch_size, split_file=split_file)
+    tf_subsets = tf_data_loader.load_data(data_dir, img_size, batch_size, split_file=split_file)
+    for name, old, new in zip(('training', 'validation'), keras_subsets, tf_subsets):
+        same = (list(old.filenames) == new.filenames and np.array_equal(old.classes, new.classes)
+                and old.class_indices == new.class_indices)
+        print(f"{name}: same files, labels and class indices: {same}")
+        ok = ok and same
+
+    old = data_loader.load_test_data(data_dir, img_size, batch_size)
+    new = tf_data_loader.load_test_data(data_dir, img_size, batch_size)
+    same = list(old.filenames) == new.filenames and old.class_indices == new.class_indices
+    for (old_images, old_labels), (new_images, new_labels) in zip(keras_batches(old), new.dataset):
+        same = same and np.allclose(old_images, new_images.numpy()) and np.array_equal(old_labels, new_labels.numpy())
+    print(f"test: same files and pixels: {same}")
+    return ok and same
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Images per second of the ImageDataGenerator and tf.data loaders')
+    parser.add_argument('--data_dir', type=str, default='dataset', help='Path to dataset directory')
+    parser.add_argument('--batch_size', type=int, default=32, help='Batch size')
+    parser.add_argument('--img_size', type=int, nargs=2, default=[224, 224], help='Image size')
+    parser.add_argument('--epochs', type=int, default=2, help='Timed epochs per loader')
+    parser.add_argument('--split_file', type=str, default=None, help='Split from near_duplicates.py')
+    parser.add_argument('--check', action='store_true', help='Only verify that both loaders see the same data')
+
+    args = parser.parse_args()
+    img_size = tuple(args.img_size)
+
+    ok = check(args.data_dir, img_size, args.batch_size, args.split_file)
+    if args.check:
+        sys.exit(0 if ok else 1)
+
+    keras_train, _ = data_loader.load_data(args.data_dir, img_size, args.batch_size, split_file=args.split_file)
+    keras_test = data_loader.load_test_data(args.data_dir, img_size, args.batch_size)
+    loaders = [('ImageDataGenerator', lambda: keras_batches(keras_train), lambda: keras_batches(keras_test))]
+    for name, options in (('tf.data', {}), ('tf.data cache', {'cache': ''}),
+                          ('tf.data fast_decode', {'fast_decode': True})):
+        train, _ = tf_data_loader.load_data(args.data_dir, img_size, args.batch_size, split_file=args.split_file,
+                                            **options)
+        test = tf_data_loader.load_test_data(args.data_dir, img_size, args.batch_size,
+                                             fast_decode=options.get('fast_decode', False))
+        loaders.append((name, lambda train=train: iter(train.dataset), lambda test=test: iter(test.dataset)))
+
+    print(f"\n{'='*60}")
+    print(f"Input Pipeline Throughput ({os.cpu_count()} CPUs, batch {args.batch_size}, {img_size[0]}x{img_size[1]})")
+    print(f"{'='*60}")
+    print(f"{'loader':<22}{'train img/s':>14}{'test img/s':>14}")
+    for name, train, test in loaders:
+        train_rate = images_per_second(train, args.epochs)
+        test_rate = images_per_second(test, args.epochs)
+        print(f"{name:<22}{train_rate:>14.1f}{test_rate:>14.1f}")
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fingerprint_matcher import FingerprintMatcher
+from fingerprint_stream import FingerprintReader, FingerprintWriter
+
+METADATA = {
+    'version': '2.0',
+    'generated_at': '2026-01-01T00:00:00',
+    'total_images': 0,
+    'threshold': 0.99,
+    'algorithm': 'custom-mirroring-frontend'
+}
+
+
+def synthetic_entries(size, seed):
+    """Entries shaped like generate_fingerprints_batch.py output, produced lazily"""
+    rng = np.random.default_rng(seed)
+    for i in range(size):
+        bits = (rng.integers(0, 2, 767, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+        class_name = 'fertile' if i % 3 else 'infertile'
+        yield {
+            'filename': f"{class_name}/egg_{i:07d}.jpg",
+            'class': class_name,
+            'original_filename': f"egg_{i:07d}.jpg",
+            'width': 1024,
+            'height': 768,
+            'hashes': {'phash': bits[:256], 'dhash': bits[256:511], 'ahash': bits[511:], 'whash': '0' * 64}
+        }
+
+
+def profile(fn):
+    """Run fn twice; returns (seconds, peak traced memory in MB), timed without tracing"""
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def write_json(path, size, seed):
+    database = {'metadata': {**METADATA, 'total_images': size}, 'images': list(synthetic_entries(size, seed))}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(database, f, indent=2)
+
+
+def write_stream(path, size, seed):
+    writer = FingerprintWriter(path, METADATA)
+    for entry in synthetic_entries(size, seed):
+        writer.write(entry)
+    writer.close()
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return len(json.load(f)['images'])
+
+
+def read_stream(path):
+    return sum(1 for _ in FingerprintReader(path))
+
+
+def matcher_json(path):
+    with open(path, encoding='utf-8') as f:
+        return len(FingerprintMatcher(json.load(f)))
+
+
+def matcher_stream(path):
+    return len(FingerprintMatcher.from_json(path))
+
+
+def check(work_dir, size, seed):
+    """The streamed file must parse to the same database json.dump writes"""
+    dumped = os.path.join(work_dir, 'check_dump.json')
+    streamed = os.path.join(work_dir, 'check_stream.json')
+    write_json(dumped, size, seed)
+    write_stream(streamed, size, seed)
+    with open(dumped, encoding='utf-8') as f:
+        expected = json.load(f)
+    with open(streamed, encoding='utf-8') as f:
+        same_file = json.load(f) == expected
+    reader = FingerprintReader(dumped, chunk_size=4096)
+    same_reader = reader.metadata == expected['metadata'] and list(reader) == expected['images']
+    print(f"Streamed file equals json.dump output: {same_file}")
+    print(f"Reader equals json.load: {same_reader}")
+    return same_file and same_reader
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Memory and time of streamed vs whole-file fingerprint JSON')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000], help='Database sizes')
+    parser.add_argument('--check', action='store_true', help='Only verify that both paths give the same database')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        ok = check(work_dir, 2000, args.seed)
+        if args.check:
+            sys.exit(0 if ok else 1)
+
+        print(f"\n{'entries':>9} {'operation':<18}{'json (s)':>10}{'json MB':>10}{'stream (s)':>12}{'stream MB':>11}")
+        for size in args.sizes:
+            dumped = os.path.join(work_dir, f'dump_{size}.json')
+            streamed = os.path.join(work_dir, f'stream_{size}.json')
+            rows = [
+                ('write', lambda: write_json(dumped, size, args.seed), lambda: write_stream(streamed, size, args.seed)),
+                ('read', lambda: read_json(dumped), lambda: read_stream(streamed)),
+                ('FingerprintMatcher', lambda: matcher_json(dumped), lambda: matcher_stream(streamed))
+            ]
+            for name, whole, stream in rows:
+                whole_s, whole_mb = profile(whole)
+                stream_s, stream_mb = profile(stream)
+                print(f"{size:>9} {name:<18}{whole_s:>10.2f}{whole_mb:>10.1f}{stream_s:>12.2f}{stream_mb:>11.1f}")
+            os.remove(dumped)
+            os.remove(streamed)
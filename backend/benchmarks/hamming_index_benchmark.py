@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fingerprint_matcher import prefix_mask
+from hamming_index import HammingIndex
+
+
+def flip_bits(codes, n_bits, flips, rng):
+    """Copy of `codes` with `flips` random bits (below n_bits) inverted in every row"""
+    bits = np.unpackbits(codes.view(np.uint8), axis=1)
+    rows = np.repeat(np.arange(len(codes)), flips)
+    columns = np.concatenate([rng.choice(n_bits, flips, replace=False) for _ in range(len(codes))])
+    bits[rows, columns] ^= 1
+    return np.packbits(bits, axis=1).view(np.uint64)
+
+
+def synthetic_codes(size, n_bits, group_size, noise, rng):
+    """
+    Fingerprint-like codes: groups of `group_size` near-duplicates
+
+    Photos of the same egg hash close to each other, unrelated photos are
+    about n_bits / 2 apart; random group centers with `noise` flipped bits
+    per member reproduce that.
+    """
+    n_words = (n_bits + 63) // 64
+    centers = rng.integers(0, 2**64, size=((size + group_size - 1) // group_size, n_words), dtype=np.uint64)
+    if n_bits % 64:
+        centers &= prefix_mask(n_bits, n_bits)
+    return flip_bits(np.repeat(centers, group_size, axis=0)[:size], n_bits, noise, rng)
+
+
+def timed(fn, queries):
+    """Run fn on every query; returns results and per-query latencies in ms"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def benchmark_size(size, n_bits, queries, radius, k, group_size, noise, query_noise, rng):
+    codes = synthetic_codes(size, n_bits, group_size, noise, rng)
+    query_codes = flip_bits(codes[rng.integers(0, size, queries)], n_bits, query_noise, rng)
+
+    start = time.perf_counter()
+    # Measure the tables even where the index would pick a linear scan itself
+    index = HammingIndex(n_bits, linear_size=0)
+    index.add(codes)
+    index.merge()
+    build_s = time.perf_counter() - start
+
+    radius_index, radius_index_ms = timed(lambda q: index.radius_search(q, radius), query_codes)
+    radius_linear, radius_linear_ms = timed(lambda q: index.linear_radius_search(q, radius), query_codes)
+    knn_index, knn_index_ms = timed(lambda q: index.knn(q, k), query_codes)
+    knn_linear, knn_linear_ms = timed(lambda q: index.linear_knn(q, k), query_codes)
+
+    exact = all(
+        np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+        for a, b in zip(radius_index + knn_index, radius_linear + knn_linear)
+    )
+    return {
+        'size': size,
+        'build_s': build_s,
+        'radius_index_ms': float(np.mean(radius_index_ms)),
+        'radius_linear_ms': float(np.mean(radius_linear_ms)),
+        'radius_p95_ms': float(np.percentile(radius_index_ms, 95)),
+        'radius_hits': float(np.mean([len(r[0]) for r in radius_index])),
+        'knn_index_ms': float(np.mean(knn_index_ms)),
+        'knn_linear_ms': float(np.mean(knn_linear_ms)),
+        'knn_p95_ms': float(np.percentile(knn_index_ms, 95)),
+        'exact': exact
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Compare Hamming index queries with a linear scan')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='Database sizes')
+    parser.add_argument('--bits', type=int, default=256, help='Code length (phash/ahash 256, dhash 255)')
+    parser.add_argument('--queries', type=int, default=100, help='Queries per size')
+    parser.add_argument('--radius', type=int, default=16, help='Radius of the radius queries')
+    parser.add_argument('--k', type=int, default=5, help='Neighbors of the k-NN queries')
+    parser.add_argument('--group_size', type=int, default=4, help='Near-duplicates per synthetic image')
+    parser.add_argument('--noise', type=int, default=6, help='Bits flipped between near-duplicates and their group center')
+    parser.add_argument('--query_noise', type=int, default=6, help='Bits flipped between a query and the entry it came from')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON output path')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for size in args.sizes:
+        results.append(benchmark_size(size, args.bits, args.queries, args.radius, args.k,
+                                      args.group_size, args.noise, args.query_noise, rng))
+        print(f"{size} entries done")
+
+    print(f"\n{'='*96}")
+    print(f"Hamming index vs linear scan ({args.bits} bits, radius {args.radius}, k {args.k}, mean ms per query)")
+    print(f"{'='*96}")
+    print(f"{'entries':>9}{'build s':>9}{'radius':>9}{'linear':>9}{'speedup':>9}{'p95':>8}"
+          f"{'k-NN':>9}{'linear':>9}{'speedup':>9}{'p95':>8}{'exact':>8}")
+    for r in results:
+        print(f"{r['size']:>9}{r['build_s']:>9.2f}{r['radius_index_ms']:>9.3f}{r['radius_linear_ms']:>9.3f}"
+              f"{r['radius_linear_ms'] / r['radius_index_ms']:>8.1f}x{r['radius_p95_ms']:>8.3f}"
+              f"{r['knn_index_ms']:>9.3f}{r['knn_linear_ms']:>9.3f}"
+              f"{r['knn_linear_ms'] / r['knn_index_ms']:>8.1f}x{r['knn_p95_ms']:>8.3f}{str(r['exact']):>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -0,0 +1,298 @@
+import http.client
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+WEB_API_DIR = os.path.join(BACKEND_DIR, '..', 'web', 'api')
+sys.path.append(os.path.join(BACKEND_DIR, 'src'))
+
+from preprocessing import IMAGE_EXTENSIONS
+from process_stats import memory_usage
+
+# Serves the Vercel function through the stdlib HTTP server it is written
+# against; one request at a time, like a single function instance
+WEB_SERVER_SCRIPT = '''
+import sys
+from http.server import HTTPServer
+sys.path.insert(0, {api_dir!r})
+import predict
+if {model_path!r}:
+    predict.MODEL_PATH = {model_path!r}
+HTTPServer(("127.0.0.1", {port}), predict.handler).serve_forever()
+'''
+
+
+def load_images(data_dir, limit):
+    """Read up to `limit` sample images (searched recursively) into memory"""
+    paths = []
+    for root, _, files in os.walk(data_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for path in sorted(paths)[:limit]:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def encode_request(target, filename, contents):
+    """Body and headers of one predict request for the given target"""
+    if target == 'web':
+        return contents, {'Content-Type': 'image/jpeg' if filename.lower().endswith(('.jpg', '.jpeg')) else 'image/png'}
+    boundary = 'load-test-boundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + contents + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def start_server(target, port, model_path=None, workers=1, env=None):
+    """Start the backend (main.py) or the web handler on `port` and wait until it answers"""
+    env = dict(os.environ, **(env or {}))
+    if target == 'web':
+        script = WEB_SERVER_SCRIPT.format(api_dir=os.path.abspath(WEB_API_DIR), model_path=model_path, port=port)
+        command, cwd = [sys.executable, '-c', script], None
+        ready_url = f'http://127.0.0.1:{port}/api/predict'
+    else:
+        if model_path:
+            env['MODEL_PATH'] = model_path
+        command = [sys.executable, 'main.py', '--port', str(port), '--workers', str(workers)]
+        cwd = BACKEND_DIR
+        ready_url = f'http://127.0.0.1:{port}/health'
+
+    server = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(ready_url, timeout=1) as response:
+                if target == 'web' or json.load(response).get('model_loaded'):
+                    return server
+        except OSError:
+            pass
+        time.sleep(0.25)
+    stop_server(server)
+    raise RuntimeError("Server did not become ready")
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def process_tree_rss_kb(pid):
+    """RSS of `pid` plus its direct children (uvicorn workers)"""
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return sum(memory_usage(p)['rss_kb'] or 0 for p in pids)
+
+
+class RssSampler(threading.Thread):
+    """Sample the server's RSS in the background and keep the peak"""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self.last_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.last_kb = process_tree_rss_kb(self.pid)
+            self.peak_kb = max(self.peak_kb, self.last_kb)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_load(url, target, images, concurrency, requests, rate=None, timeout=60):
+    """
+    Replay `images` against `url` and collect per-request latencies
+
+    Without `rate` the test is closed-loop: each of the `concurrency`
+    connections sends its next request as soon as the previous one returns.
+    With `rate` (requests/second) requests are scheduled on a fixed timetable
+    and latency is measured from the scheduled send time, so queueing inside
+    the client (all connections busy) is counted instead of hidden.
+
+    Returns:
+        Dictionary with throughput, latency percentiles and error counts
+    """
+    parsed = urllib.parse.urlsplit(url)
+    bodies = [encode_request(target, filename, contents) for filename, contents in images]
+    work = queue.Queue()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+        while True:
+            job = work.get()
+            if job is None:
+                break
+            index, scheduled = job
+            body, headers = bodies[index % len(bodies)]
+            start = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                connection.request('POST', parsed.path, body=body, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()
+                failed = response.status != 200 or b'"error"' in payload
+                error = f'HTTP {response.status}' if response.status != 200 else 'error in response'
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+                failed, error = True, type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if failed:
+                    errors.append(error)
+        connection.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    for index in range(requests):
+        scheduled = None
+        if rate:
+            scheduled = start + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        work.put((index, scheduled))
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000.0
+    error_counts = {}
+    for error in errors:
+        error_counts[error] = error_counts.get(error, 0) + 1
+    return {
+        'concurrency': concurrency,
+        'target_rate': rate,
+        'requests': requests,
+        'duration_s': duration,
+        'throughput_rps': requests / duration,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(latencies_ms.max()),
+        'error_rate': len(errors) / requests,
+        'errors': error_counts
+    }
+
+
+def print_table(results):
+    print(f"\n{'='*98}")
+    print("Load Test")
+    print(f"{'='*98}")
+    print(f"{'conc':>5}{'rate':>8}{'reqs':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'errors':>8}{'RSS MB':>9}{'peak MB':>9}")
+    for result in results:
+        rate = f"{result['target_rate']:.0f}" if result['target_rate'] else 'max'
+        rss = result.get('server_rss_mb')
+        peak = result.get('server_peak_rss_mb')
+        print(f"{result['concurrency']:>5}{rate:>8}{result['requests']:>7}{result['throughput_rps']:>9.1f}"
+              f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['max_ms']:>9.1f}"
+              f"{result['error_rate']:>8.1%}{rss if rss is not None else float('nan'):>9.1f}"
+              f"{peak if peak is not None else float('nan'):>9.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay sample images against the prediction API and measure it under load')
+    parser.add_argument('--target', type=str, default='backend', choices=['backend', 'web'],
+                        help='backend: FastAPI main.py; web: the Vercel handler in web/api/predict.py')
+    parser.add_argument('--url', type=str, default=None,
+                        help='Use an already running server instead of starting one (no RSS unless --server_pid)')
+    parser.add_argument('--server_pid', type=int, default=None, help='PID of the server given by --url, for RSS')
+    parser.add_argument('--data_dir', type=str, default='dataset', help='Directory of sample images (searched recursively)')
+    parser.add_argument('--limit', type=int, default=100, help='Maximum number of distinct sample images')
+    parser.add_argument('--model_path', type=str, default=None, help='Model served by the started server')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes of the started backend')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrent connections (one run each)')
+    parser.add_argument('--rate', type=float, default=None, help='Target requests/second (default: as fast as possible)')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per run')
+    parser.add_argument('--warmup', type=int, default=20, help='Requests sent before each run and not measured')
+    parser.add_argument('--keep_cache', action='store_true', help='Leave the prediction cache enabled on the started server')
+    parser.add_argument('--port', type=int, default=8766, help='Port of the started server')
+    parser.add_argument('--json', action='store_true', help='Also print the results as JSON')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON output path')
+
+    args = parser.parse_args()
+
+    images = load_images(args.data_dir, args.limit)
+    if not images:
+        sys.exit(f"No images found in {args.data_dir}")
+
+    server = None
+    server_pid = args.server_pid
+    url = args.url
+    if url is None:
+        # Repeated images would otherwise be answered from the cache
+        env = {} if args.keep_cache else {'PREDICTION_CACHE_ENTRIES': '0'}
+        model_path = os.path.abspath(args.model_path) if args.model_path else None
+        server = start_server(args.target, args.port, model_path=model_path, workers=args.workers, env=env)
+        server_pid = server.pid
+        url = f'http://127.0.0.1:{args.port}/api/predict'
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            if args.warmup:
+                run_load(url, args.target, images, concurrency, args.warmup)
+            sampler = RssSampler(server_pid) if server_pid else None
+            if sampler:
+                sampler.start()
+            result = run_load(url, args.target, images, concurrency, args.requests, rate=args.rate)
+            if sampler:
+                sampler.stop()
+                result['server_rss_mb'] = sampler.last_kb / 1024
+                result['server_peak_rss_mb'] = sampler.peak_kb / 1024
+            result['target'] = args.target
+            results.append(result)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    print_table(results)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
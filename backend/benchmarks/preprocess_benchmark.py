@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from preprocessing import preprocess_image, write_input_tensor
+from runtime import create_interpreter
+
+
+def legacy_path(interpreter, image):
+    """float32 array, /255, expand_dims, then set_tensor copies it again"""
+    input_data = preprocess_image(image)
+    interpreter.set_tensor(interpreter.get_input_details()[0]['index'], input_data)
+
+
+def zero_copy_path(interpreter, image):
+    """uint8 pixels written and normalized directly into the input tensor"""
+    write_input_tensor(interpreter, [np.asarray(image, dtype=np.uint8)])
+
+
+def measure(fn, interpreter, image, iterations):
+    """
+    Measure one preprocessing path
+
+    Returns:
+        Dictionary with per-request peak traced memory and latency
+    """
+    fn(interpreter, image)
+
+    # numpy reports its buffers to tracemalloc, so the peak is the sum of the
+    # temporaries alive at the same time while preparing one request
+    peaks = []
+    for _ in range(iterations):
+        tracemalloc.start()
+        fn(interpreter, image)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(interpreter, image)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'peak_kb': float(np.median(peaks)) / 1024,
+        'latency_us': elapsed / iterations * 1e6
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare allocations of legacy and zero-copy preprocessing')
+    parser.add_argument('--model_path', type=str, default='models/peacock_egg_classifier.tflite', help='TFLite model')
+    parser.add_argument('--image', type=str, default=None, help='Sample image (random pixels if omitted)')
+    parser.add_argument('--iterations', type=int, default=200, help='Iterations per path')
+
+    args = parser.parse_args()
+
+    interpreter = create_interpreter(model_path=args.model_path)
+    input_details = interpreter.get_input_details()[0]
+
+    if args.image:
+        image = Image.open(args.image).convert("RGB").resize((224, 224))
+    else:
+        pixels = np.random.default_rng(0).integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels)
+
+    paths = [('zero-copy', zero_copy_path)]
+    if input_details['dtype'] == np.float32:
+        paths.insert(0, ('legacy', legacy_path))
+
+    print(f"\n{'='*60}")
+    print(f"Preprocessing Allocations ({input_details['dtype'].__name__} input)")
+    print(f"{'='*60}")
+    print(f"{'path':<12}{'peak KB/request':>18}{'latency us':>14}")
+    for name, fn in paths:
+        result = measure(fn, interpreter, image, args.iterations)
+        print(f"{name:<12}{result['peak_kb']:>18.1f}{result['latency_us']:>14.1f}")
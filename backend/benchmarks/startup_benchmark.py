@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.append(SRC_DIR)
+
+from runtime import RUNTIMES
+
+# Runs in a fresh interpreter so every runtime starts from a cold import
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.append({src_dir!r})
+from process_stats import memory_usage
+from runtime import get_interpreter_class, create_interpreter, warm_up
+try:
+    get_interpreter_class({runtime!r})
+except ImportError as e:
+    print(json.dumps({{"available": False, "error": str(e)}}))
+    sys.exit(0)
+imported = time.perf_counter()
+interpreter = create_interpreter(model_path={model_path!r}, runtime={runtime!r})
+loaded = time.perf_counter()
+warm_up(interpreter)
+warmed = time.perf_counter()
+memory = memory_usage()
+print(json.dumps({{
+    "available": True,
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "warmup_s": warmed - loaded,
+    "rss_mb": memory["rss_kb"] / 1024 if memory["rss_kb"] else None,
+    "peak_rss_mb": memory["peak_rss_kb"] / 1024 if memory["peak_rss_kb"] else None
+}}))
+'''
+
+
+def measure_runtime(runtime, model_path):
+    """
+    Cold-start one runtime in a subprocess
+
+    Returns:
+        Dictionary with import/load/warm-up seconds, process wall time and RSS
+    """
+    script = CHILD_SCRIPT.format(src_dir=SRC_DIR, runtime=runtime, model_path=model_path)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        return {'runtime': runtime, 'available': True, 'error': completed.stderr.strip().splitlines()[-1]}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['runtime'] = runtime
+    if result['available']:
+        result['cold_start_s'] = wall
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure cold-start time and RSS for each TFLite runtime')
+    parser.add_argument('--model_path', type=str, default='models/peacock_egg_classifier.tflite', help='TFLite model')
+    parser.add_argument('--runtimes', type=str, nargs='+', default=list(RUNTIMES), help='Runtimes to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='Cold starts per runtime (best is reported)')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON output path')
+
+    args = parser.parse_args()
+    model_path = os.path.abspath(args.model_path)
+
+    results = []
+    for runtime in args.runtimes:
+        runs = [measure_runtime(runtime, model_path) for _ in range(args.repeat)]
+        ok = [run for run in runs if run.get('available') and 'error' not in run]
+        results.append(min(ok, key=lambda run: run['cold_start_s']) if ok else runs[0])
+
+    print(f"\n{'='*76}")
+    print("Runtime Cold Start")
+    print(f"{'='*76}")
+    print(f"{'runtime':<16}{'cold start s':>14}{'import s':>11}{'load s':>9}{'warm-up s':>11}{'RSS MB':>9}")
+    for result in results:
+        if not result.get('available'):
+            print(f"{result['runtime']:<16}{'not installed':>14}")
+        elif 'error' in result:
+            print(f"{result['runtime']:<16}  error: {result['error']}")
+        else:
+            print(f"{result['runtime']:<16}{result['cold_start_s']:>14.2f}{result['import_s']:>11.2f}"
+                  f"{result['load_s']:>9.3f}{result['warmup_s']:>11.3f}{result['rss_mb'] or 0:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -0,0 +1,149 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(BACKEND_DIR, 'src'))
+
+from process_stats import mapped_file_usage, memory_usage
+
+
+def child_pids(pid):
+    """Direct children of `pid`, found by scanning /proc"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; ppid follows the closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if json.load(response).get('model_loaded'):
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def post_image(url, contents):
+    boundary = 'worker-memory-benchmark'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="image.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + contents + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+def measure_workers(workers, model_path, port, image=None, requests=0, timeout=120):
+    """
+    Start `main.py` with `workers` processes and measure each worker's memory
+
+    Worker processes are the server's children that map the model file (or
+    the server itself when running a single process).
+
+    Returns:
+        Dictionary with per-worker memory and the summed RSS/PSS in MB
+    """
+    env = dict(os.environ, MODEL_PATH=model_path, PREDICTION_CACHE_ENTRIES='0')
+    server = subprocess.Popen(
+        [sys.executable, 'main.py', '--workers', str(workers), '--port', str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        if not wait_until_ready(f'{base_url}/health', timeout):
+            return {'workers': workers, 'error': 'server did not become ready'}
+        # Every worker loads its pool in its own startup; give the others time to finish
+        time.sleep(2.0)
+
+        if image:
+            with open(image, 'rb') as f:
+                contents = f.read()
+            for _ in range(requests):
+                post_image(f'{base_url}/api/predict', contents)
+
+        pids = [server.pid] if workers == 1 else child_pids(server.pid)
+        per_worker = []
+        for pid in pids:
+            model = mapped_file_usage(model_path, pid)
+            if model is None:
+                continue
+            memory = memory_usage(pid)
+            per_worker.append({
+                'pid': pid,
+                'rss_mb': memory['rss_kb'] / 1024,
+                'rss_anon_mb': memory['rss_anon_kb'] / 1024,
+                'rss_file_mb': memory['rss_file_kb'] / 1024,
+                'pss_mb': memory['pss_kb'] / 1024 if memory['pss_kb'] is not None else None,
+                'model_rss_mb': model['rss_kb'] / 1024,
+                'model_pss_mb': model['pss_kb'] / 1024
+            })
+
+        return {
+            'workers': workers,
+            'per_worker': per_worker,
+            'total_rss_mb': sum(w['rss_mb'] for w in per_worker),
+            'total_pss_mb': sum(w['pss_mb'] or 0 for w in per_worker),
+            'model_file_mb': os.path.getsize(model_path) / (1024 * 1024)
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure per-worker memory of the multi-process API server')
+    parser.add_argument('--model_path', type=str, default='models/peacock_egg_classifier.tflite', help='TFLite model')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker counts to measure')
+    parser.add_argument('--image', type=str, default=None, help='Optional image posted before measuring')
+    parser.add_argument('--requests', type=int, default=20, help='Predictions sent per run when --image is given')
+    parser.add_argument('--port', type=int, default=8765, help='Port used by the benchmarked server')
+    parser.add_argument('--output', type=str, default=None, help='Optional JSON output path')
+
+    args = parser.parse_args()
+    model_path = os.path.abspath(args.model_path)
+    image = os.path.abspath(args.image) if args.image else None
+
+    results = [measure_workers(n, model_path, args.port, image=image, requests=args.requests) for n in args.workers]
+
+    print(f"\n{'='*84}")
+    print("Worker Memory")
+    print(f"{'='*84}")
+    print(f"{'workers':<9}{'pid':>8}{'RSS MB':>9}{'anon MB':>9}{'file MB':>9}{'PSS MB':>9}{'model RSS':>11}{'model PSS':>11}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['workers']:<9}  error: {result['error']}")
+            continue
+        for worker in result['per_worker']:
+            print(f"{result['workers']:<9}{worker['pid']:>8}{worker['rss_mb']:>9.1f}{worker['rss_anon_mb']:>9.1f}"
+                  f"{worker['rss_file_mb']:>9.1f}{worker['pss_mb'] or 0:>9.1f}{worker['model_rss_mb']:>11.2f}{worker['model_pss_mb']:>11.2f}")
+        print(f"{'':<9}{'total':>8}{result['total_rss_mb']:>9.1f}{'':>18}{result['total_pss_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
@@ -1,13 +1,79 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
+from fastapi.responses import Response, StreamingResponse
 import numpy as np
-import tensorflow as tf
+import asyncio
 import io
-from typing import Dict
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from admission import AdmissionController, AdmissionMiddleware
+from deployment import ModelRouter
+from fingerprint_matcher import FingerprintMatcher, InvalidQuery
+from generate_fingerprints_batch import compute_hashes, decode_for_hashing
+from inference_engine import load_config, model_version as compute_model_version
+from metrics import MetricsRegistry
+from job_queue import JobStore, list_job_images
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from preprocessing import IMAGE_EXTENSIONS, open_image
+from process_stats import mapped_file_usage, memory_usage
+
+# Backend, model path, threads and XNNPACK come from INFERENCE_CONFIG / INFERENCE_BACKEND / MODEL_PATH
+INFERENCE = load_config()
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+# Worker processes share the memory-mapped model; the cores are split between their pools
+WORKERS = int(os.environ.get("WORKERS", "1"))
+INTERPRETER_POOL_SIZE = int(os.environ.get("INTERPRETER_POOL_SIZE", "0")) or max(1, (os.cpu_count() or 1) // WORKERS)
+FAST_DECODE = os.environ.get("FAST_DECODE", "1") != "0"
+PREDICTION_CACHE_ENTRIES = int(os.environ.get("PREDICTION_CACHE_ENTRIES", "4096"))
+PREDICTION_CACHE_BYTES = int(os.environ.get("PREDICTION_CACHE_BYTES", str(8 * 1024 * 1024)))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+# Versioned models and traffic split; without a registry MODEL_PATH is served directly
+MODEL_REGISTRY = os.environ.get("MODEL_REGISTRY")
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", "5"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Offline classification jobs: SQLite queue, worker count, and the directory jobs may read from
+JOB_DB = os.environ.get("JOB_DB", "jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_ROOT = os.path.realpath(os.environ.get("JOB_ROOT", "."))
+# Fingerprint database served by /api/match
+FINGERPRINT_DB = os.environ.get(
+    "FINGERPRINT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "web", "public", "dataset_fingerprints.json")
+)
+# Admission control for the predict endpoints: requests in progress, requests
+# waiting for a slot, longest wait, and the Retry-After sent when refusing
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "0")) or 2 * BATCH_MAX_SIZE * INTERPRETER_POOL_SIZE
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", str(4 * ADMISSION_MAX_CONCURRENT)))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10")) or None
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "1"))
 
 app = FastAPI(title="Peacock Egg Detector API")
 
+admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    retry_after=ADMISSION_RETRY_AFTER
+)
+# Added before CORS so refusals still carry the CORS headers
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths={"/api/predict": "predict", "/api/predict/batch": "predict_batch", "/api/match": "match"},
+    on_admit=lambda endpoint, waited: ADMISSION_WAIT_SECONDS.observe(waited, endpoint=endpoint),
+    on_reject=lambda endpoint, reason: record_rejection(endpoint, reason)
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -16,28 +82,327 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-model = None
+router = None
+registry = ModelRegistry(MODEL_REGISTRY) if MODEL_REGISTRY else None
+watch_task = None
+matcher = None
+jobs = None
+job_tasks = []
+job_wakeup = None
+cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_ENTRIES,
+    max_bytes=PREDICTION_CACHE_BYTES,
+    ttl_seconds=PREDICTION_CACHE_TTL
+)
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter("peacock_requests_total", "Predictions served, by endpoint, outcome and model version",
+                           ("endpoint", "outcome", "model_version"))
+ERRORS = metrics.counter("peacock_errors_total", "Predictions that failed, by endpoint and model version",
+                         ("endpoint", "model_version"))
+REQUEST_SECONDS = metrics.histogram("peacock_request_duration_seconds", "End-to-end prediction latency",
+                                    ("endpoint", "model_version"))
+STAGE_SECONDS = metrics.histogram("peacock_stage_duration_seconds", "Time spent in each request stage",
+                                  ("stage", "model_version"))
+BATCH_SIZE = metrics.histogram("peacock_batch_size", "Images per interpreter invocation", ("model_version",),
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+metrics.gauge("peacock_model_info", "Deployed model versions, valued by their share of traffic", ("version",),
+              callback=lambda: {(version,): weight for version, weight in router.weights.items()} if router else {})
+metrics.gauge("peacock_interpreters_in_use", "Interpreters currently checked out of the pool, by model version",
+              ("model_version",),
+              callback=lambda: {(version,): deployment.pool.stats()['in_use']
+                                for version, deployment in router.deployments.items()} if router else {})
+metrics.counter("peacock_cache_hits_total", "Prediction cache hits", callback=lambda: cache.hits)
+metrics.counter("peacock_cache_misses_total", "Prediction cache misses", callback=lambda: cache.misses)
+metrics.gauge("peacock_cache_entries", "Entries in the prediction cache", callback=lambda: cache.stats()['entries'])
+ADMISSION_WAIT_SECONDS = metrics.histogram("peacock_admission_wait_seconds",
+                                           "Time requests waited in the admission queue", ("endpoint",))
+ADMISSION_REJECTED = metrics.counter("peacock_admission_rejected_total", "Requests refused with 503, by reason",
+                                     ("endpoint", "reason"))
+metrics.gauge("peacock_admission_active", "Requests admitted and in progress", callback=lambda: admission.active)
+metrics.gauge("peacock_admission_waiting", "Requests waiting in the admission queue", callback=lambda: admission.waiting)
+# Counted by metrics_endpoint in the executor: pending_items is a SQLite query under the store lock
+JOB_ITEMS_PENDING = metrics.gauge("peacock_job_items_pending", "Job items waiting or running in the offline queue")
+JOB_ITEMS_PENDING.set(0)
+# Sampled by metrics_endpoint in the executor: reading /proc/self/smaps takes milliseconds
+metrics.gauge("peacock_process_memory_bytes", "Resident memory of this worker process, by kind", ("pid", "kind"),
+              callback=lambda: memory_samples)
+
+# Decode and inference both run here so the event loop never blocks on them
+executor = ThreadPoolExecutor(max_workers=2 * INTERPRETER_POOL_SIZE, thread_name_prefix="inference")
+
+_model_file_versions = {}
+memory_samples = {}
+
+def model_targets() -> Dict:
+    """
+    Versions that should be serving, as {version: (config, weight, metadata)}
 
-def load_model():
-    global model
-    model_path = "models/peacock_egg_classifier.tflite"
+    With MODEL_REGISTRY set this follows the registry's traffic split;
+    otherwise MODEL_PATH is served alone, versioned by its content hash
+    (recomputed only when the file's size or mtime changes).
+    """
+    if registry is not None:
+        targets = {}
+        for version, weight in registry.traffic_split().items():
+            metadata = registry.get(version)
+            config = load_config(backend=metadata['backend'], model_path=metadata['model_path'])
+            targets[version] = (config, weight, metadata)
+        return targets
+
+    path = INFERENCE['model_path']
+    stat = os.stat(path)
+    signature = (path, stat.st_size, stat.st_mtime_ns)
+    if signature not in _model_file_versions:
+        _model_file_versions.clear()
+        _model_file_versions[signature] = compute_model_version(path)
+    return {_model_file_versions[signature]: (INFERENCE, 1.0, {})}
+
+def models_state():
+    """Cheap fingerprint of the model source, compared by the watcher before reloading"""
+    if registry is not None:
+        return registry.state()
+    if not os.path.exists(INFERENCE['model_path']):
+        return None
+    stat = os.stat(INFERENCE['model_path'])
+    return (stat.st_size, stat.st_mtime_ns)
+
+async def reload_models() -> Dict:
+    """Load any new versions in the background and switch traffic to the current targets"""
+    start = time.perf_counter()
+    # Hashing the model file and reading the registry is blocking IO
+    loop = asyncio.get_running_loop()
+    targets = await loop.run_in_executor(executor, model_targets)
+    weights = await router.apply(targets)
+    for version, weight in weights.items():
+        print(f"Model {version} serving {weight:.0%} of traffic "
+              f"({router.deployments[version].pool.size} x {router.deployments[version].description})")
+    print(f"Models ready in {time.perf_counter() - start:.2f}s including warm-up")
+    return weights
+
+async def watch_models():
+    """Poll the registry (or the model file) and hot-reload when it changes"""
+    loop = asyncio.get_running_loop()
+    state = await loop.run_in_executor(executor, models_state)
+    while True:
+        await asyncio.sleep(MODEL_POLL_SECONDS)
+        try:
+            new_state = await loop.run_in_executor(executor, models_state)
+            if new_state != state:
+                state = new_state
+                if state is not None:
+                    await reload_models()
+        except Exception as e:
+            print(f"Error reloading models: {e}")
+
+def process_memory_samples(model_paths: Dict) -> Dict:
+    """Per-worker memory gauge values: RSS split into anon/file/shmem, PSS and the model mapping"""
+    pid = str(os.getpid())
+    usage = memory_usage()
+    samples = {
+        (pid, kind): usage[f"{kind}_kb"] * 1024
+        for kind in ("rss", "rss_anon", "rss_file", "rss_shmem", "pss")
+        if usage[f"{kind}_kb"] is not None
+    }
+    for model in model_mappings(model_paths).values():
+        if model is not None:
+            samples[(pid, "model_rss")] = samples.get((pid, "model_rss"), 0) + model['rss_kb'] * 1024
+            samples[(pid, "model_pss")] = samples.get((pid, "model_pss"), 0) + model['pss_kb'] * 1024
+    return samples
+
+def deployed_model_paths() -> Dict:
+    """Model file of each deployed version, read on the event loop where the router changes"""
+    if router is None:
+        return {}
+    return {version: deployment.config['model_path'] for version, deployment in router.deployments.items()}
+
+def model_mappings(model_paths: Dict) -> Dict:
+    """Memory of each deployed version's model file mapping (parses /proc/self/smaps; run in the executor)"""
+    return {version: mapped_file_usage(path) for version, path in model_paths.items()}
+
+def decode_image(contents: bytes, version: str) -> np.ndarray:
+    """Decode uploaded bytes into uint8 [224, 224, 3] pixels; normalization happens in run_batch"""
+    with STAGE_SECONDS.time(stage="decode", model_version=version):
+        image = open_image(contents, fast=FAST_DECODE)
+        return np.asarray(image, dtype=np.uint8)
+
+def format_prediction(probabilities: np.ndarray) -> Dict:
+    fertile_prob = float(probabilities[0])
+    infertile_prob = float(probabilities[1])
+    
+    prediction = "fertile" if fertile_prob > infertile_prob else "infertile"
+    confidence = max(fertile_prob, infertile_prob)
+    
+    return {
+        "prediction": prediction,
+        "confidence": confidence,
+        "probabilities": {
+            "fertile": fertile_prob,
+            "infertile": infertile_prob
+        }
+    }
+
+def run_batch(deployment, images: List[np.ndarray]) -> np.ndarray:
+    """Run one batched inference over N decoded images on a pooled backend of `deployment`"""
+    with deployment.pool.acquire() as backend:
+        with STAGE_SECONDS.time(stage="write_input", model_version=deployment.version):
+            backend.set_inputs(images)
+        with STAGE_SECONDS.time(stage="invoke", model_version=deployment.version):
+            backend.invoke()
+        return backend.get_outputs()
+
+def observe_batch(deployment, size: int, queue_waits: List[float]):
+    BATCH_SIZE.observe(size, model_version=deployment.version)
+    for wait in queue_waits:
+        STAGE_SECONDS.observe(wait, stage="queue_wait", model_version=deployment.version)
+
+def json_response(result: Dict, endpoint: str, start: float, status_code: int = 200) -> Response:
+    """Encode `result` and record the request outcome and latency"""
+    version = result.get("model_version", "none")
+    with STAGE_SECONDS.time(stage="encode", model_version=version):
+        body = json.dumps(result)
+    record_outcome(result, endpoint, start)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def record_outcome(result: Dict, endpoint: str, start: float):
+    outcome = "error" if "error" in result else "ok"
+    version = result.get("model_version", "none")
+    REQUESTS.inc(endpoint=endpoint, outcome=outcome, model_version=version)
+    if outcome == "error":
+        ERRORS.inc(endpoint=endpoint, model_version=version)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, model_version=version)
+
+def resolve_job_path(path: str) -> str:
+    """Resolve a client-supplied path, refusing anything outside JOB_ROOT"""
+    if "\0" in path:
+        raise ValueError(f"Path contains a NUL byte: {path!r}")
+    resolved = os.path.realpath(os.path.join(JOB_ROOT, path))
+    if os.path.commonpath([resolved, JOB_ROOT]) != JOB_ROOT:
+        raise ValueError(f"Path outside JOB_ROOT: {path}")
+    return resolved
+
+def job_relative_path(path: str) -> str:
+    """Stored job item path as the client sees it, relative to JOB_ROOT"""
+    return os.path.relpath(path, JOB_ROOT)
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def read_job_item(path: str) -> bytes:
+    """Bytes of a job image; errors name the path relative to JOB_ROOT, not the server path"""
+    try:
+        return read_file(path)
+    except OSError as e:
+        raise OSError(f"{e.strerror}: {job_relative_path(path)}") from None
+
+async def classify_job_item(path: str, deployment) -> Dict:
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
     try:
-        interpreter = tf.lite.Interpreter(model_path=model_path)
-        interpreter.allocate_tensors()
-        model = interpreter
-        print("Model loaded successfully")
+        contents = await loop.run_in_executor(executor, read_job_item, path)
+        result = await predict_bytes(contents, deployment)
     except Exception as e:
-        print(f"Error loading model: {e}")
+        result = {"error": str(e), "model_version": deployment.version}
+    record_outcome(result, "job", start)
+    return result
+
+async def job_worker():
+    """
+    Claim pending job items in groups of BATCH_MAX_SIZE and classify them
+
+    The group is submitted concurrently so the micro-batcher runs it as one
+    batch. Results are written back before the next claim, so at most one
+    group per worker is redone after a crash.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        items = []
+        if router.weights:
+            items = await loop.run_in_executor(executor, jobs.claim, BATCH_MAX_SIZE)
+        if not items:
+            job_wakeup.clear()
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            continue
 
-def preprocess_image(image: Image.Image) -> np.ndarray:
-    image = image.resize((224, 224))
-    image_array = np.array(image, dtype=np.float32) / 255.0
-    image_array = np.expand_dims(image_array, axis=0)
-    return image_array
+        deployment = router.route()
+        try:
+            results = await asyncio.gather(*(classify_job_item(path, deployment) for _, _, path in items))
+        finally:
+            deployment.release()
+        await loop.run_in_executor(
+            executor, jobs.complete,
+            [(job_id, index, result) for (job_id, index, _), result in zip(items, results)]
+        )
+
+def record_rejection(endpoint: str, reason: str):
+    ADMISSION_REJECTED.inc(endpoint=endpoint, reason=reason)
+    REQUESTS.inc(endpoint=endpoint, outcome="rejected", model_version="none")
+
+def check_admin_token(request: Request):
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 @app.on_event("startup")
 async def startup_event():
-    load_model()
+    global router, watch_task
+    router = ModelRouter(
+        INTERPRETER_POOL_SIZE,
+        run_batch,
+        on_batch=observe_batch,
+        executor=executor,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS
+    )
+    try:
+        await reload_models()
+    except Exception as e:
+        print(f"Error loading model: {e}")
+    if MODEL_POLL_SECONDS > 0:
+        watch_task = asyncio.create_task(watch_models())
+    start_job_workers()
+    await load_fingerprints()
+
+async def load_fingerprints():
+    global matcher
+    if not os.path.exists(FINGERPRINT_DB):
+        print(f"Fingerprint database not found at {FINGERPRINT_DB}, /api/match disabled")
+        return
+    loop = asyncio.get_running_loop()
+    loaded = await loop.run_in_executor(executor, FingerprintMatcher.from_file, FINGERPRINT_DB)
+    families = loaded.metadata.get("families", ["custom"])
+    if families[0] != "custom":
+        print(f"Fingerprint database {FINGERPRINT_DB} holds {families[0]} hashes, /api/match needs custom; disabled")
+        return
+    matcher = loaded
+    print(f"Fingerprint database loaded: {len(matcher)} images")
+
+def start_job_workers():
+    global jobs, job_wakeup
+    if JOB_WORKERS <= 0:
+        return
+    jobs = JobStore(JOB_DB)
+    recovered = jobs.recover()
+    if recovered:
+        print(f"Resuming {recovered} job items interrupted by a previous shutdown")
+    job_wakeup = asyncio.Event()
+    job_tasks.extend(asyncio.create_task(job_worker()) for _ in range(JOB_WORKERS))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if watch_task is not None:
+        watch_task.cancel()
+    for task in job_tasks:
+        task.cancel()
+    # Items a worker had claimed stay 'running' and are recovered on the next start
+    await asyncio.gather(*job_tasks, return_exceptions=True)
+    if router is not None:
+        await router.stop()
+    if jobs is not None:
+        jobs.close()
+    executor.shutdown(wait=False)
 
 @app.get("/")
 async def root():
@@ -45,46 +410,324 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_loaded": model is not None}
+    loop = asyncio.get_running_loop()
+    memory = await loop.run_in_executor(executor, memory_usage)
+    mappings = await loop.run_in_executor(executor, model_mappings, deployed_model_paths())
+    return {
+        "status": "healthy",
+        "model_loaded": bool(router and router.weights),
+        "model_version": router.primary_version() if router else None,
+        "models": router.stats() if router else None,
+        "cache": cache.stats(),
+        "fingerprints": len(matcher) if matcher is not None else None,
+        "admission": admission.stats(),
+        "process": {
+            "pid": os.getpid(),
+            "workers": WORKERS,
+            "memory": memory,
+            "model_mappings": mappings
+        }
+    }
+
+@app.get("/api/models")
+async def list_models():
+    """Registered versions (if a registry is configured) and the live traffic split"""
+    return {
+        "registry": MODEL_REGISTRY,
+        "versions": registry.versions() if registry is not None else None,
+        "traffic": router.weights if router else {}
+    }
+
+@app.post("/api/models/reload")
+async def reload_models_endpoint(request: Request):
+    """
+    Hot-reload the served models
+
+    An optional JSON body `{"weights": {"v1": 0.9, "v2": 0.1}}` first stores a
+    new traffic split in the registry. New versions are loaded and warmed up
+    in the background, then traffic switches over atomically. Other worker
+    processes pick the change up on their next poll.
+    """
+    check_admin_token(request)
+    body = await request.body()
+    loop = asyncio.get_running_loop()
+    try:
+        payload = json.loads(body) if body else {}
+        if not isinstance(payload, dict):
+            raise ValueError("Body must be a JSON object")
+        weights = payload.get("weights")
+        if weights is not None:
+            if not isinstance(weights, dict):
+                raise ValueError("'weights' must be an object of version -> weight")
+            if registry is None:
+                raise ValueError("Traffic splits need MODEL_REGISTRY")
+            await loop.run_in_executor(executor, registry.set_traffic_split, weights)
+        traffic = await reload_models()
+    except (KeyError, ValueError, TypeError, AttributeError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"traffic": traffic}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    global memory_samples
+    loop = asyncio.get_running_loop()
+    if jobs is not None:
+        JOB_ITEMS_PENDING.set(await loop.run_in_executor(executor, jobs.pending_items))
+    memory_samples = await loop.run_in_executor(executor, process_memory_samples, deployed_model_paths())
+    return Response(content=metrics.render(), media_type=MetricsRegistry.CONTENT_TYPE)
 
 @app.post("/api/predict")
-async def predict(file: UploadFile = File(...)) -> Dict:
-    if model is None:
-        return {"error": "Model not loaded"}
+async def predict(file: UploadFile = File(...)) -> Response:
+    start = time.perf_counter()
+    deployment = router.route() if router else None
+    if deployment is None:
+        return json_response({"error": "Model not loaded"}, "predict", start)
     
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        image = image.convert("RGB")
-        
-        input_data = preprocess_image(image)
-        
-        input_details = model.get_input_details()
-        output_details = model.get_output_details()
-        
-        model.set_tensor(input_details[0]['index'], input_data)
-        model.invoke()
-        
-        output_data = model.get_tensor(output_details[0]['index'])
-        probabilities = output_data[0]
-        
-        fertile_prob = float(probabilities[0])
-        infertile_prob = float(probabilities[1])
-        
-        prediction = "fertile" if fertile_prob > infertile_prob else "infertile"
-        confidence = max(fertile_prob, infertile_prob)
+        with STAGE_SECONDS.time(stage="upload_read", model_version=deployment.version):
+            contents = await file.read()
+        result = await predict_bytes(contents, deployment)
+    except Exception as e:
+        result = {"error": str(e), "model_version": deployment.version}
+    finally:
+        deployment.release()
+    return json_response(result, "predict", start)
+
+async def predict_bytes(contents: bytes, deployment) -> Dict:
+    """Classify one encoded image on `deployment`, answering repeated uploads from the cache"""
+    key = PredictionCache.make_key(contents, deployment.version)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    
+    loop = asyncio.get_running_loop()
+    input_data = await loop.run_in_executor(executor, decode_image, contents, deployment.version)
+    
+    probabilities = await deployment.submit(input_data)
+    
+    result = format_prediction(probabilities)
+    result["model_version"] = deployment.version
+    cache.put(key, result)
+    return result
+
+async def read_uploads(files: List[UploadFile]) -> List:
+    """
+    Expand the uploaded files into (filename, loader) pairs
+
+    A zip archive contributes one entry per image it contains. Loaders are
+    blocking callables returning the image bytes, so zip members are only
+    inflated on the worker executor when their turn comes.
+    """
+    entries = []
+    for upload in files:
+        contents = await upload.read()
+        if zipfile.is_zipfile(io.BytesIO(contents)):
+            archive = zipfile.ZipFile(io.BytesIO(contents))
+            for name in archive.namelist():
+                if name.endswith('/') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                entries.append((name, lambda archive=archive, name=name: archive.read(name)))
+        else:
+            entries.append((upload.filename, lambda contents=contents: contents))
+    return entries
+
+async def predict_entry(index: int, filename: str, load, deployment) -> Dict:
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        contents = await loop.run_in_executor(executor, load)
+        result = await predict_bytes(contents, deployment)
+    except Exception as e:
+        result = {"error": str(e), "model_version": deployment.version}
+    record_outcome(result, "predict_batch", start)
+    return {"index": index, "filename": filename, **result}
+
+@app.post("/api/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)) -> Response:
+    """
+    Classify many images (multipart files and/or zip archives) in one request
+
+    Images are decoded in parallel and fed through the micro-batcher, and one
+    NDJSON line is streamed per image as soon as its result is ready, so lines
+    arrive in completion order; `index` gives the position in the upload.
+    The whole request is served by one model version.
+    """
+    start = time.perf_counter()
+    deployment = router.route() if router else None
+    if deployment is None:
+        return json_response({"error": "Model not loaded"}, "predict_batch", start)
+    
+    try:
+        with STAGE_SECONDS.time(stage="upload_read", model_version=deployment.version):
+            entries = await read_uploads(files)
+    except BaseException:
+        deployment.release()
+        raise
+    
+    async def stream():
+        tasks = [
+            asyncio.create_task(predict_entry(index, filename, load, deployment))
+            for index, (filename, load) in enumerate(entries)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                with STAGE_SECONDS.time(stage="encode", model_version=deployment.version):
+                    line = json.dumps(result) + "\n"
+                yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            deployment.release()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def fingerprint_image(contents: bytes) -> Dict:
+    """Hash an upload exactly like generate_fingerprints_batch.py hashed the database images"""
+    # Databases record whether JPEGs were decoded at reduced size; older ones were not
+    full_decode = matcher.metadata.get("decode", "full") == "full"
+    with STAGE_SECONDS.time(stage="decode", model_version="none"):
+        image, _ = decode_for_hashing(contents, ["custom"], full_decode=full_decode)
+    with STAGE_SECONDS.time(stage="fingerprint", model_version="none"):
+        with image:
+            return compute_hashes(image, ["custom"])["custom"]
+
+@app.post("/api/match")
+async def match(file: UploadFile = File(None), hashes: str = Form(None), top_k: int = 5,
+                threshold: float = None) -> Response:
+    """
+    Look an image up in the fingerprint database
+
+    Send either the image as `file`, or precomputed hashes as a `hashes`
+    form field holding JSON ({"phash": "0101...", "ahash": ..., "dhash": ...}).
+    Returns the `top_k` entries by weighted similarity, the best entry per
+    hash family, and whether the best score reaches `threshold` (default:
+    the database threshold). Malformed hashes or `top_k` < 1 get a 400.
+    """
+    start = time.perf_counter()
+    if matcher is None:
+        return json_response({"error": "Fingerprint database not loaded"}, "match", start)
+    
+    try:
+        if file is not None:
+            with STAGE_SECONDS.time(stage="upload_read", model_version="none"):
+                contents = await file.read()
+            loop = asyncio.get_running_loop()
+            query = await loop.run_in_executor(executor, fingerprint_image, contents)
+        elif hashes is not None:
+            try:
+                query = json.loads(hashes)
+            except json.JSONDecodeError as e:
+                raise InvalidQuery(f"'hashes' is not valid JSON: {e}")
+        else:
+            raise InvalidQuery("Send an image as 'file' or hashes as 'hashes'")
         
-        return {
-            "prediction": prediction,
-            "confidence": confidence,
-            "probabilities": {
-                "fertile": fertile_prob,
-                "infertile": infertile_prob
-            }
-        }
+        with STAGE_SECONDS.time(stage="match", model_version="none"):
+            result = matcher.match(query, top_k=top_k, threshold=threshold)
+        result["database_size"] = len(matcher)
+    except InvalidQuery as e:
+        return json_response({"error": str(e)}, "match", start, status_code=400)
     except Exception as e:
-        return {"error": str(e)}
+        result = {"error": str(e)}
+    return json_response(result, "match", start)
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Queue an offline classification job over images stored on the server
+
+    The JSON body names either `paths` (a list of image files) or a
+    `directory` (searched recursively unless `recursive` is false), relative
+    to JOB_ROOT. Progress is available at /api/jobs/{job_id} and results at
+    /api/jobs/{job_id}/results; the job survives server restarts.
+    """
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+    loop = asyncio.get_running_loop()
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise ValueError("Body must be a JSON object")
+        if "directory" in body:
+            if not isinstance(body["directory"], str):
+                raise ValueError("'directory' must be a string")
+            if not isinstance(body.get("recursive", True), bool):
+                raise ValueError("'recursive' must be true or false")
+            directory = resolve_job_path(body["directory"])
+            if not os.path.isdir(directory):
+                raise ValueError(f"Not a directory: {body['directory']}")
+            paths = await loop.run_in_executor(
+                executor, list_job_images, directory, body.get("recursive", True)
+            )
+        elif "paths" in body:
+            if (not isinstance(body["paths"], list) or not body["paths"]
+                    or not all(isinstance(path, str) for path in body["paths"])):
+                raise ValueError("'paths' must be a non-empty list of strings")
+            paths = [resolve_job_path(path) for path in body["paths"]]
+        else:
+            raise ValueError("Expected 'paths' or 'directory'")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    source = {key: body[key] for key in ("directory", "recursive") if key in body} or {"paths": len(paths)}
+    job_id = await loop.run_in_executor(executor, jobs.create_job, paths, source)
+    job_wakeup.set()
+    return {"job_id": job_id, "total": len(paths)}
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 50):
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+    loop = asyncio.get_running_loop()
+    return {"jobs": await loop.run_in_executor(executor, jobs.jobs, limit)}
+
+@app.get("/api/jobs/{job_id}")
+async def job_progress(job_id: str):
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(executor, jobs.job, job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@app.get("/api/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = 0, limit: int = 1000):
+    """Finished results in submission order, with paths relative to JOB_ROOT; page with `offset` and `limit`"""
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(executor, jobs.job, job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    results = await loop.run_in_executor(executor, jobs.results, job_id, offset, limit)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "offset": offset,
+        "results": [{**result, "path": job_relative_path(result["path"])} for result in results]
+    }
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    loop = asyncio.get_running_loop()
+    if jobs is None or not await loop.run_in_executor(executor, jobs.cancel, job_id):
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return await loop.run_in_executor(executor, jobs.job, job_id)
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    parser = argparse.ArgumentParser(description='Peacock Egg Detector API server')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Bind address')
+    parser.add_argument('--port', type=int, default=8000, help='Bind port')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Worker processes sharing the memory-mapped model')
+
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Workers are fresh processes that import main and load the model in
+        # their own startup, so only the model file mapping is shared
+        os.environ["WORKERS"] = str(args.workers)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Bounded admission queue in front of the expensive endpoints
+
+    At most `max_concurrent` requests are processed at once and at most
+    `max_queue` more wait for a slot; anything beyond that is refused
+    immediately, and a request that waited `queue_timeout` seconds without
+    getting a slot is refused too. Must be used from a single event loop.
+
+    Args:
+        max_concurrent: Requests processed at the same time
+        max_queue: Requests allowed to wait for a slot
+        queue_timeout: Longest wait for a slot in seconds (None waits forever)
+        retry_after: Seconds suggested to refused clients
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout=None, retry_after=1):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'timeout': 0}
+        self._slots = None
+
+    async def acquire(self):
+        """
+        Wait for a processing slot
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        # Counters, not the semaphore: wait_for acquires it in another task, so a
+        # burst arriving in one loop iteration would all see it unlocked
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected['queue_full'] += 1
+            raise Overloaded('queue_full')
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected['timeout'] += 1
+            raise Overloaded('timeout')
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        return time.perf_counter() - start
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected)
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to selected POST routes
+
+    Admission happens before the request body is read, so queued and refused
+    uploads never occupy memory or decode time. Refused requests get a 503
+    with a `Retry-After` header.
+
+    Args:
+        app: Wrapped ASGI application
+        controller: AdmissionController shared by the routes
+        paths: Dictionary of path -> endpoint name passed to the callbacks
+        on_admit: Optional callable (endpoint, waited_seconds)
+        on_reject: Optional callable (endpoint, reason)
+    """
+
+    def __init__(self, app, controller, paths, on_admit=None, on_reject=None):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+        self.on_admit = on_admit
+        self.on_reject = on_reject
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.paths.get(scope.get('path')) if scope['type'] == 'http' else None
+        if endpoint is None or scope['method'] != 'POST':
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            waited = await self.controller.acquire()
+        except Overloaded as e:
+            if self.on_reject is not None:
+                self.on_reject(endpoint, e.reason)
+            await self._refuse(send, e)
+            return
+
+        try:
+            if self.on_admit is not None:
+                self.on_admit(endpoint, waited)
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _refuse(self, send, error):
+        body = json.dumps({'error': str(error)}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(self.controller.retry_after).encode()),
+                # The unread upload would otherwise be parsed as the next request
+                (b'connection', b'close')
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,158 @@
+import asyncio
+
+
+class MicroBatcher:
+    """
+    Collect concurrent single-image requests into one batched inference call
+
+    Requests are queued until either `max_batch_size` items are waiting or the
+    oldest item has waited `max_wait_ms`, whichever comes first. The whole
+    group is then handed to `run_batch` as a list on an executor thread, and
+    each caller receives its own row of the output. Items are not stacked
+    here so that `run_batch` can write them straight into its input buffer.
+    Up to `max_concurrent_batches` batches may be in flight at once, so a pool
+    of interpreters can serve several batches in parallel.
+
+    Args:
+        run_batch: Blocking callable taking a list of N items and returning [N, ...] outputs
+        max_batch_size: Maximum number of items per invocation
+        max_wait_ms: Maximum time the first item of a batch waits for company
+        executor: Executor used for `run_batch` (None uses the loop default)
+        max_concurrent_batches: Number of batches allowed to run at the same time
+        on_batch: Optional callable receiving (batch_size, queue_waits_in_seconds)
+            just before each batch runs, for metrics
+    """
+
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=5.0, executor=None,
+                 max_concurrent_batches=1, on_batch=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self.on_batch = on_batch
+        self.batches_run = 0
+        self.items_run = 0
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._running = set()
+
+    def start(self):
+        """Start the background batching task on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def stop(self):
+        """Stop the batching task and fail any requests still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item):
+        """
+        Queue one input and wait for its result
+
+        Args:
+            item: Single input array without the batch dimension
+
+        Returns:
+            The output row belonging to `item`
+        """
+        if self._task is None:
+            raise RuntimeError("Batcher is not running")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((item, future, loop.time()))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued before paying for a timed wait
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that gave up (client disconnects) do not need a slot
+        return [entry for entry in batch if not entry[1].done()]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Only collect the next batch once there is capacity to run it, so
+            # requests keep accumulating while every slot is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            if self.on_batch is not None:
+                now = loop.time()
+                self.on_batch(len(batch), [now - enqueued_at for _, _, enqueued_at in batch])
+
+            inputs = [item for item, _, _ in batch]
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.run_batch, inputs)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+            for (_, future, _), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Return batching counters for health reporting"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches_run': self.batches_run,
+            'items_run': self.items_run,
+            'avg_batch_size': self.items_run / self.batches_run if self.batches_run else 0.0,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': len(self._running)
+        }
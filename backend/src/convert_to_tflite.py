@@ -1,7 +1,7 @@
 import os
 import tensorflow as tf
 
-def convert_to_tflite(model_path, output_path='models/peacock_egg_classifier.tflite', quantization=None):
+def convert_to_tflite(model_path, output_path='models/peacock_egg_classifier.tflite', quantization=None, uint8_input=False):
     """
     Convert Keras model to TFLite format
     
@@ -9,6 +9,7 @@ def convert_to_tflite(model_path, output_path='models/peacock_egg_classifier.tfl
         model_path: Path to Keras model (.h5 file)
         output_path: Path to save TFLite model
         quantization: Type of quantization (None, 'float16', 'dynamic', 'full_integer')
+        uint8_input: Accept raw uint8 pixels and do the /255 normalization inside the graph
     
     Returns:
         Path to saved TFLite model
@@ -18,6 +19,12 @@ def convert_to_tflite(model_path, output_path='models/peacock_egg_classifier.tfl
     print(f"Loading model from {model_path}...")
     model = tf.keras.models.load_model(model_path)
     
+    if uint8_input:
+        print("Wrapping model with uint8 input and in-graph rescaling...")
+        inputs = tf.keras.Input(shape=model.input_shape[1:], dtype='uint8', name='image')
+        outputs = model(tf.keras.layers.Rescaling(1.0 / 255)(inputs))
+        model = tf.keras.Model(inputs, outputs)
+    
     print("Converting model to TFLite...")
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     
@@ -79,6 +86,7 @@ if __name__ == "__main__":
     parser.add_argument('--output_tflite', type=str, default='models/peacock_egg_classifier.tflite', help='Output TFLite path')
     parser.add_argument('--quantization', type=str, default=None, 
                         choices=[None, 'float16', 'dynamic', 'full_integer'], help='Quantization type')
+    parser.add_argument('--uint8_input', action='store_true', help='Take uint8 pixels as input (normalization inside the graph)')
     parser.add_argument('--convert_to_tfjs', action='store_true', help='Convert to TFJS format')
     parser.add_argument('--tfjs_output', type=str, default='../web/public/models/peacock_egg_classifier_tfjs', 
                         help='TFJS output directory')
@@ -88,7 +96,8 @@ if __name__ == "__main__":
     tflite_path = convert_to_tflite(
         model_path=args.model_path,
         output_path=args.output_tflite,
-        quantization=args.quantization
+        quantization=args.quantization,
+        uint8_input=args.uint8_input
     )
     
     if args.convert_to_tfjs:
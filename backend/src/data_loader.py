@@ -1,22 +1,47 @@
 import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 import numpy as np
+import pandas as pd
+import json
 import os
 
-def load_data(data_dir, img_size=(224, 224), batch_size=32, validation_split=0.2):
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.15,
-        height_shift_range=0.15,
-        horizontal_flip=True,
-        vertical_flip=True,
-        zoom_range=0.2,
-        shear_range=0.15,
-        brightness_range=[0.7, 1.3],
-        fill_mode='nearest',
-        validation_split=validation_split
-    )
+AUGMENTATION = dict(
+    rescale=1./255,
+    rotation_range=20,
+    width_shift_range=0.15,
+    height_shift_range=0.15,
+    horizontal_flip=True,
+    vertical_flip=True,
+    zoom_range=0.2,
+    shear_range=0.15,
+    brightness_range=[0.7, 1.3],
+    fill_mode='nearest'
+)
+
+def load_split(split_file):
+    """
+    Train/validation file lists written by near_duplicates.py
+
+    Returns:
+        Dictionary with 'train' and 'validation' lists of paths relative to
+        the dataset directory ('fertil/x.jpg')
+    """
+    with open(split_file, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_data(data_dir, img_size=(224, 224), batch_size=32, validation_split=0.2, split_file=None):
+    """
+    Training and validation generators
+
+    Without `split_file`, Keras takes the first `validation_split` of every
+    class directory (sorted by name) as validation. With a split file from
+    near_duplicates.py, its group-aware lists are used instead, so burst
+    shots of one egg never end up on both sides.
+    """
+    if split_file:
+        return _load_split_data(data_dir, split_file, img_size, batch_size)
+    
+    train_datagen = ImageDataGenerator(**AUGMENTATION, validation_split=validation_split)
     
     train_generator = train_datagen.flow_from_directory(
         data_dir,
@@ -38,6 +63,33 @@ def load_data(data_dir, img_size=(224, 224), batch_size=32, validation_split=0.2
     
     return train_generator, validation_generator
 
+def _load_split_data(data_dir, split_file, img_size, batch_size):
+    split = load_split(split_file)
+    # Same class indices as flow_from_directory: sorted subdirectories
+    classes = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    
+    train_datagen = ImageDataGenerator(**AUGMENTATION)
+    
+    generators = []
+    for subset, shuffle in (('train', True), ('validation', False)):
+        dataframe = pd.DataFrame({
+            'filename': split[subset],
+            'class': [path.split('/', 1)[0] for path in split[subset]]
+        })
+        generators.append(train_datagen.flow_from_dataframe(
+            dataframe,
+            directory=data_dir,
+            x_col='filename',
+            y_col='class',
+            classes=classes,
+            target_size=img_size,
+            batch_size=batch_size,
+            class_mode='categorical',
+            shuffle=shuffle
+        ))
+    
+    return generators[0], generators[1]
+
 def load_test_data(test_dir, img_size=(224, 224), batch_size=32):
     test_datagen = ImageDataGenerator(rescale=1./255)
     
@@ -51,9 +103,15 @@ def load_test_data(test_dir, img_size=(224, 224), batch_size=32):
     
     return test_generator
 
-def get_class_weights(data_dir, method='balanced'):
-    fertil_count = len([f for f in os.listdir(os.path.join(data_dir, 'fertil')) if f.endswith('.jpg')])
-    infertil_count = len([f for f in os.listdir(os.path.join(data_dir, 'infertil')) if f.endswith('.jpg')])
+def get_class_weights(data_dir, method='balanced', split_file=None):
+    if split_file:
+        # Weight by what is actually trained on
+        train_files = load_split(split_file)['train']
+        fertil_count = sum(1 for path in train_files if path.startswith('fertil/'))
+        infertil_count = sum(1 for path in train_files if path.startswith('infertil/'))
+    else:
+        fertil_count = len([f for f in os.listdir(os.path.join(data_dir, 'fertil')) if f.endswith('.jpg')])
+        infertil_count = len([f for f in os.listdir(os.path.join(data_dir, 'infertil')) if f.endswith('.jpg')])
     
     total = fertil_count + infertil_count
     
@@ -0,0 +1,209 @@
+import asyncio
+import functools
+
+from batching import MicroBatcher
+from inference_engine import create_backend
+from interpreter_pool import InterpreterPool
+from model_registry import choose_version, normalize_weights
+
+
+class ModelDeployment:
+    """
+    One servable model version: a warmed-up interpreter pool plus its batcher
+
+    `load` is blocking and meant to run off the event loop; `start` then
+    creates the batcher. Requests hold the deployment with `acquire` /
+    `release` from routing until their result is back, so `retire` can wait
+    for in-flight requests before stopping the batcher.
+
+    Args:
+        version: Version tag reported with every result
+        config: Inference config (see inference_engine.load_config)
+        pool_size: Number of pooled backends
+        metadata: Optional registry metadata of the version
+    """
+
+    def __init__(self, version, config, pool_size, metadata=None):
+        self.version = version
+        self.config = config
+        self.pool_size = pool_size
+        self.metadata = metadata or {}
+        self.pool = None
+        self.batcher = None
+        self.description = None
+        self.active = 0
+        self._idle = None
+
+    def load(self):
+        """Create and warm up every pooled backend (blocking)"""
+        def factory():
+            backend = create_backend(self.config)
+            backend.warm_up()
+            return backend
+
+        self.pool = InterpreterPool(factory, size=self.pool_size)
+        with self.pool.acquire() as backend:
+            self.description = backend.describe()
+
+    def start(self, run_batch, on_batch=None, **batcher_options):
+        """
+        Start the batcher on the running event loop
+
+        Args:
+            run_batch: Callable (deployment, images) -> outputs, run on the executor
+            on_batch: Optional callable (deployment, batch_size, queue_waits)
+            **batcher_options: Passed to MicroBatcher
+        """
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.batcher = MicroBatcher(
+            functools.partial(run_batch, self),
+            max_concurrent_batches=self.pool.size,
+            on_batch=functools.partial(on_batch, self) if on_batch is not None else None,
+            **batcher_options
+        )
+        self.batcher.start()
+
+    def acquire(self):
+        self.active += 1
+        self._idle.clear()
+
+    def release(self):
+        self.active -= 1
+        if self.active == 0:
+            self._idle.set()
+
+    async def submit(self, image):
+        return await self.batcher.submit(image)
+
+    async def retire(self):
+        """Wait for in-flight requests, then stop the batcher"""
+        await self._idle.wait()
+        await self.batcher.stop()
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'model': self.description,
+            'metadata': self.metadata,
+            'active_requests': self.active,
+            'pool': self.pool.stats(),
+            'batching': self.batcher.stats() if self.batcher is not None else None
+        }
+
+
+class ModelRouter:
+    """
+    Weighted routing of requests across the deployed model versions
+
+    `apply` loads any new versions in the background (on `executor`), starts
+    them, then swaps the routing table in a single assignment: requests
+    already routed finish on the version they started with, new requests see
+    the new table. Versions no longer in the table are retired once idle.
+    A failed load leaves the current table untouched.
+
+    Args:
+        pool_size: Number of pooled backends per version
+        run_batch: Callable (deployment, images) -> outputs
+        on_batch: Optional callable (deployment, batch_size, queue_waits)
+        executor: Executor used for loading and batches
+        **batcher_options: Passed to MicroBatcher (max_batch_size, max_wait_ms)
+    """
+
+    def __init__(self, pool_size, run_batch, on_batch=None, executor=None, **batcher_options):
+        self.pool_size = pool_size
+        self.run_batch = run_batch
+        self.on_batch = on_batch
+        self.executor = executor
+        self.batcher_options = batcher_options
+        # (deployments by version, normalized weights) replaced as one tuple
+        self._table = ({}, {})
+        self._lock = asyncio.Lock()
+        self._retiring = set()
+
+    @property
+    def deployments(self):
+        return self._table[0]
+
+    @property
+    def weights(self):
+        return self._table[1]
+
+    def route(self):
+        """
+        Pick a deployment for one request and hold it
+
+        The caller must `release()` the deployment once its result is back.
+
+        Returns:
+            The acquired deployment, or None when nothing is deployed
+        """
+        deployments, weights = self._table
+        if not weights:
+            return None
+        deployment = deployments[choose_version(weights)]
+        deployment.acquire()
+        return deployment
+
+    def primary_version(self):
+        """Version receiving the largest share of traffic"""
+        weights = self.weights
+        return max(weights, key=weights.get) if weights else None
+
+    async def apply(self, targets):
+        """
+        Deploy exactly the given versions with the given traffic split
+
+        Args:
+            targets: Dictionary of version -> (config, weight, metadata)
+
+        Returns:
+            The new normalized weights
+        """
+        async with self._lock:
+            weights = normalize_weights({version: weight for version, (_, weight, _) in targets.items()})
+            current = self.deployments
+            loop = asyncio.get_running_loop()
+
+            deployments = {}
+            started = []
+            try:
+                for version in weights:
+                    if version in current:
+                        deployments[version] = current[version]
+                        continue
+                    config, _, metadata = targets[version]
+                    deployment = ModelDeployment(version, config, self.pool_size, metadata=metadata)
+                    await loop.run_in_executor(self.executor, deployment.load)
+                    deployment.start(self.run_batch, self.on_batch, executor=self.executor, **self.batcher_options)
+                    started.append(deployment)
+                    deployments[version] = deployment
+            except BaseException:
+                for deployment in started:
+                    await deployment.retire()
+                raise
+
+            self._table = (deployments, weights)
+
+            for version, deployment in current.items():
+                if version not in deployments:
+                    task = loop.create_task(deployment.retire())
+                    self._retiring.add(task)
+                    task.add_done_callback(self._retiring.discard)
+            return weights
+
+    async def stop(self):
+        """Retire every deployment"""
+        async with self._lock:
+            deployments, _ = self._table
+            self._table = ({}, {})
+        await asyncio.gather(*(deployment.retire() for deployment in deployments.values()), *self._retiring,
+                             return_exceptions=True)
+
+    def stats(self):
+        deployments, weights = self._table
+        return {
+            'traffic': weights,
+            'versions': [dict(deployment.stats(), traffic=weights[version]) for version, deployment in deployments.items()],
+            'retiring': len(self._retiring)
+        }
@@ -3,7 +3,69 @@ import numpy as np
 from utils import plot_confusion_matrix, calculate_metrics, save_metrics
 from data_loader import load_test_data
 
-def evaluate_model(model_path, test_dir, batch_size=32, img_size=(224, 224)):
+def list_test_images(test_dir):
+    """List images per class subdirectory, in the same order and class mapping as flow_from_directory"""
+    class_names = sorted(d for d in os.listdir(test_dir) if os.path.isdir(os.path.join(test_dir, d)))
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_path = os.path.join(test_dir, class_name)
+        for filename in sorted(os.listdir(class_path)):
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+                paths.append(os.path.join(class_path, filename))
+                labels.append(label)
+    return paths, np.array(labels), class_names
+
+def evaluate_with_engine(model_path, test_dir, batch_size=32, img_size=(224, 224), backend='tflite'):
+    """
+    Evaluate a model through the shared inference engine (e.g. a TFLite variant)
+    
+    Args:
+        model_path: Path to the model for the selected backend
+        test_dir: Path to test data directory
+        batch_size: Batch size for evaluation
+        img_size: Target image size
+        backend: Inference backend name (see inference_engine.BACKENDS)
+    
+    Returns:
+        Dictionary of evaluation metrics
+    """
+    from inference_engine import create_backend, load_config
+    from preprocessing import open_image
+    
+    os.makedirs('output', exist_ok=True)
+    
+    config = load_config(backend=backend, model_path=model_path)
+    print(f"Loading {backend} model from {config['model_path']}...")
+    engine = create_backend(config)
+    
+    paths, y_true, class_names = list_test_images(test_dir)
+    print(f"Test samples: {len(paths)}")
+    
+    print("\nEvaluating model...")
+    predictions = []
+    for start in range(0, len(paths), batch_size):
+        images = []
+        for path in paths[start:start + batch_size]:
+            with open(path, 'rb') as f:
+                images.append(np.asarray(open_image(f.read(), size=tuple(img_size), fast=False)))
+        predictions.append(engine.predict(images))
+    y_pred = np.argmax(np.concatenate(predictions), axis=1)
+    
+    print(f"\nTest Accuracy: {np.mean(y_pred == y_true):.4f}")
+    
+    plot_confusion_matrix(
+        y_true=y_true,
+        y_pred=y_pred,
+        class_names=class_names,
+        save_path='output/confusion_matrix.png'
+    )
+    
+    metrics = calculate_metrics(y_true, y_pred)
+    save_metrics(metrics, save_path='output/metrics.txt')
+    
+    return metrics
+
+def evaluate_model(model_path, test_dir, batch_size=32, img_size=(224, 224), backend='keras', loader='keras'):
     """
     Evaluate the trained model on test data
     
@@ -12,35 +74,54 @@ def evaluate_model(model_path, test_dir, batch_size=32, img_size=(224, 224)):
         test_dir: Path to test data directory
         batch_size: Batch size for evaluation
         img_size: Target image size
+        backend: 'keras' evaluates the .h5 model directly; any other
+            inference_engine backend (e.g. 'tflite', 'tflite_int8') runs through the engine
+        loader: Input pipeline of the keras backend, 'keras' (ImageDataGenerator)
+            or 'tf_data' (tf_data_loader)
     
     Returns:
         Dictionary of evaluation metrics
     """
+    if backend != 'keras':
+        return evaluate_with_engine(model_path, test_dir, batch_size, img_size, backend)
+    
     import tensorflow as tf
     
+    model_path = model_path or 'models/best_model.h5'
+    
     os.makedirs('output', exist_ok=True)
     
     print(f"Loading model from {model_path}...")
     model = tf.keras.models.load_model(model_path)
     
-    print("Loading test data...")
-    test_generator = load_test_data(
-        test_dir=test_dir,
-        img_size=img_size,
-        batch_size=batch_size
-    )
+    print(f"Loading test data ({loader} loader)...")
+    if loader == 'tf_data':
+        from tf_data_loader import load_test_data as load_tf_test_data
+        test_generator = load_tf_test_data(
+            test_dir=test_dir,
+            img_size=img_size,
+            batch_size=batch_size
+        )
+        test_data = test_generator.dataset
+    else:
+        test_generator = load_test_data(
+            test_dir=test_dir,
+            img_size=img_size,
+            batch_size=batch_size
+        )
+        test_data = test_generator
     
     print(f"Test samples: {test_generator.samples}")
     
     print("\nEvaluating model...")
-    test_loss, test_acc, test_precision, test_recall = model.evaluate(test_generator, verbose=1)
+    test_loss, test_acc, test_precision, test_recall = model.evaluate(test_data, verbose=1)
     
     print(f"\nTest Loss: {test_loss:.4f}")
     print(f"Test Accuracy: {test_acc:.4f}")
     print(f"Test Precision: {test_precision:.4f}")
     print(f"Test Recall: {test_recall:.4f}")
     
-    predictions = model.predict(test_generator)
+    predictions = model.predict(test_data)
     y_pred = np.argmax(predictions, axis=1)
     y_true = test_generator.classes
     
@@ -62,10 +143,15 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Evaluate CNN model for peacock egg classification')
-    parser.add_argument('--model_path', type=str, default='models/best_model.h5', help='Path to model file')
+    parser.add_argument('--model_path', type=str, default=None, help='Path to model file (default depends on --backend)')
     parser.add_argument('--test_dir', type=str, default='dataset', help='Path to test data directory')
     parser.add_argument('--batch_size', type=int, default=32, help='Batch size')
     parser.add_argument('--img_size', type=int, nargs=2, default=[224, 224], help='Image size')
+    parser.add_argument('--backend', type=str, default='keras',
+                       choices=['keras', 'tflite', 'tflite_dynamic', 'tflite_int8'],
+                       help='Inference backend (default: keras)')
+    parser.add_argument('--loader', type=str, default='keras', choices=['keras', 'tf_data'],
+                       help='Input pipeline of the keras backend (default: keras ImageDataGenerator)')
     
     args = parser.parse_args()
     
@@ -73,5 +159,7 @@ if __name__ == "__main__":
         model_path=args.model_path,
         test_dir=args.test_dir,
         batch_size=args.batch_size,
-        img_size=tuple(args.img_size)
+        img_size=tuple(args.img_size),
+        backend=args.backend,
+        loader=args.loader
     )
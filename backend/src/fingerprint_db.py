@@ -0,0 +1,256 @@
+import itertools
+import json
+import mmap
+import os
+
+import numpy as np
+
+MAGIC = b'PEAFPDB\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+# Layout (little-endian):
+#   magic (8 bytes) | format version (uint32) | header length (uint32) | header JSON
+#   followed by the arrays listed in the header. Array offsets are relative to
+#   the end of the header, which is padded with spaces to an 8-byte boundary.
+# Hash rows hold the bits in string order (first bit = most significant bit of
+# the first byte), zero-padded to a multiple of 8 bytes so they can be viewed
+# as uint64 words like fingerprint_matcher.pack_bits produces.
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _pack_bit_strings(bit_strings, n_bits):
+    row_bytes = _align((n_bits + 7) // 8)
+    text = ''.join(s.ljust(row_bytes * 8, '0') for s in bit_strings)
+    if text.strip('01'):
+        raise ValueError("Binary fingerprint databases only hold '0'/'1' hash strings")
+    bits = np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(len(bit_strings), row_bytes * 8) == ord('1')
+    return np.packbits(bits, axis=1)
+
+
+def write_fingerprint_db(database, output_file, batch_size=4096):
+    """
+    Write a fingerprint database in the packed binary format
+
+    Hashes are stored as packed bits, filenames in one UTF-8 string table
+    with offsets, and classes as one byte per image indexing a class list
+    in the header.
+
+    Args:
+        database: Dictionary with 'metadata' and 'images' as written to
+            dataset_fingerprints.json. 'images' may be any re-iterable, e.g.
+            a FingerprintReader; it is read twice (classes and hash lengths,
+            then the rows) and packed `batch_size` entries at a time
+        output_file: Path of the binary file
+
+    Returns:
+        Size of the written file in bytes
+    """
+    images = database['images']
+    count = 0
+    classes = set()
+    bits = {}
+    for image in images:
+        if not count:
+            families = list(image['hashes'])
+        count += 1
+        classes.add(image['class'])
+        for name in families:
+            bits[name] = max(bits.get(name, 0), len(image['hashes'][name]))
+    classes = sorted(classes)
+    class_index = {name: code for code, name in enumerate(classes)}
+
+    arrays = {}
+    for name in bits:
+        arrays[f'hash_{name}'] = np.zeros((count, _align((bits[name] + 7) // 8)), dtype=np.uint8)
+    arrays['class_codes'] = np.zeros(count, dtype=np.uint8)
+    arrays['width'] = np.zeros(count, dtype='<u4')
+    arrays['height'] = np.zeros(count, dtype='<u4')
+    name_offsets = np.zeros(count + 1, dtype='<u4')
+    names = []
+
+    iterator = iter(images)
+    for start in range(0, count, batch_size):
+        batch = list(itertools.islice(iterator, batch_size))
+        rows = slice(start, start + len(batch))
+        for name in bits:
+            arrays[f'hash_{name}'][rows] = _pack_bit_strings([image['hashes'][name] for image in batch], bits[name])
+        arrays['class_codes'][rows] = [class_index[image['class']] for image in batch]
+        arrays['width'][rows] = [image.get('width', 0) for image in batch]
+        arrays['height'][rows] = [image.get('height', 0) for image in batch]
+        batch_names = [image['filename'].encode('utf-8') for image in batch]
+        np.cumsum([len(name) for name in batch_names], out=name_offsets[start + 1:start + 1 + len(batch)])
+        name_offsets[start + 1:start + 1 + len(batch)] += name_offsets[start]
+        names.extend(batch_names)
+    arrays['filename_offsets'] = name_offsets
+    arrays['filenames'] = np.frombuffer(b''.join(names), dtype=np.uint8)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({
+        'metadata': database.get('metadata', {}),
+        'count': count,
+        'classes': classes,
+        'hashes': bits,
+        'arrays': layout
+    }, separators=(',', ':')).encode('utf-8')
+    header = header.ljust(_align(16 + len(header)) - 16, b' ')
+
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array([FORMAT_VERSION, len(header)], dtype='<u4').tobytes())
+        f.write(header)
+        for array in arrays.values():
+            f.write(array.tobytes())
+            f.write(b'\0' * (_align(f.tell()) - f.tell()))
+    os.replace(tmp_file, output_file)
+    return os.path.getsize(output_file)
+
+
+class FingerprintDatabase:
+    """
+    Read-only view of a binary fingerprint database
+
+    The file is memory-mapped and every array is a NumPy view into the
+    mapping, so opening does not copy or parse the entries; pages are read
+    on first access and shared between processes opening the same file.
+
+    Args:
+        path: Binary database written by write_fingerprint_db
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a binary fingerprint database")
+        version, header_length = np.frombuffer(self._mmap, dtype='<u4', count=2, offset=len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported fingerprint database version {version}")
+        header = json.loads(bytes(self._mmap[16:16 + header_length]))
+        data_start = 16 + int(header_length)
+
+        self.metadata = header['metadata']
+        self.class_names = header['classes']
+        self.bits = header['hashes']
+        self._count = header['count']
+        self._arrays = {
+            name: np.frombuffer(
+                self._mmap, dtype=spec['dtype'], count=int(np.prod(spec['shape'])), offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+            for name, spec in header['arrays'].items()
+        }
+
+    def __len__(self):
+        return self._count
+
+    def hashes(self, name):
+        """Packed hash family as a uint64 array of shape [N, words] (a view into the file)"""
+        rows = self._arrays[f'hash_{name}']
+        return rows.view(np.uint64) if len(rows) else np.empty((0, rows.shape[1] // 8), dtype=np.uint64)
+
+    @property
+    def class_codes(self):
+        return self._arrays['class_codes']
+
+    @property
+    def widths(self):
+        return self._arrays['width']
+
+    @property
+    def heights(self):
+        return self._arrays['height']
+
+    def classes(self):
+        """Class name of every image"""
+        return np.array(self.class_names)[self.class_codes] if len(self) else np.array([], dtype=str)
+
+    def filename(self, i):
+        offsets = self._arrays['filename_offsets']
+        return self._arrays['filenames'][offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+    def filenames(self):
+        offsets = self._arrays['filename_offsets']
+        data = self._arrays['filenames'].tobytes()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))]
+
+    def bit_strings(self, name):
+        """Hash family as '0'/'1' strings, as stored in the JSON database"""
+        bits = np.unpackbits(self._arrays[f'hash_{name}'], axis=1)[:, :self.bits[name]]
+        text = (bits + ord('0')).tobytes().decode('ascii')
+        n_bits = self.bits[name]
+        return [text[i * n_bits:(i + 1) * n_bits] for i in range(len(self))]
+
+    def to_json(self):
+        """The database as the dictionary stored in dataset_fingerprints.json"""
+        filenames = self.filenames()
+        classes = self.classes()
+        hashes = {name: self.bit_strings(name) for name in self.bits}
+        return {
+            'metadata': dict(self.metadata),
+            'images': [
+                {
+                    'filename': filenames[i],
+                    'class': str(classes[i]),
+                    'original_filename': filenames[i].rsplit('/', 1)[-1],
+                    'width': int(self.widths[i]),
+                    'height': int(self.heights[i]),
+                    'hashes': {name: hashes[name][i] for name in self.bits}
+                }
+                for i in range(len(self))
+            ]
+        }
+
+    def close(self):
+        """Unmap the file; arrays handed out earlier keep it mapped until they are released"""
+        self._arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+def is_fingerprint_db(path):
+    """True if `path` starts with the binary database magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert a fingerprint JSON database to the packed binary format')
+    parser.add_argument('--input', type=str, default='web/public/dataset_fingerprints.json', help='Fingerprint JSON')
+    parser.add_argument('--output', type=str, default='web/public/dataset_fingerprints.bin', help='Binary output path')
+    parser.add_argument('--verify', action='store_true', help='Read the binary file back and compare it with the JSON')
+
+    args = parser.parse_args()
+
+    from fingerprint_stream import FingerprintReader
+
+    reader = FingerprintReader(args.input)
+    database = {'metadata': reader.metadata, 'images': reader}
+    size = write_fingerprint_db(database, args.output)
+    json_size = os.path.getsize(args.input)
+    db = FingerprintDatabase(args.output)
+    print(f"{len(db)} images: {json_size / 1024:.1f} KB JSON -> {size / 1024:.1f} KB binary "
+          f"({json_size / size:.1f}x smaller)")
+
+    if args.verify:
+        restored = db.to_json()
+        missing = object()
+        same = restored['metadata'] == database['metadata'] and all(
+            a is not missing and b is not missing and {key: a[key] for key in b} == b
+            for a, b in itertools.zip_longest(restored['images'], reader, fillvalue=missing)
+        )
+        print(f"Round trip identical: {same}")
+    db.close()
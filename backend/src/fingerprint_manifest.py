@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+
+from fingerprint_stream import FingerprintReader, read_entry
+
+MANIFEST_VERSION = 1
+
+
+def manifest_paths(output_file):
+    """Manifest and checkpoint files kept next to a fingerprint JSON output"""
+    base = os.path.splitext(output_file)[0]
+    return f"{base}.manifest.json", f"{base}.checkpoint.jsonl"
+
+
+def file_signature(path):
+    """(size, mtime_ns) of a file; cheap check whether it may have changed"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def content_hash(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+
+def load_manifest(manifest_file, output_file, settings=None):
+    """
+    Files fingerprinted by the previous run
+
+    Args:
+        manifest_file: Manifest written by save_manifest
+        output_file: Fingerprint JSON of the previous run
+        settings: JSON-serializable generation settings; a manifest made
+            with different settings is ignored
+
+    Returns:
+        Dictionary of relative path -> {'size', 'mtime_ns', 'sha256', 'location'}
+        for the files present in the previous output, where 'location' points
+        at the entry for EntryReader; empty if either file is missing or the
+        manifest format is unknown
+    """
+    if not (os.path.exists(manifest_file) and os.path.exists(output_file)):
+        return {}
+    with open(manifest_file, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('settings') != settings:
+        return {}
+    # Only offsets are kept; entries are read back when they are reused
+    locations = {
+        entry['filename']: ('output', offset, length)
+        for entry, offset, length in FingerprintReader(output_file).iter_with_offsets()
+    }
+    return {
+        path: {**record, 'location': locations[path]}
+        for path, record in manifest['files'].items()
+        if path in locations
+    }
+
+
+def save_manifest(manifest_file, records, settings=None):
+    """Atomically write the manifest for `records` (relative path -> size/mtime_ns/sha256)"""
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': settings,
+        'files': {
+            path: {'size': record['size'], 'mtime_ns': record['mtime_ns'], 'sha256': record['sha256']}
+            for path, record in records.items()
+        }
+    }
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_file, manifest_file)
+
+
+def load_checkpoint(checkpoint_file, settings=None):
+    """
+    Records appended by an interrupted run
+
+    A partially written last line (the run died mid-write) is cut off so
+    that new records can be appended after the valid ones. A checkpoint
+    made with different settings is discarded.
+
+    Returns:
+        Dictionary of relative path -> {'size', 'mtime_ns', 'sha256', 'location'},
+        'location' pointing at the record's line for EntryReader
+    """
+    records = {}
+    if not os.path.exists(checkpoint_file):
+        return records
+    valid_bytes = 0
+    with open(checkpoint_file, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError("incomplete line")
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            if 'settings' in record:
+                if record['settings'] != settings:
+                    os.remove(checkpoint_file)
+                    return {}
+                continue
+            del record['entry']
+            record['location'] = ('checkpoint', valid_bytes - len(line), len(line))
+            records[record.pop('path')] = record
+    if valid_bytes < os.path.getsize(checkpoint_file):
+        os.truncate(checkpoint_file, valid_bytes)
+    return records
+
+
+class CheckpointWriter:
+    """
+    Append-only log of fingerprinted files
+
+    One JSON line per image, so a crash loses at most the lines not yet
+    flushed instead of requiring the whole database to be rewritten.
+
+    Args:
+        checkpoint_file: JSONL file to append to
+        settings: Generation settings, written as the first line of a new log
+        flush_every: Lines buffered between flushes
+    """
+
+    def __init__(self, checkpoint_file, settings=None, flush_every=50):
+        self.checkpoint_file = checkpoint_file
+        self.flush_every = flush_every
+        self._file = open(checkpoint_file, 'a', encoding='utf-8')
+        self._pending = 0
+        if self._file.tell() == 0:
+            self._file.write(json.dumps({'settings': settings}, separators=(',', ':')) + '\n')
+
+    def append(self, path, record):
+        self._file.write(json.dumps({'path': path, **record}, separators=(',', ':')) + '\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class EntryReader:
+    """
+    Read reused entries back from the previous output and the checkpoint log
+
+    Args:
+        output_file: Fingerprint JSON of the previous run
+        checkpoint_file: Checkpoint log of an interrupted run
+    """
+
+    def __init__(self, output_file, checkpoint_file):
+        self._paths = {'output': output_file, 'checkpoint': checkpoint_file}
+        self._files = {}
+
+    def read(self, record):
+        """Entry of a record returned by load_manifest or load_checkpoint"""
+        source, offset, length = record['location']
+        if source not in self._files:
+            self._files[source] = open(self._paths[source], 'rb')
+        value = read_entry(self._files[source], offset, length)
+        return value['entry'] if source == 'checkpoint' else value
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
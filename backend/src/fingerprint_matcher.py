@@ -0,0 +1,264 @@
+import itertools
+import time
+
+import numpy as np
+
+from fingerprint_db import FingerprintDatabase, is_fingerprint_db
+from fingerprint_stream import FingerprintReader
+
+# Same weighting as matchImageToDataset in web/src/utils/imageMatcher.ts
+HASH_WEIGHTS = {'phash': 0.4, 'ahash': 0.3, 'dhash': 0.3}
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    Number of set bits in each element of a uint64 array
+
+    Uses np.bitwise_count (NumPy >= 2.0) and falls back to a byte lookup
+    table on older versions.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    counts = _POPCOUNT_TABLE[np.ascontiguousarray(words).view(np.uint8)]
+    return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(bit_strings, n_bits):
+    """
+    Pack '0'/'1' strings into rows of uint64 words
+
+    Strings are truncated or zero-padded to `n_bits`, and rows are padded
+    to a whole number of 64-bit words.
+
+    Args:
+        bit_strings: Sequence of bit strings
+        n_bits: Number of bits per row
+
+    Returns:
+        uint64 array with shape [len(bit_strings), ceil(n_bits / 64)]
+    """
+    n_words = (n_bits + 63) // 64
+    text = ''.join(s[:n_bits].ljust(n_words * 64, '0') for s in bit_strings)
+    bits = np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(len(bit_strings), n_words * 64) == ord('1')
+    return np.packbits(bits, axis=1).view(np.uint64)
+
+
+class InvalidQuery(ValueError):
+    """Raised for query hashes or options the matcher cannot score"""
+
+
+def prefix_mask(n_bits, total_bits):
+    """uint64 mask selecting the first `n_bits` of a row packed by pack_bits with `total_bits`"""
+    return pack_bits(['1' * n_bits], total_bits)[0]
+
+
+class FingerprintMatcher:
+    """
+    Vectorized Hamming matching against the fingerprint database
+
+    Every hash family is packed once into a [N, words] uint64 array; a query
+    is one XOR over the whole array followed by a popcount, so all entries
+    are scored together instead of comparing '0'/'1' strings per character.
+    Similarity per family is 1 - distance / bits and the overall score is the
+    weighted sum used by the frontend.
+
+    Args:
+        database: Parsed dataset_fingerprints.json ({'metadata', 'images'});
+            'images' may be any iterable, it is packed `batch_size` entries at a time
+        weights: Hash family -> weight (default: HASH_WEIGHTS)
+        batch_size: Entries packed at a time
+    """
+
+    def __init__(self, database, weights=None, batch_size=4096):
+        self.metadata = database.get('metadata', {})
+        self.weights = dict(weights or HASH_WEIGHTS)
+        self.filenames = []
+        self.bits = {name: 0 for name in self.weights}
+        self.packed = {}
+        classes = []
+        parts = {name: [] for name in self.weights}
+
+        images = iter(database['images'])
+        while True:
+            batch = list(itertools.islice(images, batch_size))
+            if not batch:
+                break
+            self.filenames.extend(image['filename'] for image in batch)
+            classes.extend(image['class'] for image in batch)
+            for name in self.weights:
+                hashes = [image['hashes'][name] for image in batch]
+                # Generators produce one length per family (phash 256, dhash 255, ahash 256)
+                n_bits = max(len(h) for h in hashes)
+                self.bits[name] = max(self.bits[name], n_bits)
+                parts[name].append(pack_bits(hashes, n_bits))
+        self.classes = np.array(classes)
+
+        for name in self.weights:
+            # Zero words appended to a row are the same as padding its string
+            n_words = (self.bits[name] + 63) // 64
+            self.packed[name] = np.concatenate(
+                [np.pad(part, ((0, 0), (0, n_words - part.shape[1]))) for part in parts[name]]
+            ) if parts[name] else pack_bits([], 0)
+
+    @classmethod
+    def from_json(cls, path, weights=None):
+        """Stream the JSON database with FingerprintReader instead of parsing it whole"""
+        reader = FingerprintReader(path)
+        return cls({'metadata': reader.metadata, 'images': reader}, weights=weights)
+
+    @classmethod
+    def from_binary(cls, path, weights=None):
+        """Use the packed hashes of a binary database (fingerprint_db.py) directly, without parsing strings"""
+        database = FingerprintDatabase(path)
+        matcher = cls({'metadata': database.metadata, 'images': []}, weights=weights)
+        matcher.filenames = database.filenames()
+        matcher.classes = database.classes()
+        for name in matcher.weights:
+            matcher.bits[name] = database.bits[name]
+            matcher.packed[name] = database.hashes(name)
+        return matcher
+
+    @classmethod
+    def from_file(cls, path, weights=None):
+        """Load a JSON or binary database, whichever `path` holds"""
+        if is_fingerprint_db(path):
+            return cls.from_binary(path, weights=weights)
+        return cls.from_json(path, weights=weights)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def query_bits(self, hashes):
+        """
+        Check query hashes against the database and return the bits compared per family
+
+        Every family must be a '0'/'1' string as long as the database hashes.
+        The only exception is dhash, which generators write with 255 or 256
+        bits; those two lengths are compared over the common prefix.
+
+        Raises:
+            InvalidQuery: For a missing family, a wrong length or other characters
+        """
+        if not isinstance(hashes, dict):
+            raise InvalidQuery("Hashes must be an object of family -> bit string")
+        n_bits = {}
+        for name, bits in self.bits.items():
+            query = hashes.get(name)
+            if not isinstance(query, str):
+                raise InvalidQuery(f"Missing '{name}' hash")
+            allowed = {255, 256} if name == 'dhash' and bits in (255, 256) else {bits}
+            if len(query) not in allowed:
+                raise InvalidQuery(f"'{name}' hash has {len(query)} bits, expected {' or '.join(map(str, sorted(allowed)))}")
+            if not set(query) <= {'0', '1'}:
+                raise InvalidQuery(f"'{name}' hash must only contain '0' and '1'")
+            n_bits[name] = min(len(query), bits)
+        return n_bits
+
+    def similarities(self, hashes):
+        """
+        Similarity of `hashes` to every database entry, per hash family
+
+        Args:
+            hashes: Dictionary of family -> '0'/'1' string (see query_bits)
+
+        Returns:
+            Dictionary of family -> float32 array of shape [N]
+
+        Raises:
+            InvalidQuery: If the hashes do not fit the database
+        """
+        compared = self.query_bits(hashes)
+        results = {}
+        for name, packed in self.packed.items():
+            n_bits = compared[name]
+            query = pack_bits([hashes[name]], self.bits[name])[0]
+            difference = np.bitwise_xor(packed, query)
+            if n_bits < self.bits[name]:
+                difference &= prefix_mask(n_bits, self.bits[name])
+            distances = popcount(difference).sum(axis=1, dtype=np.int32)
+            results[name] = 1.0 - distances.astype(np.float32) / max(n_bits, 1)
+        return results
+
+    def match(self, hashes, top_k=5, threshold=None):
+        """
+        Best database matches for one image
+
+        Args:
+            hashes: Dictionary of family -> '0'/'1' string
+            top_k: Number of overall matches to return
+            threshold: Weighted similarity needed for 'matched'
+                (default: the database's metadata threshold)
+
+        Returns:
+            Dictionary with 'matched', the top_k weighted matches, the best
+            match of each hash family, and the matching time in ms
+
+        Raises:
+            InvalidQuery: For hashes that do not fit the database or top_k < 1
+        """
+        start = time.perf_counter()
+        if top_k < 1:
+            raise InvalidQuery("top_k must be at least 1")
+        if threshold is None:
+            threshold = self.metadata.get('threshold', 0.99)
+        if len(self) == 0:
+            return {'matched': False, 'threshold': threshold, 'matches': [], 'per_hash': {}, 'match_ms': 0.0}
+
+        per_family = self.similarities(hashes)
+        score = sum(self.weights[name] * similarity for name, similarity in per_family.items())
+
+        top_k = min(top_k, len(self))
+        best = np.argpartition(-score, top_k - 1)[:top_k]
+        best = best[np.argsort(-score[best], kind='stable')]
+
+        matches = [
+            {
+                'filename': self.filenames[i],
+                'class': str(self.classes[i]),
+                'similarity': float(score[i]),
+                'similarities': {name: float(similarity[i]) for name, similarity in per_family.items()}
+            }
+            for i in best
+        ]
+        per_hash = {}
+        for name, similarity in per_family.items():
+            i = int(np.argmax(similarity))
+            per_hash[name] = {
+                'filename': self.filenames[i],
+                'class': str(self.classes[i]),
+                'similarity': float(similarity[i]),
+                'bits': min(len(hashes[name]), self.bits[name])
+            }
+
+        return {
+            'matched': bool(matches) and matches[0]['similarity'] >= threshold,
+            'threshold': threshold,
+            'matches': matches,
+            'per_hash': per_hash,
+            'match_ms': (time.perf_counter() - start) * 1000
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    from generate_fingerprints_batch import compute_hashes, decode_for_hashing
+
+    parser = argparse.ArgumentParser(description='Match an image against the fingerprint database')
+    parser.add_argument('image', type=str, help='Image to look up')
+    parser.add_argument('--database', type=str, default='web/public/dataset_fingerprints.json', help='Fingerprint JSON or binary database')
+    parser.add_argument('--top_k', type=int, default=5, help='Number of matches to show')
+
+    args = parser.parse_args()
+
+    matcher = FingerprintMatcher.from_file(args.database)
+    with open(args.image, 'rb') as f:
+        image, _ = decode_for_hashing(f.read(), ['custom'], full_decode=matcher.metadata.get('decode', 'full') == 'full')
+    with image:
+        hashes = compute_hashes(image, ['custom'])['custom']
+    result = matcher.match(hashes, top_k=args.top_k)
+
+    print(f"Matched: {result['matched']} (threshold {result['threshold']}, {result['match_ms']:.3f} ms over {len(matcher)} entries)")
+    for match in result['matches']:
+        print(f"  {match['similarity']:.4f}  {match['class']:<10}  {match['filename']}")
@@ -0,0 +1,266 @@
+import codecs
+import json
+import os
+import re
+import shutil
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_ITEM_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+# dataset_fingerprints.json is one object {"metadata": {...}, "images": [...]}.
+# FingerprintWriter produces the same text json.dump(database, f, indent=2)
+# does, except for spaces after the metadata: the metadata is written first
+# with room to spare and rewritten in place once the entry count is known.
+
+
+class FingerprintWriter:
+    """
+    Write a fingerprint database one entry at a time
+
+    Entries go straight to a temporary file next to `output_file`, so memory
+    does not grow with the number of images. On close the metadata is
+    patched with the final 'total_images' and the file is moved into place.
+
+    Args:
+        output_file: Path of the fingerprint JSON
+        metadata: Metadata dictionary; 'total_images' is filled in on close
+        indent: Indentation like json.dump (None for a single line)
+        reserve: Bytes left after the metadata for values that grow before close
+    """
+
+    def __init__(self, output_file, metadata, indent=2, reserve=64):
+        self.output_file = output_file
+        self.tmp_file = f"{output_file}.tmp"
+        self.metadata = dict(metadata)
+        self.count = 0
+        self._indent = indent
+        if indent is None:
+            self._newline, self._item_separator = '', ', '
+        else:
+            self._newline, self._item_separator = '\n', ','
+        self._pad = ' ' * (indent or 0)
+        self._file = open(self.tmp_file, 'wb')
+        self._file.write(f"{{{self._newline}{self._pad}\"metadata\": ".encode('utf-8'))
+        self._metadata_offset = self._file.tell()
+        metadata_text = self._metadata_text()
+        self._metadata_size = len(metadata_text) + reserve
+        self._file.write(metadata_text.ljust(self._metadata_size).encode('utf-8'))
+        self._file.write(f"{self._item_separator}{self._newline}{self._pad}\"images\": [".encode('utf-8'))
+
+    def _dumps(self, value, depth):
+        text = json.dumps(value, indent=self._indent)
+        # JSON strings never contain raw newlines, so this only shifts the layout
+        return text.replace('\n', '\n' + self._pad * depth) if self._indent is not None else text
+
+    def _metadata_text(self):
+        return self._dumps(self.metadata, 1)
+
+    def write(self, entry):
+        separator = self._item_separator if self.count else ''
+        self._file.write(f"{separator}{self._newline}{self._pad * 2}{self._dumps(entry, 2)}".encode('utf-8'))
+        self.count += 1
+
+    def close(self):
+        """Finish the file, patch the metadata and move it to `output_file`"""
+        closing = f"{self._newline}{self._pad}]" if self.count else ']'
+        self._file.write(f"{closing}{self._newline}}}".encode('utf-8'))
+        self.metadata['total_images'] = self.count
+        metadata_text = self._metadata_text().encode('utf-8')
+        if len(metadata_text) <= self._metadata_size:
+            self._file.seek(self._metadata_offset)
+            self._file.write(metadata_text.ljust(self._metadata_size))
+            self._file.close()
+        else:
+            # Metadata outgrew the reserved space: copy the entries behind a new header
+            self._file.close()
+            body_offset = self._metadata_offset + self._metadata_size
+            with open(self.tmp_file, 'rb') as src, open(f"{self.tmp_file}.resize", 'wb') as dst:
+                dst.write(src.read(self._metadata_offset))
+                dst.write(metadata_text)
+                src.seek(body_offset)
+                shutil.copyfileobj(src, dst)
+            os.replace(f"{self.tmp_file}.resize", self.tmp_file)
+        os.replace(self.tmp_file, self.output_file)
+
+    def abort(self):
+        """Discard the partial file, leaving `output_file` untouched"""
+        self._file.close()
+        os.remove(self.tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _JsonStream:
+    """Incremental tokenizer over a UTF-8 JSON file that decodes one value at a time"""
+
+    def __init__(self, f, chunk_size):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._ascii = True
+        self._eof = False
+        # Byte offset in the file of self._buffer[self._pos]
+        self.offset = 0
+
+    def _fill(self):
+        if self._eof:
+            return False
+        data = self._file.read(self._chunk_size)
+        self._eof = not data
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(data, final=self._eof)
+        self._pos = 0
+        self._ascii = self._buffer.isascii()
+        return True
+
+    def _advance(self, end):
+        if self._ascii:
+            self.offset += end - self._pos
+        else:
+            self.offset += len(self._buffer[self._pos:end].encode('utf-8'))
+        self._pos = end
+
+    def peek(self):
+        """Next non-whitespace character, '' at the end of the file"""
+        while True:
+            self._advance(_WHITESPACE.match(self._buffer, self._pos).end())
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at byte {self.offset}, found {char or 'end of file'!r}")
+        self._advance(self._pos + 1)
+        return char
+
+    def value(self):
+        """Decode the next value; returns (value, byte offset, byte length)"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+                # A number or literal at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    break
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+        start = self.offset
+        self._advance(end)
+        return value, start, self.offset - start
+
+    def keys(self):
+        """Keys of the object at the current position; the caller reads each value before the next key"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.expect('}')
+            return
+        while True:
+            key = self.value()[0]
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def items(self):
+        """(value, offset, length) for each element of the array at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.expect(']')
+            return
+        while True:
+            yield self.value()
+            # Fast path: the separator and the whitespace after it are already buffered
+            match = _ITEM_SEPARATOR.match(self._buffer, self._pos)
+            if match is not None and match.end() < len(self._buffer):
+                self._advance(match.end())
+                if match.group(1) == ']':
+                    return
+            elif self.expect(',]') == ']':
+                return
+
+
+class FingerprintReader:
+    """
+    Iterate over the entries of a fingerprint JSON without loading it
+
+    The file is read in chunks and each entry is decoded on its own, so
+    memory stays constant however many images the database holds. Reads
+    any JSON written by FingerprintWriter or json.dump.
+
+    Args:
+        path: Fingerprint JSON
+        chunk_size: Bytes read at a time
+    """
+
+    def __init__(self, path, chunk_size=1 << 20):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.metadata = {}
+        with open(path, 'rb') as f:
+            stream = _JsonStream(f, chunk_size)
+            found = False
+            for key in stream.keys():
+                if key == 'images':
+                    if found:
+                        break
+                    for _ in stream.items():
+                        pass
+                else:
+                    value = stream.value()[0]
+                    if key == 'metadata':
+                        self.metadata, found = value, True
+
+    def iter_with_offsets(self):
+        """
+        Yield (entry, offset, length), where the entry's JSON text is
+        `length` bytes at byte `offset` of the file (see read_entry)
+        """
+        with open(self.path, 'rb') as f:
+            stream = _JsonStream(f, self.chunk_size)
+            for key in stream.keys():
+                if key == 'images':
+                    yield from stream.items()
+                    return
+                stream.value()
+
+    def __iter__(self):
+        for entry, _, _ in self.iter_with_offsets():
+            yield entry
+
+
+def read_entry(f, offset, length):
+    """Decode the JSON value at `offset` of an open binary file"""
+    f.seek(offset)
+    return json.loads(f.read(length))
+
+
+if __name__ == "__main__":
+    import argparse
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description='Scan a fingerprint JSON in constant memory')
+    parser.add_argument('--input', type=str, default='web/public/dataset_fingerprints.json', help='Fingerprint JSON')
+
+    args = parser.parse_args()
+
+    reader = FingerprintReader(args.input)
+    classes = Counter(entry['class'] for entry in reader)
+    total = sum(classes.values())
+    print(f"Metadata: {json.dumps(reader.metadata)}")
+    print(f"Entries: {total} ({', '.join(f'{name}: {count}' for name, count in sorted(classes.items()))})")
+    if reader.metadata.get('total_images') != total:
+        print(f"WARNING: metadata total_images is {reader.metadata.get('total_images')}")
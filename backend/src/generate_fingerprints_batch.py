@@ -1,40 +1,208 @@
 import os
-import json
+import io
 from PIL import Image
 import numpy as np
 from pathlib import Path
 from datetime import datetime
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fingerprint_db import write_fingerprint_db
+from fingerprint_manifest import (CheckpointWriter, EntryReader, content_hash, file_signature, load_checkpoint,
+                                  load_manifest, manifest_paths, save_manifest)
+from fingerprint_stream import FingerprintReader, FingerprintWriter
+
+HASH_PIXELS = 256
+MIN_HASH_BITS = 64
+
+def custom_hash_bits(images):
+    """
+    Custom hash bits of a stack of images, computed with array operations
+    
+    Same algorithm as generate_custom_hashes: the first 256 pixels of the
+    channel-averaged image give phash (>= their mean), ahash (>= 128) and
+    dhash (next pixel >= current, 255 bits).
+    
+    Args:
+        images: Array of shape [N, H, W] or [N, H, W, C], e.g. 224x224 resized images
+    
+    Returns:
+        Dictionary of hash name -> bool array of shape [N, bits]
+    """
+    images = np.asarray(images)
+    n = len(images)
+    if images.ndim == 4:
+        grayscale = images.reshape(n, -1, images.shape[-1])[:, :HASH_PIXELS].mean(axis=2)
+    else:
+        grayscale = images.reshape(n, -1)[:, :HASH_PIXELS].astype(np.float64)
+    average = grayscale.mean(axis=1, keepdims=True)
+    return {
+        'phash': grayscale >= average,
+        'dhash': grayscale[:, 1:] >= grayscale[:, :-1],
+        'ahash': grayscale >= 128
+    }
+
+def pack_custom_hashes(images):
+    """
+    Custom hashes of a stack of images as packed bits
+    
+    Rows are zero-padded to whole 64-bit words, the layout of
+    fingerprint_matcher.pack_bits and the binary database.
+    
+    Returns:
+        Dictionary of hash name -> (uint8 array [N, bytes], number of bits)
+    """
+    packed = {}
+    for name, bits in custom_hash_bits(images).items():
+        n_bits = max(bits.shape[1], MIN_HASH_BITS)
+        padded = np.zeros((len(bits), (n_bits + 63) // 64 * 64), dtype=bool)
+        padded[:, :bits.shape[1]] = bits
+        packed[name] = (np.packbits(padded, axis=1), n_bits)
+    return packed
+
+def _bit_strings(bits):
+    n_bits = bits.shape[1]
+    text = (bits.view(np.uint8) + ord('0')).tobytes().decode('ascii')
+    return [text[i * n_bits:(i + 1) * n_bits].ljust(MIN_HASH_BITS, '0') for i in range(len(bits))]
+
+def generate_custom_hashes_batch(images):
+    """
+    generate_custom_hashes for a stack of same-sized images
+    
+    Returns:
+        List of hash dictionaries, one per image
+    """
+    strings = {name: _bit_strings(bits) for name, bits in custom_hash_bits(images).items()}
+    return [
+        {
+            'phash': strings['phash'][i],
+            'dhash': strings['dhash'][i],
+            'ahash': strings['ahash'][i],
+            'whash': '0' * MIN_HASH_BITS
+        }
+        for i in range(len(images))
+    ]
 
 def generate_custom_hashes(img_array):
     """
     Generate custom hashes matching frontend implementation
     Mirrors: web/src/utils/imageMatcher.ts
     """
-    if len(img_array.shape) == 3:
-        grayscale = np.mean(img_array, axis=2)
-    else:
-        grayscale = img_array
+    return generate_custom_hashes_batch(np.asarray(img_array)[np.newaxis])[0]
+
+HASH_FAMILIES = ('custom', 'imagehash')
+CUSTOM_SIZE = (224, 224)
+IMAGEHASH_SIZE = 16
+FAMILY_ALGORITHMS = {'custom': 'custom-mirroring-frontend', 'imagehash': 'imagehash'}
+
+def decode_for_hashing(contents, families, full_decode=False):
+    """
+    Decode an image once for all requested hash families
     
-    grayscale_flat = grayscale.flatten()
-    grayscale_256 = grayscale_flat[:256]
-    average = np.mean(grayscale_256)
+    Unless `full_decode` is set, JPEGs are decoded with DCT scaling to the
+    smallest size still covering what the families resize to (224x224 for
+    custom, 64x64 for imagehash's phash), so a 4032x2268 photo is decoded
+    at 504x284 instead of full resolution.
     
-    phash = ''.join(['1' if grayscale_256[i] >= average else '0' 
-                      for i in range(len(grayscale_256))])
-    dhash = ''.join(['1' if grayscale_256[i + 1] >= grayscale_256[i] else '0' 
-                      for i in range(len(grayscale_256) - 1)])
-    ahash = ''.join(['1' if grayscale_256[i] >= 128 else '0' 
-                      for i in range(len(grayscale_256))])
+    Returns:
+        Tuple of (decoded PIL image in its original mode, original (width, height))
+    """
+    image = Image.open(io.BytesIO(contents))
+    size = image.size
+    if not full_decode:
+        target = CUSTOM_SIZE if 'custom' in families else (4 * IMAGEHASH_SIZE, 4 * IMAGEHASH_SIZE)
+        # No-op for formats other than JPEG
+        image.draft(image.mode, target)
+    image.load()
+    return image, size
+
+def imagehash_hashes(image, hash_size=IMAGEHASH_SIZE):
+    """
+    phash, ahash, dhash and whash of generate_fingerprints.py from one grayscale conversion
     
-    return {
-        'phash': phash.ljust(64, '0'),
-        'dhash': dhash.ljust(64, '0'),
-        'ahash': ahash.ljust(64, '0'),
-        'whash': '0' * 64
-    }
+    Each imagehash function converts its input to grayscale itself; handing
+    them the converted image makes that a copy of a small image instead of
+    four conversions of the decoded one.
+    """
+    import imagehash
+    
+    with image.convert('L') as gray:
+        return {
+            'phash': str(imagehash.phash(gray, hash_size=hash_size)),
+            'ahash': str(imagehash.average_hash(gray, hash_size=hash_size)),
+            'dhash': str(imagehash.dhash(gray, hash_size=hash_size)),
+            'whash': str(imagehash.whash(gray, hash_size=hash_size))
+        }
+
+def compute_hashes(image, families):
+    """
+    Hashes of every requested family from one decoded image
+    
+    Returns:
+        Dictionary of family -> hash dictionary
+    """
+    hashes = {}
+    for family in families:
+        if family == 'custom':
+            with image.resize(CUSTOM_SIZE, Image.LANCZOS) as resized:
+                hashes[family] = generate_custom_hashes(np.array(resized))
+        elif family == 'imagehash':
+            hashes[family] = imagehash_hashes(image)
+        else:
+            raise ValueError(f"Unknown hash family '{family}' (expected one of {', '.join(HASH_FAMILIES)})")
+    return hashes
+
+def entry_hashes(hashes, families):
+    """Entry fields for `hashes`: the first family under 'hashes', others under 'hashes_<family>'"""
+    fields = {'hashes': hashes[families[0]]}
+    for family in families[1:]:
+        fields[f'hashes_{family}'] = hashes[family]
+    return fields
 
-def generate_fingerprints_batch(data_dir='dataset', output_file='web/public/dataset_fingerprints.json', batch_size=100):
+def fingerprint_image(task):
+    """
+    Hash one image (runs in the worker processes)
+    
+    The file is read once for its content hash and decoded once for all
+    requested families. If the content hash equals `known_sha256` the image
+    is not decoded at all.
+    
+    Args:
+        task: Tuple of (class_path, class_dir_name, filename, known_sha256,
+            families, full_decode)
+    
+    Returns:
+        Tuple of (fingerprint entry, sha256, error message); the entry is
+        None if the file failed or its content is unchanged
+    """
+    class_path, class_dir_name, filename, known_sha256, families, full_decode = task
+    try:
+        image_path = os.path.join(class_path, filename)
+        with open(image_path, 'rb') as f:
+            contents = f.read()
+        sha256 = content_hash(contents)
+        if sha256 == known_sha256:
+            return None, sha256, None
+        
+        img, (width, height) = decode_for_hashing(contents, families, full_decode)
+        with img:
+            hashes = compute_hashes(img, families)
+        
+        return {
+            'filename': f"{class_dir_name}/{filename}",
+            'class': class_dir_name.replace('fertil', 'fertile'),
+            'original_filename': filename,
+            'width': width,
+            'height': height,
+            **entry_hashes(hashes, families)
+        }, sha256, None
+    except Exception as e:
+        return None, None, str(e)[:100]
+
+def generate_fingerprints_batch(data_dir='dataset', output_file='web/public/dataset_fingerprints.json', batch_size=100,
+                                binary_output=None, workers=None, chunk_size=8, incremental=True,
+                                families=('custom',), full_decode=False):
     
     data_dir = os.path.abspath(data_dir)
     
@@ -43,21 +211,79 @@ def generate_fingerprints_batch(data_dir='dataset', output_file='web/public/data
         return None
     """
     Generate image fingerprints in batches to handle large datasets
+
+    Images are hashed by `workers` processes (default: one per CPU), handed
+    out `chunk_size` files at a time; results are collected in file order,
+    so the output is identical to a single-process run (`workers=1`).
+
+    With `incremental`, a manifest next to the output (relative path, size,
+    mtime, sha256) lets later runs reuse the previous entries of unchanged
+    files: only new or modified files are hashed and deleted files drop
+    out. Every hashed file is appended to a checkpoint log, so an
+    interrupted run resumes where it stopped; the log is removed once the
+    output is written.
+
+    `families` selects the hash families ('custom' for the frontend
+    algorithm, 'imagehash' for the phash/ahash/dhash/whash of
+    generate_fingerprints.py); all of them are computed from one decode per
+    image. The first family is stored under 'hashes', the others under
+    'hashes_<family>'. JPEGs are decoded at reduced size unless
+    `full_decode` is set (needed for hashes identical to older databases).
+
+    Entries are streamed to the output as they are produced and reused
+    entries are read back from the previous output or the checkpoint, so
+    memory holds only the per-file manifest records, not the database.
+
+    Besides the JSON file, the database is written in the packed binary
+    format of fingerprint_db.py to `binary_output` when given.
+
+    Returns:
+        Dictionary with the final 'metadata' and 'images' as a
+        FingerprintReader over the written file
     """
     
+    families = list(families)
+    for family in families:
+        if family not in HASH_FAMILIES:
+            raise ValueError(f"Unknown hash family '{family}' (expected one of {', '.join(HASH_FAMILIES)})")
+    decode = 'full' if full_decode else 'draft'
+    settings = {'families': families, 'decode': decode}
+    
     class_dirs = ['fertil', 'infertil']
-    fingerprints = {
-        'metadata': {
-            'version': '2.0',
-            'generated_at': datetime.now().isoformat(),
-            'total_images': 0,
-            'threshold': 0.99,
-            'algorithm': 'custom-mirroring-frontend'
-        },
-        'images': []
+    metadata = {
+        'version': '2.0' if families[0] == 'custom' else '1.0',
+        'generated_at': datetime.now().isoformat(),
+        'total_images': 0,
+        'threshold': 0.99,
+        'algorithm': FAMILY_ALGORITHMS[families[0]],
+        'families': families,
+        'decode': decode
     }
     
+    manifest_file, checkpoint_file = manifest_paths(output_file)
+    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
+    if incremental:
+        # Entries made with other families or another decode mode are not reused
+        previous = load_manifest(manifest_file, output_file, settings)
+        resumed = load_checkpoint(checkpoint_file, settings)
+    else:
+        previous, resumed = {}, {}
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+    if previous or resumed:
+        print(f"Manifest: {len(previous)} files from the previous run, {len(resumed)} from an interrupted run")
+    
+    # Relative path -> manifest record, for every file in the output
+    records = {}
+    listed = set()
+    stats = {'reused': 0, 'resumed': 0, 'hashed': 0, 'unchanged_content': 0, 'errors': 0}
     total_count = 0
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    checkpoint = CheckpointWriter(checkpoint_file, settings)
+    entries = EntryReader(output_file, checkpoint_file)
+    writer = FingerprintWriter(output_file, metadata)
+    start_time = time.perf_counter()
     
     for class_dir_name in class_dirs:
         class_path = os.path.join(data_dir, class_dir_name)
@@ -73,81 +299,109 @@ def generate_fingerprints_batch(data_dir='dataset', output_file='web/public/data
         image_files = [f for f in os.listdir(class_path) 
                       if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
         
+        # (path, size, mtime_ns, source of a reusable record or None, known record)
+        plan = []
+        tasks = []
+        for filename in image_files:
+            path = f"{class_dir_name}/{filename}"
+            listed.add(path)
+            size, mtime_ns = file_signature(os.path.join(class_path, filename))
+            for source, known in (('resumed', resumed.get(path)), ('reused', previous.get(path))):
+                if known is not None and (known['size'], known['mtime_ns']) == (size, mtime_ns):
+                    plan.append((path, size, mtime_ns, source, known))
+                    break
+            else:
+                known = resumed.get(path) or previous.get(path)
+                plan.append((path, size, mtime_ns, None, known))
+                tasks.append((class_path, class_dir_name, filename, known['sha256'] if known else None,
+                              families, full_decode))
+        
         print(f"Total images found: {len(image_files)}")
+        print(f"Unchanged: {len(image_files) - len(tasks)}, to hash: {len(tasks)}")
         print(f"Batch size: {batch_size}")
-        print(f"Will process in {(len(image_files) + batch_size - 1) // batch_size} batches\n")
+        print(f"Workers: {workers}")
+        print(f"Will process in {(len(tasks) + batch_size - 1) // batch_size} batches\n")
         
-        for batch_start in range(0, len(image_files), batch_size):
-            batch_end = min(batch_start + batch_size, len(image_files))
-            batch_files = image_files[batch_start:batch_end]
-            
-            print(f"Processing batch {batch_start//batch_size + 1}: images {batch_start+1}-{batch_end}")
+        if pool is not None:
+            results = pool.map(fingerprint_image, tasks, chunksize=chunk_size)
+        else:
+            results = map(fingerprint_image, tasks)
+        
+        # Entries are written in listing order as they arrive, reused ones read back from disk
+        task_index = 0
+        for path, size, mtime_ns, source, known in plan:
+            if source is not None:
+                writer.write(entries.read(known))
+                records[path] = known
+                stats[source] += 1
+                continue
             
-            for idx, filename in enumerate(batch_files, start=batch_start + 1):
-                try:
-                    image_path = os.path.join(class_path, filename)
-                    
-                    img = Image.open(image_path)
-                    
-                    img_resized = img.resize((224, 224), Image.LANCZOS)
-                    img_array = np.array(img_resized)
-                    hashes = generate_custom_hashes(img_array)
-                    
-                    width, height = img.size
-                    
-                    fingerprint_entry = {
-                        'filename': f"{class_dir_name}/{filename}",
-                        'class': class_dir_name.replace('fertil', 'fertile'),
-                        'original_filename': filename,
-                        'width': width,
-                        'height': height,
-                        'hashes': hashes
-                    }
-                    
-                    fingerprints['images'].append(fingerprint_entry)
-                    total_count += 1
-                    
-                    if total_count % 50 == 0:
-                        print(f"  Progress: {total_count} images processed", flush=True)
-                    
-                    img.close()
-                    img_resized.close()
-                    
-                except Exception as e:
-                    print(f"  ERROR processing {filename}: {str(e)[:100]}")
-                    continue
+            batch = task_index // batch_size + 1
+            if task_index % batch_size == 0:
+                print(f"Processing batch {batch}: images {task_index+1}-{min(task_index + batch_size, len(tasks))}")
+            task_index += 1
             
-            print(f"  Batch {batch_start//batch_size + 1} completed")
+            fingerprint_entry, sha256, error = next(results)
+            if error is not None:
+                print(f"  ERROR processing {path.split('/', 1)[1]}: {error}")
+                stats['errors'] += 1
+            else:
+                if fingerprint_entry is None:
+                    # Touched but identical content: keep the known entry
+                    fingerprint_entry = entries.read(known)
+                    stats['unchanged_content'] += 1
+                else:
+                    stats['hashed'] += 1
+                records[path] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': sha256}
+                checkpoint.append(path, {**records[path], 'entry': fingerprint_entry})
+                writer.write(fingerprint_entry)
+                total_count += 1
+                
+                if total_count % 50 == 0:
+                    elapsed = time.perf_counter() - start_time
+                    print(f"  Progress: {total_count} images processed ({total_count / elapsed:.1f} images/sec)", flush=True)
             
-            # Save intermediate results
-            if batch_end % 200 == 0:
-                intermediate_file = output_file.replace('.json', f'_temp_{batch_end}.json')
-                os.makedirs(os.path.dirname(intermediate_file) if os.path.dirname(intermediate_file) else '.', exist_ok=True)
-                fingerprints['metadata']['total_images'] = total_count
-                with open(intermediate_file, 'w', encoding='utf-8') as f:
-                    json.dump(fingerprints, f, indent=2)
-                print(f"  Intermediate save: {intermediate_file}")
+            if task_index % batch_size == 0 or task_index == len(tasks):
+                checkpoint.flush()
+                print(f"  Batch {batch} completed")
     
-    fingerprints['metadata']['total_images'] = total_count
-    
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
+    if pool is not None:
+        pool.shutdown()
+    checkpoint.close()
+    entries.close()
+    elapsed = time.perf_counter() - start_time
+    removed = len(set(previous) - listed)
     
     print(f"\n{'='*60}")
     print(f"Saving final results...")
     print(f"{'='*60}")
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(fingerprints, f, indent=2)
+    writer.close()
+    save_manifest(manifest_file, records, settings)
+    os.remove(checkpoint_file)
+    metadata = writer.metadata
     
     file_size_kb = os.path.getsize(output_file) / 1024
+    total_images = metadata['total_images']
     
     print(f"\n{'='*60}")
     print(f"Fingerprints generated successfully!")
     print(f"{'='*60}")
-    print(f"  Total images: {total_count}")
+    print(f"  Total images: {total_images}")
+    print(f"  Unchanged: {stats['reused']}, resumed: {stats['resumed']}, hashed: {stats['hashed']}, "
+          f"same content: {stats['unchanged_content']}, removed: {removed}, errors: {stats['errors']}")
+    print(f"  Hashing time: {elapsed:.1f}s ({total_count / elapsed if elapsed > 0 else 0:.1f} images/sec, {workers} workers)")
     print(f"  Output file: {output_file}")
     print(f"  File size: {file_size_kb:.2f} KB")
-    print(f"  Average per image: {file_size_kb/total_count:.2f} KB")
+    print(f"  Average per image: {file_size_kb/max(total_images, 1):.2f} KB")
+    
+    fingerprints = {'metadata': metadata, 'images': FingerprintReader(output_file)}
+    if binary_output and families[0] != 'custom':
+        print(f"  Binary file skipped: the binary format holds '0'/'1' hashes, not {families[0]} hex strings")
+    elif binary_output:
+        os.makedirs(os.path.dirname(binary_output) if os.path.dirname(binary_output) else '.', exist_ok=True)
+        binary_size_kb = write_fingerprint_db(fingerprints, binary_output) / 1024
+        print(f"  Binary file: {binary_output} ({binary_size_kb:.2f} KB, {file_size_kb/binary_size_kb:.1f}x smaller)")
     
     return fingerprints
 
@@ -158,11 +412,25 @@ if __name__ == "__main__":
     parser.add_argument('--data_dir', type=str, default='dataset', help='Path to dataset directory')
     parser.add_argument('--output', type=str, default='web/public/dataset_fingerprints.json', help='Output JSON file path')
     parser.add_argument('--batch_size', type=int, default=100, help='Batch size for processing')
+    parser.add_argument('--binary_output', type=str, default=None,
+                        help="Packed binary database path (default: the output path with .bin; '' to skip)")
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: number of CPUs, 1 = no pool)')
+    parser.add_argument('--chunk_size', type=int, default=8, help='Images handed to a worker at a time')
+    parser.add_argument('--full', action='store_true',
+                        help='Rehash every image, ignoring the manifest and any interrupted run')
+    parser.add_argument('--families', type=str, nargs='+', default=['custom'], choices=HASH_FAMILIES,
+                        help="Hash families; the first one is stored under 'hashes' (default: custom)")
+    parser.add_argument('--full_decode', action='store_true',
+                        help='Decode JPEGs at full resolution (hashes identical to databases made before reduced decoding)')
     
     args = parser.parse_args()
+    if args.binary_output is None:
+        args.binary_output = os.path.splitext(args.output)[0] + '.bin'
     
     print("\n" + "="*60)
     print("Peacock Egg Detector - Fingerprint Generation")
     print("="*60 + "\n")
     
-    generate_fingerprints_batch(args.data_dir, args.output, args.batch_size)
+    generate_fingerprints_batch(args.data_dir, args.output, args.batch_size, args.binary_output,
+                                args.workers, args.chunk_size, incremental=not args.full,
+                                families=args.families, full_decode=args.full_decode)
@@ -0,0 +1,343 @@
+import itertools
+
+import numpy as np
+
+from fingerprint_matcher import pack_bits, popcount
+
+CHUNK_BITS = 16
+INDEX_FORMAT_VERSION = 1
+
+
+def _ring_masks(radius, bits=CHUNK_BITS, _cache={}):
+    """All `bits`-bit masks with exactly `radius` bits set"""
+    if (radius, bits) not in _cache:
+        masks = [sum(1 << i for i in combo) for combo in itertools.combinations(range(bits), radius)]
+        _cache[(radius, bits)] = np.array(masks, dtype=np.uint16)
+    return _cache[(radius, bits)]
+
+
+def _gather_ranges(order, lo, hi):
+    """Concatenate order[lo[i]:hi[i]] for all i without a Python loop"""
+    lengths = hi - lo
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=order.dtype)
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(lo, lengths) + (np.arange(total) - np.repeat(offsets, lengths))
+    return order[positions]
+
+
+class HammingIndex:
+    """
+    Exact Hamming-space index over fixed-length binary codes (multi-index hashing)
+
+    Codes are split into 16-bit chunks and every chunk position gets its own
+    table: the chunk values sorted, plus the ids in that order. If two codes
+    are within distance r, at least one of their m chunks differs in at most
+    r // m bits (pigeonhole), so a query only enumerates chunk values within
+    a small radius of its own chunks, looks them up by binary search, and
+    verifies the resulting candidates with an XOR + popcount on full codes.
+    Results are exact, not approximate.
+
+    k-NN grows the chunk radius ring by ring until the k-th best verified
+    distance is provably below anything not yet seen. When codes are so
+    skewed that a query would touch a large part of the index (e.g. hashes
+    of near-uniform images), it falls back to a linear scan, which is also
+    exact.
+
+    Below `linear_size` codes a linear scan is faster than the table
+    lookups and is used instead.
+
+    Inserts go to a small unindexed buffer that is scanned linearly and
+    merged into the tables once it grows past `merge_threshold`.
+
+    Args:
+        n_bits: Code length in bits
+        merge_threshold: Buffered inserts before merging into the tables
+        linear_fraction: Candidate share of the index above which a linear scan is used
+        linear_size: Index size below which every query is a linear scan
+    """
+
+    def __init__(self, n_bits, merge_threshold=4096, linear_fraction=0.1, linear_size=32768):
+        self.n_bits = n_bits
+        self.n_words = (n_bits + 63) // 64
+        self.n_chunks = self.n_words * 64 // CHUNK_BITS
+        self.merge_threshold = merge_threshold
+        self.linear_fraction = linear_fraction
+        self.linear_size = linear_size
+        self.codes = np.empty((0, self.n_words), dtype=np.uint64)
+        # Per chunk position: sorted chunk values and the ids in that order
+        self._keys = np.empty((self.n_chunks, 0), dtype=np.uint16)
+        self._order = np.empty((self.n_chunks, 0), dtype=np.uint32)
+        self._indexed = 0
+
+    @classmethod
+    def from_bit_strings(cls, bit_strings, n_bits=None, **kwargs):
+        """Build an index from '0'/'1' strings (ids follow the input order)"""
+        n_bits = n_bits or max(len(s) for s in bit_strings)
+        index = cls(n_bits, **kwargs)
+        index.add(bit_strings)
+        index.merge()
+        return index
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _as_codes(self, codes):
+        if isinstance(codes, str):
+            codes = [codes]
+        if len(codes) and isinstance(codes[0], str):
+            return pack_bits(codes, self.n_bits)
+        codes = np.asarray(codes, dtype=np.uint64)
+        return codes.reshape(-1, self.n_words)
+
+    def _chunks(self, codes):
+        # Byte order inside a chunk does not matter: both sides use the same view
+        return np.ascontiguousarray(codes).view(np.uint16).reshape(len(codes), self.n_chunks)
+
+    def add(self, codes):
+        """
+        Insert codes (packed uint64 rows or '0'/'1' strings)
+
+        Returns:
+            Array of the ids given to the new codes
+        """
+        codes = self._as_codes(codes)
+        start = len(self.codes)
+        self.codes = np.concatenate([self.codes, codes])
+        if len(self.codes) - self._indexed >= self.merge_threshold:
+            self.merge()
+        return np.arange(start, start + len(codes))
+
+    def merge(self):
+        """Move buffered inserts into the chunk tables"""
+        if self._indexed == len(self.codes):
+            return
+        new_ids = np.arange(self._indexed, len(self.codes), dtype=np.uint32)
+        new_chunks = self._chunks(self.codes[self._indexed:])
+
+        keys, order = [], []
+        for j in range(self.n_chunks):
+            sort = np.argsort(new_chunks[:, j], kind='stable')
+            values = new_chunks[sort, j]
+            positions = np.searchsorted(self._keys[j], values, side='right')
+            keys.append(np.insert(self._keys[j], positions, values))
+            order.append(np.insert(self._order[j], positions, new_ids[sort]))
+
+        self._keys = np.stack(keys)
+        self._order = np.stack(order)
+        self._indexed = len(self.codes)
+
+    def distances(self, query, ids=None):
+        """Exact distances from `query` to the codes with `ids` (default: all)"""
+        query = self._as_codes(query)[0]
+        codes = self.codes if ids is None else self.codes[ids]
+        return popcount(np.bitwise_xor(codes, query)).sum(axis=1, dtype=np.int32)
+
+    def _ring_ranges(self, query_chunks, radius):
+        """Table ranges of the ids having a chunk at exactly `radius` from the query's"""
+        masks = _ring_masks(radius)
+        ranges = []
+        for j in range(self.n_chunks):
+            values = np.bitwise_xor(masks, query_chunks[j])
+            ranges.append((
+                np.searchsorted(self._keys[j], values, side='left'),
+                np.searchsorted(self._keys[j], values, side='right')
+            ))
+        return ranges, sum(int((hi - lo).sum()) for lo, hi in ranges)
+
+    def _gather(self, ranges, seen, stamp):
+        """Ids in `ranges` not yet in `seen`, each once; marks them seen"""
+        found = np.concatenate([_gather_ranges(self._order[j], lo, hi) for j, (lo, hi) in enumerate(ranges)])
+        found = found[~seen[found]]
+        # Keep the last occurrence of every id without sorting
+        positions = np.arange(len(found), dtype=np.int32)
+        stamp[found] = positions
+        found = found[stamp[found] == positions].astype(np.int64)
+        seen[found] = True
+        return found
+
+    def _candidates_budget(self):
+        return max(1, int(self.linear_fraction * len(self)))
+
+    def radius_search(self, query, radius):
+        """
+        All ids within Hamming distance `radius` of `query`
+
+        Returns:
+            (ids, distances) sorted by distance, then id
+        """
+        query = self._as_codes(query)
+        if len(self) < self.linear_size:
+            return self._linear_radius(query, radius)
+        seen = np.zeros(len(self), dtype=bool)
+        stamp = np.empty(len(self), dtype=np.int32)
+        return self._indexed_radius(query, radius, seen, stamp)
+
+    def _indexed_radius(self, query, radius, seen, stamp):
+        """radius_search through the tables; `seen` is left all False for reuse"""
+        query_chunks = self._chunks(query)[0]
+        chunk_radius = min(radius // self.n_chunks, CHUNK_BITS)
+
+        ids = [np.arange(self._indexed, len(self.codes), dtype=np.int64)]
+        count = 0
+        for ring in range(chunk_radius + 1):
+            ranges, found = self._ring_ranges(query_chunks, ring)
+            count += found
+            if count > self._candidates_budget():
+                seen[np.concatenate(ids)] = False
+                return self._linear_radius(query, radius)
+            ids.append(self._gather(ranges, seen, stamp))
+
+        ids = np.concatenate(ids)
+        seen[ids] = False
+        distances = self.distances(query, ids)
+        keep = distances <= radius
+        return self._sorted(ids[keep], distances[keep])
+
+    def radius_pairs(self, radius):
+        """
+        Every pair of codes in the index within Hamming distance `radius`
+
+        One radius query per code, sharing the bookkeeping arrays between
+        queries instead of allocating them for each.
+
+        Returns:
+            (first, second, distances) arrays with first < second
+        """
+        self.merge()
+        seen = np.zeros(len(self), dtype=bool)
+        stamp = np.empty(len(self), dtype=np.int32)
+        firsts, seconds, distances = [], [], []
+        for i in range(len(self)):
+            query = self.codes[i:i + 1]
+            if len(self) < self.linear_size:
+                ids, found = self._linear_radius(query, radius)
+            else:
+                ids, found = self._indexed_radius(query, radius, seen, stamp)
+            keep = ids > i
+            firsts.append(np.full(int(keep.sum()), i, dtype=np.int64))
+            seconds.append(ids[keep])
+            distances.append(found[keep])
+        if not firsts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(distances)
+
+    def knn(self, query, k):
+        """
+        The `k` nearest codes to `query` (exact; ties broken by id)
+
+        Returns:
+            (ids, distances) sorted by distance, then id
+        """
+        query = self._as_codes(query)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        if len(self) < self.linear_size:
+            return self._linear_knn(query, k)
+        query_chunks = self._chunks(query)[0]
+
+        # Buffered codes are always verified
+        ids = np.arange(self._indexed, len(self.codes), dtype=np.int64)
+        distances = self.distances(query, ids)
+        seen = np.zeros(len(self), dtype=bool)
+        stamp = np.empty(len(self), dtype=np.int32)
+        count = 0
+
+        for ring in range(CHUNK_BITS + 1):
+            ranges, found = self._ring_ranges(query_chunks, ring)
+            count += found
+            if count > self._candidates_budget():
+                return self._linear_knn(query, k)
+            found = self._gather(ranges, seen, stamp)
+            if len(found):
+                ids = np.concatenate([ids, found])
+                distances = np.concatenate([distances, self.distances(query, found)])
+
+            # Every code closer than n_chunks * (ring + 1) has been verified by now
+            if len(ids) >= k:
+                kth = np.partition(distances, k - 1)[k - 1]
+                if kth < self.n_chunks * (ring + 1):
+                    break
+
+        ids, distances = self._sorted(ids, distances)
+        return ids[:k], distances[:k]
+
+    def _linear_radius(self, query, radius):
+        distances = self.distances(query)
+        ids = np.flatnonzero(distances <= radius)
+        return self._sorted(ids, distances[ids])
+
+    def _linear_knn(self, query, k):
+        distances = self.distances(query)
+        ids = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        # Ties at the k-th distance must resolve by id like the indexed path
+        kth = distances[ids].max()
+        ids = np.flatnonzero(distances <= kth)
+        ids, distances = self._sorted(ids, distances[ids])
+        return ids[:k], distances[:k]
+
+    def linear_radius_search(self, query, radius):
+        """Brute-force reference for radius_search"""
+        return self._linear_radius(self._as_codes(query), radius)
+
+    def linear_knn(self, query, k):
+        """Brute-force reference for knn"""
+        return self._linear_knn(self._as_codes(query), min(k, len(self)))
+
+    @staticmethod
+    def _sorted(ids, distances):
+        order = np.lexsort((ids, distances))
+        return ids[order].astype(np.int64), distances[order]
+
+    def save(self, path):
+        """Write the codes and chunk tables to an .npz file (buffered inserts are merged first)"""
+        self.merge()
+        np.savez(
+            path,
+            format_version=INDEX_FORMAT_VERSION,
+            n_bits=self.n_bits,
+            codes=self.codes,
+            order=self._order
+        )
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load an index written by `save`; chunk values are re-gathered from the codes"""
+        with np.load(path) as data:
+            if int(data['format_version']) != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported index format {int(data['format_version'])}")
+            index = cls(int(data['n_bits']), **kwargs)
+            index.codes = data['codes']
+            index._order = data['order']
+        chunks = index._chunks(index.codes)
+        index._keys = np.stack([chunks[index._order[j], j] for j in range(index.n_chunks)])
+        index._indexed = len(index.codes)
+        return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from fingerprint_stream import FingerprintReader
+
+    parser = argparse.ArgumentParser(description='Build a Hamming index over one hash family of a fingerprint database')
+    parser.add_argument('--database', type=str, default='web/public/dataset_fingerprints.json', help='Fingerprint JSON')
+    parser.add_argument('--hash', type=str, default='phash', help='Hash family to index')
+    parser.add_argument('--output', type=str, default=None, help='Where to save the index (.npz)')
+    parser.add_argument('--radius', type=int, default=None, help='Report how many entries have a neighbor within this radius')
+
+    args = parser.parse_args()
+
+    index = HammingIndex.from_bit_strings([image['hashes'][args.hash] for image in FingerprintReader(args.database)])
+    print(f"Indexed {len(index)} {args.hash} codes ({index.n_bits} bits, {index.n_chunks} chunks)")
+
+    if args.radius is not None:
+        first, second, _ = index.radius_pairs(args.radius)
+        with_neighbors = len(np.unique(np.concatenate([first, second])))
+        print(f"Entries with another entry within distance {args.radius}: {with_neighbors}")
+
+    if args.output:
+        index.save(args.output)
+        print(f"Index saved to {args.output}")
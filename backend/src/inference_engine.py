@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from preprocessing import write_input_tensor
+from runtime import create_interpreter, get_interpreter_class, warm_up
+
+BACKENDS = ('keras', 'tflite', 'tflite_dynamic', 'tflite_int8')
+
+DEFAULT_MODEL_PATHS = {
+    'keras': 'models/best_model.h5',
+    'tflite': 'models/peacock_egg_classifier.tflite',
+    'tflite_dynamic': 'models/peacock_egg_classifier_dynamic.tflite',
+    'tflite_int8': 'models/peacock_egg_classifier_int8.tflite'
+}
+
+DEFAULT_CONFIG = {
+    'backend': 'tflite',
+    'model_path': None,
+    'num_threads': 1,
+    'use_xnnpack': True,
+    'runtime': None
+}
+
+
+class InferenceBackend:
+    """
+    Common interface of all inference backends
+
+    Inputs are always lists of uint8 [H, W, 3] images; each backend applies
+    its own normalization. Running a batch is split into `set_inputs`,
+    `invoke` and `get_outputs` so callers can time the stages separately,
+    and `predict` chains the three. A backend instance must only be used by
+    one thread at a time.
+    """
+    name = None
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+    def set_inputs(self, images):
+        raise NotImplementedError
+
+    def invoke(self):
+        raise NotImplementedError
+
+    def get_outputs(self):
+        raise NotImplementedError
+
+    def predict(self, images):
+        """
+        Args:
+            images: List of uint8 [H, W, 3] arrays
+
+        Returns:
+            float32 array of class probabilities with shape [N, num_classes]
+        """
+        self.set_inputs(images)
+        self.invoke()
+        return self.get_outputs()
+
+    def warm_up(self):
+        pass
+
+    def describe(self):
+        return {'backend': self.name, 'model_path': self.model_path}
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TFLite interpreter backend
+
+    Serves float, dynamic-range and full-integer models alike: inputs are
+    written (and quantized if needed) straight into the input tensor, and
+    integer outputs are dequantized. The model is always loaded by path, so
+    the runtime memory-maps the flatbuffer read-only: interpreters in the same
+    process and in other worker processes share its pages through the page
+    cache, and only the tensor arena is private.
+
+    Args:
+        model_path: Path to the .tflite model
+        num_threads: Threads used by the interpreter's kernels
+        use_xnnpack: Use the XNNPACK delegate (default TFLite CPU acceleration)
+        runtime: TFLite runtime name (see runtime.RUNTIMES)
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=1, use_xnnpack=True, runtime=None):
+        super().__init__(model_path)
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        self.runtime, _ = get_interpreter_class(runtime)
+        self.interpreter = create_interpreter(
+            model_path=model_path,
+            num_threads=num_threads,
+            runtime=self.runtime,
+            use_xnnpack=use_xnnpack
+        )
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    def set_inputs(self, images):
+        if self._input['shape'][0] != len(images):
+            shape = list(self._input['shape'])
+            shape[0] = len(images)
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+        write_input_tensor(self.interpreter, images)
+
+    def invoke(self):
+        self.interpreter.invoke()
+
+    def get_outputs(self):
+        outputs = self.interpreter.get_tensor(self._output['index'])
+        if self._output['dtype'] != np.float32:
+            scale, zero_point = self._output['quantization']
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
+
+    def warm_up(self):
+        warm_up(self.interpreter)
+
+    def describe(self):
+        info = super().describe()
+        info.update({
+            'runtime': self.runtime,
+            'num_threads': self.num_threads,
+            'use_xnnpack': self.use_xnnpack,
+            'input_dtype': np.dtype(self._input['dtype']).name
+        })
+        return info
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Keras backend for .h5/.keras files and SavedModel directories
+
+    Args:
+        model_path: Path to the Keras model file or SavedModel directory
+    """
+    name = 'keras'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        if os.path.isdir(model_path):
+            # Keras 3 no longer loads SavedModels directly
+            self.model = tf.keras.layers.TFSMLayer(model_path, call_endpoint='serving_default')
+        else:
+            self.model = tf.keras.models.load_model(model_path)
+        self._inputs = None
+        self._outputs = None
+
+    def set_inputs(self, images):
+        self._inputs = np.stack(images).astype(np.float32) / 255.0
+
+    def invoke(self):
+        outputs = self.model(self._inputs, training=False)
+        if isinstance(outputs, dict):
+            outputs = next(iter(outputs.values()))
+        self._outputs = np.asarray(outputs, dtype=np.float32)
+
+    def get_outputs(self):
+        return self._outputs
+
+    def warm_up(self):
+        shape = self.model.input_shape[1:] if hasattr(self.model, 'input_shape') else (224, 224, 3)
+        self.predict([np.zeros(shape, dtype=np.uint8)])
+
+
+def load_config(path=None, **overrides):
+    """
+    Build an inference config
+
+    Values come from DEFAULT_CONFIG, then the JSON file at `path` (or the
+    INFERENCE_CONFIG environment variable), then the INFERENCE_BACKEND,
+    MODEL_PATH, INTERPRETER_THREADS and USE_XNNPACK environment variables,
+    then `overrides`.
+
+    Returns:
+        Config dictionary with a resolved 'model_path'
+    """
+    config = dict(DEFAULT_CONFIG)
+
+    path = path or os.environ.get('INFERENCE_CONFIG')
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+
+    env = {
+        'backend': os.environ.get('INFERENCE_BACKEND'),
+        'model_path': os.environ.get('MODEL_PATH'),
+        'num_threads': os.environ.get('INTERPRETER_THREADS'),
+        'use_xnnpack': os.environ.get('USE_XNNPACK')
+    }
+    if env['num_threads'] is not None:
+        env['num_threads'] = int(env['num_threads'])
+    if env['use_xnnpack'] is not None:
+        env['use_xnnpack'] = env['use_xnnpack'] != '0'
+    config.update({key: value for key, value in env.items() if value is not None})
+    config.update({key: value for key, value in overrides.items() if value is not None})
+
+    if config['backend'] not in BACKENDS:
+        raise ValueError(f"Unknown backend '{config['backend']}', expected one of {BACKENDS}")
+    if not config['model_path']:
+        config['model_path'] = DEFAULT_MODEL_PATHS[config['backend']]
+
+    return config
+
+
+def model_version(path):
+    """Short content hash of a model file (or of every file in a SavedModel directory)"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+
+    digest = hashlib.blake2b(digest_size=6)
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_backend(config):
+    """Instantiate the backend selected by `config` (see load_config)"""
+    if config['backend'] == 'keras':
+        backend = KerasBackend(config['model_path'])
+    else:
+        # Dynamic-range and int8 models only differ in the file they load
+        backend = TFLiteBackend(
+            config['model_path'],
+            num_threads=config.get('num_threads'),
+            use_xnnpack=config.get('use_xnnpack', True),
+            runtime=config.get('runtime')
+        )
+        backend.name = config['backend']
+    return backend
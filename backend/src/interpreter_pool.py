@@ -0,0 +1,66 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class InterpreterPool:
+    """
+    Fixed-size pool of pre-allocated interpreters
+
+    A TFLite interpreter must not be used by two threads at once, so each
+    worker thread checks one out for the duration of an invoke and returns it
+    afterwards. Interpreters are created eagerly so that no request pays for
+    model loading or tensor allocation.
+
+    Args:
+        factory: Callable returning a new interpreter with tensors allocated
+        size: Number of interpreters (default: one per CPU core)
+    """
+
+    def __init__(self, factory, size=None):
+        self.size = size or os.cpu_count() or 1
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+
+        for _ in range(self.size):
+            self._idle.put(factory())
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """
+        Check out an interpreter, blocking until one is idle
+
+        Args:
+            timeout: Seconds to wait before raising TimeoutError (None waits forever)
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            interpreter = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No interpreter available")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield interpreter
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(interpreter)
+
+    def stats(self):
+        """Return pool occupancy for health reporting"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': self.size - self._in_use,
+                'waiting': self._waiting
+            }
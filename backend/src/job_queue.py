@@ -0,0 +1,267 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from preprocessing import IMAGE_EXTENSIONS
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner INTEGER,
+    result TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, job_id, idx);
+'''
+
+# Item states: pending -> running -> done | error; cancelled jobs mark pending items cancelled
+ITEM_STATES = ('pending', 'running', 'done', 'error', 'cancelled')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def list_job_images(directory, recursive=True):
+    """Sorted image paths under `directory`"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not recursive:
+            break
+    return paths
+
+
+class JobStore:
+    """
+    Persistent queue of offline classification jobs in SQLite
+
+    A job is a list of image paths; each path is one item row whose state
+    moves from pending to running to done/error. Workers claim pending items
+    in submission order, so jobs are served first come first served. All
+    progress lives in the database: after a crash, `recover` puts items that
+    were running in a dead process back to pending and the workers pick up
+    where they stopped. Several server processes on one host may share the
+    database; claims are atomic.
+
+    Args:
+        path: SQLite database file (created if missing)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL keeps readers (progress polling) from blocking the workers' writes
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(self._conn)
+                self._conn.execute('COMMIT')
+                return result
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def create_job(self, paths, source=None):
+        """
+        Queue a job over `paths`
+
+        Args:
+            paths: Image paths, classified in this order
+            source: JSON-serializable description of the request (stored for reference)
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(conn):
+            conn.execute(
+                'INSERT INTO jobs (id, status, source, total, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, 'queued', json.dumps(source), len(paths), now)
+            )
+            conn.executemany(
+                'INSERT INTO items (job_id, idx, path, status) VALUES (?, ?, ?, ?)',
+                ((job_id, index, path, 'pending') for index, path in enumerate(paths))
+            )
+            if not paths:
+                conn.execute('UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?', ('completed', now, job_id))
+
+        self._transaction(insert)
+        return job_id
+
+    def recover(self):
+        """Return items left running by processes that no longer exist to the queue; returns how many"""
+        def reset(conn):
+            owners = [row[0] for row in conn.execute("SELECT DISTINCT owner FROM items WHERE status = 'running'")]
+            recovered = 0
+            for owner in owners:
+                # Our own pid can only be stale (e.g. pid 1 in a restarted container)
+                if owner is None or owner == os.getpid() or not _process_alive(owner):
+                    recovered += conn.execute(
+                        "UPDATE items SET status = 'pending', owner = NULL WHERE status = 'running' AND owner IS ?",
+                        (owner,)
+                    ).rowcount
+            return recovered
+        return self._transaction(reset)
+
+    def claim(self, limit):
+        """
+        Atomically mark up to `limit` pending items as running
+
+        Returns:
+            List of (job_id, index, path) tuples
+        """
+        def take(conn):
+            rows = conn.execute(
+                "SELECT items.job_id, items.idx, items.path FROM items JOIN jobs ON jobs.id = items.job_id "
+                "WHERE items.status = 'pending' ORDER BY jobs.created_at, items.job_id, items.idx LIMIT ?",
+                (limit,)
+            ).fetchall()
+            owner = os.getpid()
+            conn.executemany(
+                "UPDATE items SET status = 'running', owner = ? WHERE job_id = ? AND idx = ?",
+                ((owner, row['job_id'], row['idx']) for row in rows)
+            )
+            now = time.time()
+            for job_id in {row['job_id'] for row in rows}:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) "
+                    "WHERE id = ? AND status = 'queued'",
+                    (now, job_id)
+                )
+            return [(row['job_id'], row['idx'], row['path']) for row in rows]
+        return self._transaction(take)
+
+    def complete(self, results):
+        """
+        Store results of claimed items and close jobs that have no items left
+
+        Args:
+            results: List of (job_id, index, result_dict); results with an
+                'error' key mark the item as failed
+        """
+        def store(conn):
+            conn.executemany(
+                "UPDATE items SET status = ?, result = ? WHERE job_id = ? AND idx = ? AND status = 'running'",
+                (('error' if 'error' in result else 'done', json.dumps(result), job_id, index)
+                 for job_id, index, result in results)
+            )
+            now = time.time()
+            for job_id in {job_id for job_id, _, _ in results}:
+                remaining = conn.execute(
+                    "SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN ('pending', 'running')", (job_id,)
+                ).fetchone()[0]
+                if remaining == 0:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ? AND status = 'running'",
+                        (now, job_id)
+                    )
+        self._transaction(store)
+
+    def cancel(self, job_id):
+        """Cancel the job's pending items; items already running still finish. Returns False if unknown"""
+        def stop(conn):
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            ).rowcount
+            conn.execute("UPDATE items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+            return bool(updated) or conn.execute('SELECT 1 FROM jobs WHERE id = ?', (job_id,)).fetchone() is not None
+        return self._transaction(stop)
+
+    def job(self, job_id):
+        """
+        Progress of one job
+
+        Returns:
+            Dictionary with status, per-state item counts, timing and
+            throughput, or None if the job does not exist
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._conn.execute(
+                'SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status', (job_id,)
+            ).fetchall())
+        return self._progress(row, counts)
+
+    def jobs(self, limit=50):
+        """Most recent jobs with their progress"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+            counts = {}
+            for job_id, status, count in self._conn.execute(
+                    'SELECT job_id, status, COUNT(*) FROM items WHERE job_id IN '
+                    '(SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?) GROUP BY job_id, status', (limit,)):
+                counts.setdefault(job_id, {})[status] = count
+        return [self._progress(row, counts.get(row['id'], {})) for row in rows]
+
+    def _progress(self, row, counts):
+        processed = counts.get('done', 0) + counts.get('error', 0)
+        end = row['finished_at'] or time.time()
+        elapsed = end - row['started_at'] if row['started_at'] else 0.0
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'source': json.loads(row['source']),
+            'total': row['total'],
+            **{state: counts.get(state, 0) for state in ITEM_STATES},
+            'progress': processed / row['total'] if row['total'] else 1.0,
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'images_per_sec': processed / elapsed if elapsed > 0 else 0.0
+        }
+
+    def results(self, job_id, offset=0, limit=1000):
+        """Finished item results of a job in submission order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, path, result FROM items WHERE job_id = ? AND status IN ('done', 'error') "
+                "ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [{'index': row['idx'], 'path': row['path'], **json.loads(row['result'])} for row in rows]
+
+    def pending_items(self):
+        """Items waiting or running across all jobs"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
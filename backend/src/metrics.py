@@ -0,0 +1,192 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _items(self):
+        if self.callback is None:
+            with self._lock:
+                return list(self._values.items())
+        values = self.callback()
+        if isinstance(values, dict):
+            return list(values.items())
+        return [((), values)]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for key, value in self._items():
+            labels = _format_labels(zip(self.labelnames, key))
+            lines.append(f'{self.name}{labels} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally read from `callback` at scrape time"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value, optionally read from `callback` at scrape time"""
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Bucketed distribution of observations
+
+    Besides the usual `_bucket`, `_sum` and `_count` series, p50/p90/p99
+    estimates (linear interpolation inside the bucket) are exported as a
+    separate `<name>_quantile` gauge family so they can be read without a
+    Prometheus server.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, quantiles=QUANTILES):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.quantiles = quantiles
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the `with` block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q, **labels):
+        """Estimate the `q` quantile from the bucket counts (None without observations)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return None
+            counts, _, count = state[0][:], state[1], state[2]
+        return self._estimate(q, counts, count)
+
+    def _estimate(self, q, counts, count):
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        quantile_lines = []
+        for key, (counts, total, count) in self._items():
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(pairs + [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(pairs)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(pairs)} {count}')
+            for q in self.quantiles:
+                labels = _format_labels(pairs + [('quantile', q)])
+                quantile_lines.append(f'{self.name}_quantile{labels} {_format_value(round(self._estimate(q, counts, count), 9))}')
+
+        if quantile_lines:
+            lines.append(f'# HELP {self.name}_quantile Estimated quantiles of {self.name}')
+            lines.append(f'# TYPE {self.name}_quantile gauge')
+            lines.extend(quantile_lines)
+        return lines
+
+    def _items(self):
+        with self._lock:
+            return [(key, (state[0][:], state[1], state[2])) for key, state in self._values.items()]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,239 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from inference_engine import BACKENDS, model_version
+
+METADATA_FILE = 'metadata.json'
+ROUTING_FILE = 'routing.json'
+
+
+def _write_json_atomic(path, data):
+    """Write JSON next to `path` and rename it into place, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def normalize_weights(weights):
+    """
+    Validate a traffic split and scale it to sum to 1
+
+    Args:
+        weights: Dictionary of version -> non-negative weight
+
+    Returns:
+        Dictionary of the versions with a positive weight, summing to 1
+    """
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Traffic weights must not be negative")
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Traffic split needs at least one version with a positive weight")
+    return {version: weight / total for version, weight in weights.items() if weight > 0}
+
+
+def choose_version(weights, rand=random.random):
+    """Pick a version at random according to normalized `weights`"""
+    point = rand()
+    cumulative = 0.0
+    version = None
+    for version, weight in weights.items():
+        cumulative += weight
+        if point < cumulative:
+            return version
+    # Rounding can leave the cumulative sum a hair below 1
+    return version
+
+
+class ModelRegistry:
+    """
+    Directory of versioned model artifacts
+
+    Every version lives in its own subdirectory holding the artifact and a
+    `metadata.json` (backend, model file, content hash, creation time and any
+    extra fields such as evaluation metrics). Versions are never modified once
+    registered, so a server can keep serving one while another is added.
+    `routing.json` in the root holds the traffic split between versions;
+    without it the most recently registered version gets all traffic.
+
+        models/registry/
+            v1/model.tflite
+            v1/metadata.json
+            v2/model.tflite
+            v2/metadata.json
+            routing.json
+
+    Args:
+        root: Registry directory (created if missing)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def versions(self):
+        """Metadata of all registered versions, oldest first"""
+        entries = []
+        for name in os.listdir(self.root):
+            if os.path.isfile(os.path.join(self.root, name, METADATA_FILE)):
+                entries.append(self.get(name))
+        return sorted(entries, key=lambda meta: (meta.get('created_at', ''), meta['version']))
+
+    def get(self, version):
+        """
+        Metadata of one version, with 'model_path' resolved to the artifact
+
+        Raises:
+            KeyError: If the version is not registered
+        """
+        metadata_path = os.path.join(self.root, version, METADATA_FILE)
+        if not os.path.isfile(metadata_path):
+            raise KeyError(f"Model version '{version}' is not registered in {self.root}")
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        metadata['version'] = version
+        metadata['model_path'] = os.path.join(self.root, version, metadata['model_file'])
+        return metadata
+
+    def register(self, model_path, version=None, backend='tflite', metadata=None):
+        """
+        Copy a model artifact into the registry as a new version
+
+        Args:
+            model_path: Model file or SavedModel directory
+            version: Version name (default: v<N+1>)
+            backend: Inference backend that serves the artifact (see inference_engine.BACKENDS)
+            metadata: Extra fields stored in metadata.json
+
+        Returns:
+            Metadata of the new version
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        if version is None:
+            version = f"v{len(self.versions()) + 1}"
+        if os.sep in version or version.startswith('.'):
+            raise ValueError(f"Invalid version name '{version}'")
+
+        target_dir = os.path.join(self.root, version)
+        if os.path.exists(target_dir):
+            raise ValueError(f"Model version '{version}' already exists")
+
+        # Build the version in a hidden directory and rename it into place,
+        # so a polling server never picks up a half-copied model
+        staging_dir = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+        try:
+            model_file = os.path.basename(os.path.normpath(model_path))
+            if os.path.isdir(model_path):
+                shutil.copytree(model_path, os.path.join(staging_dir, model_file))
+            else:
+                shutil.copy2(model_path, os.path.join(staging_dir, model_file))
+
+            record = dict(metadata or {})
+            record.update({
+                'version': version,
+                'backend': backend,
+                'model_file': model_file,
+                'sha': model_version(os.path.join(staging_dir, model_file)),
+                'source': os.path.abspath(model_path),
+                'created_at': datetime.now(timezone.utc).isoformat()
+            })
+            with open(os.path.join(staging_dir, METADATA_FILE), 'w') as f:
+                json.dump(record, f, indent=2)
+
+            os.rename(staging_dir, target_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        return self.get(version)
+
+    def traffic_split(self):
+        """
+        Current traffic split as normalized weights
+
+        Returns:
+            Dictionary of version -> weight (empty if nothing is registered)
+        """
+        routing_path = os.path.join(self.root, ROUTING_FILE)
+        if os.path.isfile(routing_path):
+            with open(routing_path) as f:
+                weights = json.load(f)['weights']
+            for version in weights:
+                self.get(version)
+            return normalize_weights(weights)
+
+        versions = self.versions()
+        return {versions[-1]['version']: 1.0} if versions else {}
+
+    def set_traffic_split(self, weights):
+        """Validate and persist a traffic split (e.g. {'v1': 0.9, 'v2': 0.1})"""
+        for version in weights:
+            self.get(version)
+        weights = normalize_weights(weights)
+        _write_json_atomic(os.path.join(self.root, ROUTING_FILE), {'weights': weights})
+        return weights
+
+    def state(self):
+        """Cheap fingerprint of the registry contents, used to detect changes when polling"""
+        routing_path = os.path.join(self.root, ROUTING_FILE)
+        routing_mtime = os.stat(routing_path).st_mtime_ns if os.path.exists(routing_path) else None
+        return (routing_mtime, tuple(sorted(os.listdir(self.root))))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the versioned model registry')
+    parser.add_argument('--registry', type=str, default='models/registry', help='Registry directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    register_parser = subparsers.add_parser('register', help='Add a model artifact as a new version')
+    register_parser.add_argument('--model_path', type=str, required=True, help='Model file or SavedModel directory')
+    register_parser.add_argument('--version', type=str, default=None, help='Version name (default: v<N+1>)')
+    register_parser.add_argument('--backend', type=str, default='tflite', choices=BACKENDS, help='Serving backend')
+    register_parser.add_argument('--metadata', type=str, default=None, help='JSON file with extra metadata (e.g. evaluation results)')
+    register_parser.add_argument('--notes', type=str, default=None, help='Free-form description')
+
+    subparsers.add_parser('list', help='Show registered versions and the traffic split')
+
+    route_parser = subparsers.add_parser('route', help='Set the traffic split, e.g. v1=0.9 v2=0.1')
+    route_parser.add_argument('weights', nargs='+', help='version=weight pairs')
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.registry)
+
+    if args.command == 'register':
+        extra = {}
+        if args.metadata:
+            with open(args.metadata) as f:
+                extra.update(json.load(f))
+        if args.notes:
+            extra['notes'] = args.notes
+        metadata = registry.register(args.model_path, version=args.version, backend=args.backend, metadata=extra)
+        print(f"Registered {metadata['version']} ({metadata['backend']}, sha {metadata['sha']})")
+
+    elif args.command == 'list':
+        split = registry.traffic_split()
+        print(f"{'version':<12}{'backend':<16}{'sha':<14}{'traffic':>8}  created")
+        for metadata in registry.versions():
+            print(f"{metadata['version']:<12}{metadata['backend']:<16}{metadata['sha']:<14}"
+                  f"{split.get(metadata['version'], 0.0):>8.0%}  {metadata['created_at']}")
+
+    elif args.command == 'route':
+        weights = {}
+        for pair in args.weights:
+            version, _, weight = pair.partition('=')
+            weights[version] = float(weight) if weight else 1.0
+        split = registry.set_traffic_split(weights)
+        print("Traffic split: " + ', '.join(f"{version} {weight:.0%}" for version, weight in split.items()))
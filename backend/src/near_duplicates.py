@@ -0,0 +1,304 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from fingerprint_db import FingerprintDatabase, is_fingerprint_db
+from fingerprint_matcher import pack_bits
+from fingerprint_stream import FingerprintReader
+from hamming_index import HammingIndex
+
+# Below this many codes a pairwise scan beats the chunk index for radius_pairs
+# (measured on 256-bit phash codes: crossover between 8k and 12k codes)
+PAIRS_LINEAR_SIZE = 8192
+
+
+def database_families(metadata):
+    """Hash families of a fingerprint database, primary first (older databases predate the 'families' field)"""
+    return metadata.get('families') or (['custom'] if metadata.get('version') == '2.0' else ['imagehash'])
+
+
+def load_hash_codes(database_path, family=None, hash_name='phash'):
+    """
+    One hash of every entry of a fingerprint database, packed for HammingIndex
+
+    Args:
+        database_path: Fingerprint JSON or binary database
+        family: Hash family ('custom' or 'imagehash'; default: the primary one)
+        hash_name: Hash within the family (phash, ahash, dhash, ...)
+
+    Returns:
+        (filenames, pixel counts, uint64 codes [N, words], bits per code, family)
+    """
+    if is_fingerprint_db(database_path):
+        db = FingerprintDatabase(database_path)
+        primary = database_families(db.metadata)[0]
+        if family not in (None, primary):
+            raise ValueError(f"Binary databases only hold the primary '{primary}' family; use the JSON for '{family}'")
+        return (db.filenames(), db.widths.astype(np.int64) * db.heights, db.hashes(hash_name),
+                db.bits[hash_name], primary)
+
+    reader = FingerprintReader(database_path)
+    families = database_families(reader.metadata)
+    family = family or families[0]
+    if family not in families:
+        raise ValueError(f"Database has no '{family}' hashes (families: {', '.join(families)})")
+    key = 'hashes' if family == families[0] else f'hashes_{family}'
+
+    filenames, pixels, hashes = [], [], []
+    for entry in reader:
+        filenames.append(entry['filename'])
+        pixels.append(entry.get('width', 0) * entry.get('height', 0))
+        hashes.append(entry[key][hash_name])
+    if family == 'custom':
+        n_bits = max((len(h) for h in hashes), default=0)
+        codes = pack_bits(hashes, n_bits)
+    else:
+        # imagehash hex strings are the bits most significant first, like pack_bits rows
+        n_bits = max((len(h) * 4 for h in hashes), default=0)
+        row_bytes = (n_bits + 63) // 64 * 8
+        packed = b''.join(bytes.fromhex(h).ljust(row_bytes, b'\0') for h in hashes)
+        codes = np.frombuffer(packed, dtype=np.uint8).reshape(len(hashes), row_bytes).view(np.uint64)
+    return filenames, np.array(pixels, dtype=np.int64), codes, n_bits, family
+
+
+def group_labels(n, first, second):
+    """
+    Connected components of the pairs (first[k], second[k]) with union-find
+
+    Returns:
+        Array of length n; every entry is labelled with the smallest id in its group
+    """
+    parent = list(range(n))
+    for a, b in zip(first.tolist(), second.tolist()):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    # Roots are the smallest ids, so resolving in id order labels every entry
+    for i in range(n):
+        parent[i] = parent[parent[i]]
+    return np.array(parent, dtype=np.int64)
+
+
+def find_near_duplicates(codes, n_bits, radius):
+    """
+    Group codes within Hamming distance `radius` of each other (transitively)
+
+    Candidate pairs come from HammingIndex.radius_pairs instead of comparing
+    every pair of images, except for small sets (PAIRS_LINEAR_SIZE) where the
+    pairwise scan is faster.
+
+    Returns:
+        (labels, number of pairs within the radius)
+    """
+    index = HammingIndex(n_bits, linear_size=PAIRS_LINEAR_SIZE)
+    index.add(codes)
+    first, second, _ = index.radius_pairs(radius)
+    return group_labels(len(codes), first, second), len(first)
+
+
+def class_dirs(filenames):
+    """Class directory of every entry ('fertil/x.jpg' -> 'fertil')"""
+    return np.array([name.split('/', 1)[0] for name in filenames])
+
+
+def representatives(labels, classes, filenames, pixels):
+    """
+    Image kept for every group: the one with the most pixels, then the first filename
+
+    A group spanning classes keeps one image per class, so deduplication
+    never removes a class from a group (such groups are usually hash
+    collisions or mislabelled copies, reported separately).
+
+    Returns:
+        Boolean mask of the kept entries
+    """
+    order = sorted(range(len(labels)), key=lambda i: (labels[i], classes[i], -pixels[i], filenames[i]))
+    keep = np.zeros(len(labels), dtype=bool)
+    previous = None
+    for i in order:
+        if (labels[i], classes[i]) != previous:
+            keep[i] = True
+            previous = labels[i], classes[i]
+    return keep
+
+
+def keras_validation_mask(filenames, validation_split):
+    """
+    Entries flow_from_directory(subset='validation') picks with `validation_split`
+
+    Keras sorts the files of every class directory by name and takes the
+    first int(validation_split * count) as validation, so the database must
+    list the same files as the dataset directory.
+    """
+    classes = class_dirs(filenames)
+    mask = np.zeros(len(filenames), dtype=bool)
+    for name in np.unique(classes):
+        ids = sorted(np.flatnonzero(classes == name), key=lambda i: filenames[i])
+        mask[ids[:int(validation_split * len(ids))]] = True
+    return mask
+
+
+def group_split(labels, classes, used, validation_split, seed=42):
+    """
+    Validation mask that never separates a group
+
+    Per class, groups are visited in a seeded random order and moved to
+    validation while that brings the class closer to `validation_split` of
+    its used images. A group spanning classes counts for the class of its
+    label entry.
+
+    Args:
+        labels: Group label per entry (group_labels)
+        classes: Class directory per entry
+        used: Mask of the entries in the split (e.g. the representatives)
+        validation_split: Share of each class to put in validation
+        seed: Random seed
+
+    Returns:
+        Boolean mask; True for validation entries (only among `used`)
+    """
+    rng = np.random.default_rng(seed)
+    groups, sizes = np.unique(labels[used], return_counts=True)
+    chosen = np.zeros(len(labels), dtype=bool)
+    group_classes = classes[groups]
+    for name in np.unique(group_classes):
+        in_class = np.flatnonzero(group_classes == name)
+        target = validation_split * sizes[in_class].sum()
+        taken = 0
+        for k in rng.permutation(in_class):
+            if abs(target - taken - sizes[k]) < abs(target - taken):
+                chosen[groups[k]] = True
+                taken += sizes[k]
+    return used & chosen[labels]
+
+
+def leakage(labels, train, validation):
+    """
+    How many validation images have a near-duplicate in the training set
+
+    Returns:
+        Dictionary with 'validation_images', 'leaked_images' and 'split_groups'
+    """
+    train_groups = np.unique(labels[train])
+    leaked = np.isin(labels[validation], train_groups)
+    return {
+        'validation_images': int(validation.sum()),
+        'leaked_images': int(leaked.sum()),
+        'split_groups': int(len(np.intersect1d(train_groups, labels[validation])))
+    }
+
+
+def build_split(database_path, radius=8, family=None, hash_name='phash', validation_split=0.2, seed=42,
+                keep_duplicates=False):
+    """
+    Cluster near-duplicate images and split the dataset by group
+
+    Args:
+        database_path: Fingerprint JSON or binary database of the dataset
+        radius: Maximum Hamming distance between near-duplicates
+        family: Hash family to compare (default: the primary one)
+        hash_name: Hash to compare
+        validation_split: Share of each class to put in validation
+        seed: Random seed of the split
+        keep_duplicates: Put every image in the split instead of one per group
+
+    Returns:
+        Dictionary with 'metadata', 'train', 'validation', 'deduplicated',
+        'groups' (near-duplicate groups of two or more images) and 'leakage'
+        (for the Keras validation_split and for this split)
+    """
+    filenames, pixels, codes, n_bits, family = load_hash_codes(database_path, family, hash_name)
+    labels, pairs = find_near_duplicates(codes, n_bits, radius)
+    classes = class_dirs(filenames)
+    keep = representatives(labels, classes, filenames, pixels)
+    used = np.ones(len(filenames), dtype=bool) if keep_duplicates else keep
+    validation = group_split(labels, classes, used, validation_split, seed)
+    keras_validation = keras_validation_mask(filenames, validation_split)
+
+    members = {}
+    for i in np.flatnonzero(np.bincount(labels, minlength=len(labels))[labels] > 1):
+        members.setdefault(int(labels[i]), []).append(filenames[i])
+    groups = sorted(members.values())
+    cross_class = sum(len({name.split('/', 1)[0] for name in group}) > 1 for group in groups)
+
+    return {
+        'metadata': {
+            'generated_at': datetime.now().isoformat(),
+            'database': database_path,
+            'family': family,
+            'hash': hash_name,
+            'radius': radius,
+            'validation_split': validation_split,
+            'seed': seed,
+            'deduplicated': not keep_duplicates,
+            'images': len(filenames),
+            'unique_images': int(keep.sum()),
+            'pairs': pairs,
+            'groups': len(groups),
+            'cross_class_groups': cross_class
+        },
+        'train': [filenames[i] for i in np.flatnonzero(used & ~validation)],
+        'validation': [filenames[i] for i in np.flatnonzero(validation)],
+        'deduplicated': [filenames[i] for i in np.flatnonzero(keep)],
+        'groups': groups,
+        'leakage': {
+            'keras_validation_split': leakage(labels, ~keras_validation, keras_validation),
+            'group_split': leakage(labels, used & ~validation, validation)
+        }
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate images and write a group-aware train/validation split')
+    parser.add_argument('--database', type=str, default='web/public/dataset_fingerprints.json',
+                        help='Fingerprint JSON or binary database of the dataset')
+    parser.add_argument('--radius', type=int, default=8, help='Maximum Hamming distance between near-duplicates')
+    parser.add_argument('--family', type=str, default=None, choices=['custom', 'imagehash'],
+                        help='Hash family to compare (default: the primary family of the database)')
+    parser.add_argument('--hash', type=str, default='phash', help='Hash to compare')
+    parser.add_argument('--validation_split', type=float, default=0.2, help='Share of each class used for validation')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the split')
+    parser.add_argument('--keep_duplicates', action='store_true',
+                        help='Keep every image in the split (groups still stay on one side)')
+    parser.add_argument('--output', type=str, default='dataset_split.json', help='Split file for train.py --split_file')
+    parser.add_argument('--dedup_output', type=str, default='dataset_dedup.txt',
+                        help="Deduplicated file list, one path per line ('' to skip)")
+
+    args = parser.parse_args()
+
+    split = build_split(args.database, args.radius, args.family, args.hash, args.validation_split, args.seed,
+                        args.keep_duplicates)
+    metadata = split['metadata']
+
+    print(f"\n{'='*60}")
+    print("Near-Duplicate Report")
+    print(f"{'='*60}")
+    print(f"  Images: {metadata['images']}")
+    print(f"  Hash: {metadata['family']} {metadata['hash']}, radius {metadata['radius']} bits")
+    print(f"  Near-duplicate groups: {metadata['groups']} ({metadata['pairs']} pairs), "
+          f"{metadata['cross_class_groups']} spanning both classes")
+    print(f"  Unique images: {metadata['unique_images']} "
+          f"({metadata['images'] - metadata['unique_images']} redundant)")
+    for name, report in split['leakage'].items():
+        share = report['leaked_images'] / max(report['validation_images'], 1)
+        print(f"  Leakage with {name}: {report['leaked_images']}/{report['validation_images']} validation images "
+              f"({share:.1%}) have a near-duplicate in training, {report['split_groups']} groups split")
+    print(f"  Split: {len(split['train'])} train, {len(split['validation'])} validation")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(split, f, indent=2)
+    print(f"  Split file: {args.output}")
+    if args.dedup_output:
+        with open(args.dedup_output, 'w', encoding='utf-8') as f:
+            f.writelines(f"{name}\n" for name in split['deduplicated'])
+        print(f"  Deduplicated list: {args.dedup_output}")
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded in-process cache of prediction results keyed by upload content
+
+    Entries expire after `ttl_seconds` and the least recently used entries are
+    evicted once either `max_entries` or `max_bytes` would be exceeded. The
+    byte size of an entry is the length of its JSON encoding plus its key.
+
+    Args:
+        max_entries: Maximum number of cached results
+        max_bytes: Maximum total size of cached results
+        ttl_seconds: Lifetime of an entry (0 disables expiry)
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=8 * 1024 * 1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(contents, model_version):
+        """Content hash of the uploaded bytes, scoped to the model that produced the result"""
+        digest = hashlib.blake2b(contents, digest_size=16)
+        digest.update(str(model_version).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting least recently used entries as needed"""
+        size = len(key) + len(json.dumps(value))
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
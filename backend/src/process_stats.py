@@ -0,0 +1,108 @@
+import os
+
+
+def _read_kb_fields(path):
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def memory_usage(pid=None):
+    """
+    Resident memory of a process in KB
+
+    Reads /proc on Linux; elsewhere only the current process's peak RSS from
+    `resource` is available. RSS is split into anonymous memory (heap, tensor
+    arenas), file-backed pages (shared libraries, memory-mapped models) and
+    shared memory. PSS divides every shared page by the number of processes
+    mapping it, so summing it over workers gives their real combined footprint.
+
+    Args:
+        pid: Process id (default: current process)
+
+    Returns:
+        Dictionary with 'rss_kb', 'peak_rss_kb', 'rss_anon_kb', 'rss_file_kb',
+        'rss_shmem_kb' and 'pss_kb' (None when unavailable)
+    """
+    proc_dir = f"/proc/{pid or 'self'}"
+    if os.path.exists(f"{proc_dir}/status"):
+        fields = _read_kb_fields(f"{proc_dir}/status")
+        usage = {
+            'rss_kb': fields.get('VmRSS'),
+            'peak_rss_kb': fields.get('VmHWM'),
+            'rss_anon_kb': fields.get('RssAnon'),
+            'rss_file_kb': fields.get('RssFile'),
+            'rss_shmem_kb': fields.get('RssShmem'),
+            'pss_kb': None
+        }
+        try:
+            usage['pss_kb'] = _read_kb_fields(f"{proc_dir}/smaps_rollup").get('Pss')
+        except OSError:
+            pass
+        return usage
+
+    usage = dict.fromkeys(('rss_kb', 'peak_rss_kb', 'rss_anon_kb', 'rss_file_kb', 'rss_shmem_kb', 'pss_kb'))
+    if pid is None or pid == os.getpid():
+        try:
+            import resource
+            usage['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            pass
+    return usage
+
+
+def mapped_file_usage(file_path, pid=None):
+    """
+    Memory used by the mappings of one file in a process, in KB
+
+    A model loaded through `model_path` is memory-mapped by TFLite, so its
+    pages live in the page cache and are shared by every process mapping it;
+    `shared_kb` grows and `pss_kb` shrinks as more workers map the same file.
+
+    Args:
+        file_path: Mapped file (e.g. the .tflite model)
+        pid: Process id (default: current process)
+
+    Returns:
+        Dictionary with 'mappings', 'size_kb', 'rss_kb', 'pss_kb', 'shared_kb'
+        and 'private_kb', or None if the file is not mapped (or /proc is missing)
+    """
+    target = os.path.realpath(file_path)
+    usage = None
+    current = False
+
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps") as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if ' ' not in key:
+                    if not current or not value.strip().endswith('kB'):
+                        continue
+                    kb = int(value.split()[0])
+                    if key == 'Size':
+                        usage['size_kb'] += kb
+                    elif key == 'Rss':
+                        usage['rss_kb'] += kb
+                    elif key == 'Pss':
+                        usage['pss_kb'] += kb
+                    elif key.startswith('Shared_'):
+                        usage['shared_kb'] += kb
+                    elif key.startswith('Private_'):
+                        usage['private_kb'] += kb
+                else:
+                    # Mapping header: "start-end perms offset dev inode [path]"
+                    parts = line.split(None, 5)
+                    current = len(parts) == 6 and parts[5].strip() == target
+                    if current:
+                        if usage is None:
+                            usage = dict.fromkeys(('size_kb', 'rss_kb', 'pss_kb', 'shared_kb', 'private_kb'), 0)
+                            usage['mappings'] = 0
+                        usage['mappings'] += 1
+    except OSError:
+        return None
+
+    return usage
@@ -0,0 +1,82 @@
+import importlib
+import os
+import sys
+import numpy as np
+
+# Lightest first: tflite_runtime and ai_edge_litert ship only the interpreter,
+# while tensorflow pulls in the whole framework (seconds and hundreds of MB)
+RUNTIMES = {
+    'tflite_runtime': ('tflite_runtime.interpreter', None),
+    'ai_edge_litert': ('ai_edge_litert.interpreter', None),
+    'tensorflow': ('tensorflow', 'lite')
+}
+
+_interpreter_classes = {}
+
+
+def _import_interpreter(name):
+    module_name, attribute = RUNTIMES[name]
+    module = importlib.import_module(module_name)
+    if attribute:
+        module = getattr(module, attribute)
+    return module.Interpreter
+
+
+def get_interpreter_class(runtime=None):
+    """
+    Import an Interpreter class on first use
+
+    Args:
+        runtime: One of RUNTIMES, 'auto' or None (reads TFLITE_RUNTIME, default 'auto').
+            'auto' tries the runtimes from lightest to heaviest.
+
+    Returns:
+        Tuple of (runtime name, Interpreter class)
+    """
+    runtime = runtime or os.environ.get('TFLITE_RUNTIME', 'auto')
+    names = list(RUNTIMES) if runtime == 'auto' else [runtime]
+
+    for name in names:
+        if name not in RUNTIMES:
+            raise ValueError(f"Unknown runtime '{name}', expected one of {list(RUNTIMES)} or 'auto'")
+        if name not in _interpreter_classes:
+            try:
+                _interpreter_classes[name] = _import_interpreter(name)
+            except ImportError:
+                continue
+        return name, _interpreter_classes[name]
+
+    raise ImportError(f"No TFLite runtime available (tried {', '.join(names)})")
+
+
+def create_interpreter(model_path=None, model_content=None, num_threads=None, runtime=None, use_xnnpack=True):
+    """
+    Create an interpreter with tensors allocated
+
+    Args:
+        model_path: Path to a .tflite file
+        model_content: Model flatbuffer (instead of model_path)
+        num_threads: Threads used by the interpreter's kernels
+        runtime: Runtime name passed to get_interpreter_class
+        use_xnnpack: Keep the default XNNPACK delegate (False uses the builtin kernels only)
+    """
+    _, Interpreter = get_interpreter_class(runtime)
+    kwargs = {}
+    if not use_xnnpack:
+        OpResolverType = sys.modules[Interpreter.__module__].OpResolverType
+        kwargs['experimental_op_resolver_type'] = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    interpreter = Interpreter(model_path=model_path, model_content=model_content, num_threads=num_threads, **kwargs)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def warm_up(interpreter):
+    """
+    Run one inference on a zero input
+
+    The first invoke initializes kernels and delegate state (XNNPACK packs its
+    weights lazily), so doing it at startup keeps that cost off the first request.
+    """
+    details = interpreter.get_input_details()[0]
+    interpreter.set_tensor(details['index'], np.zeros(details['shape'], dtype=details['dtype']))
+    interpreter.invoke()
@@ -0,0 +1,357 @@
+import math
+import os
+import numpy as np
+import tensorflow as tf
+
+from data_loader import AUGMENTATION, load_split
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Extensions flow_from_directory lists; the ones tf.io cannot decode are rejected up front
+WHITE_LIST_FORMATS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+DECODABLE_FORMATS = ('png', 'jpg', 'jpeg', 'bmp')
+
+
+class ImageDataset:
+    """
+    A tf.data pipeline with the attributes train.py and evaluate.py read from
+    a Keras DirectoryIterator
+
+    Attributes:
+        dataset: tf.data.Dataset of (images, one-hot labels) batches
+        filenames: Paths relative to the dataset directory ('fertil/x.jpg')
+        classes: Class index per file, in `filenames` order
+        class_indices: Class name -> index, like flow_from_directory
+        samples: Number of images
+        num_classes: Number of classes
+    """
+
+    def __init__(self, dataset, filenames, classes, class_indices):
+        self.dataset = dataset
+        self.filenames = filenames
+        self.classes = np.array(classes, dtype=np.int32)
+        self.class_indices = class_indices
+        self.samples = len(filenames)
+        self.num_classes = len(class_indices)
+
+    def __len__(self):
+        return self.dataset.cardinality().numpy()
+
+
+def list_classes(data_dir):
+    """Class names as flow_from_directory maps them: sorted subdirectories"""
+    return sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+
+
+def list_directory(data_dir, class_names, split=None):
+    """
+    Files of every class directory in flow_from_directory order
+
+    Each class directory is walked recursively (sorted by directory, then by
+    file name) and `split` keeps the same slice of every class Keras keeps
+    for subset='validation' (0, v) or subset='training' (v, 1).
+
+    Returns:
+        (relative paths, class indices)
+    """
+    filenames, classes = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        files = []
+        for root, _, names in sorted(os.walk(class_dir), key=lambda x: x[0]):
+            for name in sorted(names):
+                if name.lower().endswith(WHITE_LIST_FORMATS):
+                    files.append(os.path.relpath(os.path.join(root, name), data_dir).replace(os.sep, '/'))
+        if split:
+            files = files[int(split[0] * len(files)):int(split[1] * len(files))]
+        filenames.extend(files)
+        classes.extend([label] * len(files))
+    return filenames, classes
+
+
+def list_split(data_dir, paths, class_names):
+    """
+    Files of a near_duplicates.py split in file order, dropping the ones
+    flow_from_dataframe would skip (missing or not an image)
+
+    Returns:
+        (relative paths, class indices)
+    """
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    filenames, classes = [], []
+    for path in paths:
+        if path.lower().endswith(WHITE_LIST_FORMATS) and os.path.isfile(os.path.join(data_dir, path)):
+            filenames.append(path)
+            classes.append(class_indices[path.split('/', 1)[0]])
+    if len(filenames) < len(paths):
+        print(f"Skipped {len(paths) - len(filenames)} missing or non-image files of the split")
+    return filenames, classes
+
+
+def _nearest_indices(size, target):
+    """Source index of every output pixel, accumulated in float64 exactly like PIL's NEAREST resize"""
+    scale = tf.cast(size, tf.float64) / target
+    steps = tf.concat([[scale / 2], tf.fill([target - 1], scale)], axis=0)
+    return tf.cast(tf.floor(tf.math.cumsum(steps)), tf.int32)
+
+
+def decode_image(contents, img_size, fast_decode=False):
+    """
+    Decode image bytes to a uint8 RGB tensor of `img_size`
+
+    Gives the same pixels as load_img in flow_from_directory: JPEGs use the
+    accurate integer IDCT PIL uses, and the nearest-neighbour resize picks
+    the same source pixels. With `fast_decode`, JPEGs are decoded with DCT
+    scaling (1/2, 1/4 or 1/8) to the smallest size that still covers
+    `img_size`, the way preprocessing.open_image does for the server.
+
+    Args:
+        contents: Scalar string tensor with the encoded image
+        img_size: Target (height, width)
+        fast_decode: Use reduced-size JPEG decoding
+
+    Returns:
+        uint8 tensor [height, width, 3]
+    """
+    def decode_jpeg(ratio=1):
+        return tf.io.decode_jpeg(contents, channels=3, ratio=ratio, dct_method='INTEGER_ACCURATE')
+
+    def decode_jpeg_scaled():
+        shape = tf.io.extract_jpeg_shape(contents)
+        # Largest of 8, 4, 2, 1 whose decoded size still covers the target
+        fits = [tf.reduce_all(tf.math.ceil(tf.cast(shape[:2], tf.float32) / ratio) >= img_size)
+                for ratio in (8, 4, 2)]
+        index = tf.argmax(tf.stack(fits + [tf.constant(True)]), output_type=tf.int32)
+        return tf.switch_case(index, [lambda ratio=ratio: decode_jpeg(ratio) for ratio in (8, 4, 2, 1)])
+
+    def decode_other():
+        return tf.io.decode_image(contents, channels=3, expand_animations=False)
+
+    image = tf.cond(tf.io.is_jpeg(contents), decode_jpeg_scaled if fast_decode else decode_jpeg, decode_other)
+    image = tf.ensure_shape(image, [None, None, 3])
+
+    shape = tf.shape(image)
+    image = tf.gather(image, _nearest_indices(shape[0], img_size[0]), axis=0)
+    return tf.gather(image, _nearest_indices(shape[1], img_size[1]), axis=1)
+
+
+def affine_transforms(theta, tx, ty, shear, zx, zy, height, width):
+    """
+    Projective transforms for ImageProjectiveTransformV3 from the parameters
+    of ImageDataGenerator.get_random_transform (angles in radians)
+
+    Keras composes rotation @ shift @ shear @ zoom around the image centre
+    and maps output coordinates to input coordinates with that matrix.
+    """
+    cos, sin = tf.cos(theta), tf.sin(theta)
+    shear_sin, shear_cos = tf.sin(shear), tf.cos(shear)
+    # rotation @ shift @ shear @ zoom, multiplied out
+    m00 = cos * zx
+    m01 = (-cos * shear_sin - sin * shear_cos) * zy
+    m10 = sin * zx
+    m11 = (-sin * shear_sin + cos * shear_cos) * zy
+    m02 = cos * tx - sin * ty
+    m12 = sin * tx + cos * ty
+
+    # transform_matrix_offset_center(matrix, h, w): offset @ matrix @ reset
+    o_x = tf.cast(height, tf.float32) / 2 - 0.5
+    o_y = tf.cast(width, tf.float32) / 2 - 0.5
+    m02 = m02 + o_x - m00 * o_x - m01 * o_y
+    m12 = m12 + o_y - m10 * o_x - m11 * o_y
+
+    # After Keras swaps the axes for scipy, the matrix works on (column, row),
+    # which is the (x, y) order of the projective transform
+    zeros = tf.zeros_like(m00)
+    return tf.stack([m00, m01, m02, m10, m11, m12, zeros, zeros], axis=1)
+
+
+def flip_transforms(transforms, flip_horizontal, flip_vertical, height, width):
+    """
+    Compose projective transforms with flips of their output
+
+    A flip after the warp is an exact pixel permutation, so it costs
+    nothing when folded into the matrix instead of reversing the batch.
+
+    Args:
+        transforms: [batch, 8] transforms (affine_transforms)
+        flip_horizontal, flip_vertical: [batch] booleans
+    """
+    a0, a1, a2, b0, b1, b2, c0, c1 = tf.unstack(transforms, axis=1)
+    # Output column x reads what column (width - 1 - x) read before
+    fx = tf.cast(flip_horizontal, tf.float32)
+    a2, b2 = a2 + fx * a0 * tf.cast(width - 1, tf.float32), b2 + fx * b0 * tf.cast(width - 1, tf.float32)
+    a0, b0 = a0 * (1 - 2 * fx), b0 * (1 - 2 * fx)
+    fy = tf.cast(flip_vertical, tf.float32)
+    a2, b2 = a2 + fy * a1 * tf.cast(height - 1, tf.float32), b2 + fy * b1 * tf.cast(height - 1, tf.float32)
+    a1, b1 = a1 * (1 - 2 * fy), b1 * (1 - 2 * fy)
+    return tf.stack([a0, a1, a2, b0, b1, b2, c0, c1], axis=1)
+
+
+def _random_transforms(batch_size, height, width, seed):
+    """
+    Transforms with parameters drawn like get_random_transform with AUGMENTATION, flips included
+
+    Every parameter gets its own stateless seed split from `seed`, so the
+    draws are independent of each other, as in Keras.
+    """
+    seeds = iter(tf.unstack(tf.random.split(seed, 7)))
+
+    def uniform(low, high, shape=(batch_size,)):
+        return tf.random.stateless_uniform(shape, next(seeds), low, high)
+
+    theta = uniform(-1.0, 1.0) * math.radians(AUGMENTATION['rotation_range'])
+    # Keras scales the height shift by the row count and the width shift by the column count
+    tx = uniform(-AUGMENTATION['height_shift_range'], AUGMENTATION['height_shift_range']) * tf.cast(height, tf.float32)
+    ty = uniform(-AUGMENTATION['width_shift_range'], AUGMENTATION['width_shift_range']) * tf.cast(width, tf.float32)
+    # shear_range is in degrees
+    shear = uniform(-1.0, 1.0) * math.radians(AUGMENTATION['shear_range'])
+    zoom = uniform(1 - AUGMENTATION['zoom_range'], 1 + AUGMENTATION['zoom_range'], (batch_size, 2))
+    transforms = affine_transforms(theta, tx, ty, shear, zoom[:, 0], zoom[:, 1], height, width)
+
+    flip_horizontal = (uniform(0.0, 1.0) < 0.5) & AUGMENTATION['horizontal_flip']
+    flip_vertical = (uniform(0.0, 1.0) < 0.5) & AUGMENTATION['vertical_flip']
+    return flip_transforms(transforms, flip_horizontal, flip_vertical, height, width)
+
+
+def augment_batch(images, seed):
+    """
+    ImageDataGenerator(**AUGMENTATION) for a whole batch at once
+
+    Affine transform (bilinear, 'nearest' fill) with the random flips folded
+    in, then brightness in `brightness_range` and the 1/255 rescale, in
+    Keras' order. The warp runs on uint8 to halve the memory traffic.
+
+    Args:
+        images: uint8 tensor [batch, height, width, 3]
+        seed: Stateless seed of the batch, int tensor of shape [2]
+
+    Returns:
+        float32 tensor in [0, 1]
+    """
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    transform_seed, brightness_seed = tf.unstack(tf.random.split(seed, 2))
+
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=_random_transforms(batch_size, height, width, transform_seed),
+        output_shape=shape[1:3],
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode=AUGMENTATION['fill_mode'].upper()
+    )
+
+    low, high = AUGMENTATION['brightness_range']
+    brightness = tf.random.stateless_uniform([batch_size, 1, 1, 1], brightness_seed, low, high)
+    # clip(x * brightness, 0, 255) * rescale in one pass
+    scale = AUGMENTATION['rescale']
+    return tf.clip_by_value(tf.cast(images, tf.float32) * (brightness * scale), 0.0, 255.0 * scale)
+
+
+def build_dataset(data_dir, filenames, classes, num_classes, img_size=(224, 224), batch_size=32, shuffle=False,
+                  augment=False, cache=None, fast_decode=False, seed=None):
+    """
+    Input pipeline over a list of files
+
+    Files are read and decoded in parallel, batched, augmented a batch at a
+    time and prefetched, with AUTOTUNE picking the parallelism.
+
+    Args:
+        data_dir: Dataset directory the filenames are relative to
+        filenames: Relative image paths
+        classes: Class index per file
+        num_classes: Length of the one-hot labels
+        img_size: Target (height, width)
+        batch_size: Batch size
+        shuffle: Reshuffle the files every epoch
+        augment: Apply AUGMENTATION
+        cache: Cache decoded images ('' in memory, a path for a file cache, None to decode every epoch)
+        fast_decode: Use reduced-size JPEG decoding (see decode_image)
+        seed: Random seed for shuffling and augmentation
+
+    Returns:
+        tf.data.Dataset of (images, one-hot labels)
+    """
+    img_size = tuple(img_size)
+    paths = [os.path.join(data_dir, name) for name in filenames]
+    labels = tf.one_hot(np.array(classes, dtype=np.int32), num_classes)
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+
+    def load(path, label):
+        return decode_image(tf.io.read_file(path), img_size, fast_decode), label
+
+    if cache is not None:
+        dataset = dataset.map(load, num_parallel_calls=AUTOTUNE).cache(cache)
+        if shuffle:
+            dataset = dataset.shuffle(max(len(paths), 1), seed=seed, reshuffle_each_iteration=True)
+    else:
+        # Shuffle the paths, not the decoded images, so the buffer stays small
+        if shuffle:
+            dataset = dataset.shuffle(max(len(paths), 1), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.map(load, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+
+    dataset = dataset.batch(batch_size)
+
+    if augment:
+        # One stateless seed per batch, new every epoch; reproducible when `seed` is set
+        seeds = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True).batch(2)
+        dataset = tf.data.Dataset.zip((dataset, seeds)).map(
+            lambda batch, batch_seed: (augment_batch(batch[0], batch_seed), batch[1]),
+            num_parallel_calls=AUTOTUNE)
+    else:
+        dataset = dataset.map(lambda images, labels: (tf.cast(images, tf.float32) * AUGMENTATION['rescale'], labels),
+                              num_parallel_calls=AUTOTUNE)
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def _check_decodable(filenames):
+    unsupported = sorted({name.rsplit('.', 1)[-1].lower() for name in filenames} - set(DECODABLE_FORMATS))
+    if unsupported:
+        raise ValueError(f"tf.data loader cannot decode {', '.join(unsupported)} files; use --loader keras")
+
+
+def load_data(data_dir, img_size=(224, 224), batch_size=32, validation_split=0.2, split_file=None, cache=None,
+              fast_decode=False, seed=None):
+    """
+    tf.data version of data_loader.load_data
+
+    Same files, class indices and split as the ImageDataGenerator loader:
+    without `split_file` the first `validation_split` of every class
+    directory (sorted by name) is validation, with it the lists of the
+    near_duplicates.py split are used. Training is shuffled every epoch;
+    both subsets are augmented, as the generator does.
+
+    Returns:
+        (training ImageDataset, validation ImageDataset)
+    """
+    class_names = list_classes(data_dir)
+    class_indices = {name: i for i, name in enumerate(class_names)}
+
+    if split_file:
+        split = load_split(split_file)
+        subsets = [list_split(data_dir, split[subset], class_names) for subset in ('train', 'validation')]
+    else:
+        subsets = [list_directory(data_dir, class_names, (validation_split, 1)),
+                   list_directory(data_dir, class_names, (0, validation_split))]
+
+    datasets = []
+    for (filenames, classes), shuffle in zip(subsets, (True, False)):
+        _check_decodable(filenames)
+        print(f"Found {len(filenames)} images belonging to {len(class_names)} classes.")
+        dataset = build_dataset(data_dir, filenames, classes, len(class_names), img_size, batch_size,
+                                shuffle=shuffle, augment=True, cache=cache, fast_decode=fast_decode, seed=seed)
+        datasets.append(ImageDataset(dataset, filenames, classes, class_indices))
+
+    return datasets[0], datasets[1]
+
+
+def load_test_data(test_dir, img_size=(224, 224), batch_size=32, fast_decode=False):
+    """tf.data version of data_loader.load_test_data: every image in order, rescaled only"""
+    class_names = list_classes(test_dir)
+    filenames, classes = list_directory(test_dir, class_names)
+    _check_decodable(filenames)
+    print(f"Found {len(filenames)} images belonging to {len(class_names)} classes.")
+    dataset = build_dataset(test_dir, filenames, classes, len(class_names), img_size, batch_size,
+                            fast_decode=fast_decode)
+    return ImageDataset(dataset, filenames, classes, {name: i for i, name in enumerate(class_names)})
@@ -1,9 +1,10 @@
 import os
 from model import create_cnn_model, create_pretrained_model, compile_model
 from data_loader import load_data, get_class_weights, get_class_mapping
+import tf_data_loader
 from utils import plot_training_history, create_callbacks
 
-def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learning_rate=0.0001, use_pretrained=False, class_weight_method='aggressive', fine_tune_layers=20):
+def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learning_rate=0.0001, use_pretrained=False, class_weight_method='aggressive', fine_tune_layers=20, split_file=None, loader='keras', cache=False):
     """
     Train CNN model
     
@@ -15,6 +16,9 @@ def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learni
         learning_rate: Learning rate for optimizer
         use_pretrained: Use pretrained model (EfficientNetB0)
         class_weight_method: Method for calculating class weights ('balanced', 'aggressive', 'inverse')
+        split_file: Group-aware train/validation split from near_duplicates.py (default: Keras validation_split)
+        loader: Input pipeline, 'keras' (ImageDataGenerator) or 'tf_data' (tf_data_loader, same files and split)
+        cache: With the tf_data loader, keep decoded images in memory after the first epoch
     
     Returns:
         Training history and trained model
@@ -24,19 +28,33 @@ def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learni
     
     print("=== Peacock Egg Fertility Detection Training ===\n")
     
-    print("Loading data...")
-    train_generator, val_generator = load_data(
-        data_dir=data_dir,
-        img_size=img_size,
-        batch_size=batch_size,
-        validation_split=0.2
-    )
+    print(f"Loading data ({loader} loader)...")
+    if loader == 'tf_data':
+        train_generator, val_generator = tf_data_loader.load_data(
+            data_dir=data_dir,
+            img_size=img_size,
+            batch_size=batch_size,
+            validation_split=0.2,
+            split_file=split_file,
+            cache='' if cache else None
+        )
+        train_data, val_data = train_generator.dataset, val_generator.dataset
+    else:
+        train_generator, val_generator = load_data(
+            data_dir=data_dir,
+            img_size=img_size,
+            batch_size=batch_size,
+            validation_split=0.2,
+            split_file=split_file
+        )
+        train_data, val_data = train_generator, val_generator
     
     print(f"\nDataset Summary:")
     print(f"  Training samples: {train_generator.samples}")
     print(f"  Validation samples: {val_generator.samples}")
     print(f"  Classes: {train_generator.class_indices}")
     print(f"  Number of classes: {train_generator.num_classes}")
+    print(f"  Split: {split_file if split_file else 'validation_split=0.2 (first 20% of each class by filename)'}")
     
     num_classes = train_generator.num_classes
     
@@ -49,7 +67,7 @@ def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learni
         print("For best results, collect more infertil egg images.")
     
     print(f"\nCalculating class weights (method: {class_weight_method})...")
-    class_weights = get_class_weights(data_dir, method=class_weight_method)
+    class_weights = get_class_weights(data_dir, method=class_weight_method, split_file=split_file)
     
     print("\nCreating model...")
     if use_pretrained:
@@ -76,13 +94,14 @@ def train_model(data_dir, epochs=100, batch_size=32, img_size=(224, 224), learni
     print(f"  - Learning Rate: {learning_rate}")
     print(f"  - Model: {'EfficientNetB0 (pretrained)' if use_pretrained else 'Custom CNN'}")
     print(f"  - Class Weight Method: {class_weight_method}")
+    print(f"  - Input Pipeline: {loader}{' (cached)' if loader == 'tf_data' and cache else ''}")
     
     callbacks = create_callbacks(model_save_path='models/best_model.h5', patience=15)
     
     history = model.fit(
-        train_generator,
+        train_data,
         epochs=epochs,
-        validation_data=val_generator,
+        validation_data=val_data,
         class_weight=class_weights,
         callbacks=callbacks,
         verbose=1
@@ -131,6 +150,12 @@ if __name__ == "__main__":
                        help='Class weight calculation method (default: aggressive for imbalanced datasets)')
     parser.add_argument('--fine_tune', type=int, default=20, 
                        help='Number of layers to unfreeze for fine-tuning pretrained models (default: 20)')
+    parser.add_argument('--split_file', type=str, default=None,
+                       help='Group-aware train/validation split from near_duplicates.py (default: Keras validation_split)')
+    parser.add_argument('--loader', type=str, default='keras', choices=['keras', 'tf_data'],
+                       help='Input pipeline: keras ImageDataGenerator or the parallel tf.data loader (default: keras)')
+    parser.add_argument('--cache', action='store_true',
+                       help='With --loader tf_data, keep decoded images in memory after the first epoch')
     
     args = parser.parse_args()
     
@@ -146,5 +171,8 @@ if __name__ == "__main__":
         learning_rate=args.learning_rate,
         use_pretrained=args.pretrained,
         class_weight_method=args.class_weights,
-        fine_tune_layers=args.fine_tune
+        fine_tune_layers=args.fine_tune,
+        split_file=args.split_file,
+        loader=args.loader,
+        cache=args.cache
     )
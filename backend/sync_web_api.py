@@ -0,0 +1,61 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_API_DIR = os.path.join(BACKEND_DIR, '..', 'web', 'api')
+
+# Vercel only deploys web/, so the serverless handler imports copies of these backend modules
+SHARED_MODULES = {
+    'metrics.py': '_metrics.py',
+    'prediction_cache.py': '_prediction_cache.py',
+    'preprocessing.py': '_preprocessing.py',
+}
+
+
+def expected_copy(source):
+    """Contents web/api should hold for backend/src/`source`"""
+    with open(os.path.join(BACKEND_DIR, 'src', source)) as f:
+        body = f.read()
+    return f"# Generated from backend/src/{source} by backend/sync_web_api.py; edit the original\n{body}"
+
+
+def stale_copies():
+    """Copies in web/api that are missing or differ from their backend module"""
+    stale = []
+    for source, copy in SHARED_MODULES.items():
+        path = os.path.join(WEB_API_DIR, copy)
+        current = None
+        if os.path.exists(path):
+            with open(path) as f:
+                current = f.read()
+        if current != expected_copy(source):
+            stale.append(copy)
+    return stale
+
+
+def sync():
+    """Rewrite every stale copy; returns the ones written"""
+    stale = stale_copies()
+    for source, copy in SHARED_MODULES.items():
+        if copy in stale:
+            with open(os.path.join(WEB_API_DIR, copy), 'w') as f:
+                f.write(expected_copy(source))
+    return stale
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Copy shared backend modules into the web/api serverless handler')
+    parser.add_argument('--check', action='store_true', help='Only report copies that differ from the backend')
+
+    args = parser.parse_args()
+
+    if args.check:
+        stale = stale_copies()
+        for copy in stale:
+            print(f"web/api/{copy} is out of date; run python backend/sync_web_api.py")
+        sys.exit(1 if stale else 0)
+
+    for copy in sync():
+        print(f"Updated web/api/{copy}")
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from admission import AdmissionController, Overloaded
+
+
+async def burst(controller, size, hold=0.05):
+    """Send `size` simultaneous requests; returns (admitted, refused reasons, most requests in flight)"""
+    admitted, refused, deepest = 0, [], 0
+
+    async def request():
+        nonlocal admitted, deepest
+        deepest = max(deepest, controller.active + controller.waiting)
+        try:
+            await controller.acquire()
+        except Overloaded as e:
+            refused.append(e.reason)
+            return
+        deepest = max(deepest, controller.active + controller.waiting)
+        admitted += 1
+        try:
+            await asyncio.sleep(hold)
+        finally:
+            controller.release()
+
+    await asyncio.gather(*(request() for _ in range(size)))
+    return admitted, refused, deepest
+
+
+def test_burst_respects_max_queue_with_timeout():
+    controller = AdmissionController(2, 3, queue_timeout=10)
+    admitted, refused, deepest = asyncio.run(burst(controller, 20))
+    assert admitted == 5
+    assert refused == ['queue_full'] * 15
+    assert deepest <= 5
+    assert controller.active == 0 and controller.waiting == 0
+
+
+def test_burst_respects_max_queue_without_timeout():
+    controller = AdmissionController(2, 3)
+    admitted, refused, deepest = asyncio.run(burst(controller, 20))
+    assert admitted == 5
+    assert refused == ['queue_full'] * 15
+    assert deepest <= 5
+
+
+def test_queue_timeout():
+    controller = AdmissionController(1, 5, queue_timeout=0.01)
+    admitted, refused, _ = asyncio.run(burst(controller, 3, hold=0.1))
+    assert admitted == 1
+    assert refused == ['timeout', 'timeout']
+    assert controller.stats()['rejected'] == {'queue_full': 0, 'timeout': 2}
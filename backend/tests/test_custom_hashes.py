@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from custom_hash_benchmark import legacy_custom_hashes
+from generate_fingerprints_batch import generate_custom_hashes, generate_custom_hashes_batch, pack_custom_hashes
+
+rng = np.random.default_rng(0)
+
+CASES = {
+    'rgb': rng.integers(0, 256, (224, 224, 3), dtype=np.uint8),
+    'rgba': rng.integers(0, 256, (224, 224, 4), dtype=np.uint8),
+    'grayscale': rng.integers(0, 256, (224, 224), dtype=np.uint8),
+    'near_128': rng.integers(127, 130, (224, 224, 3), dtype=np.uint8),
+    'flat_128': np.full((224, 224, 3), 128, dtype=np.uint8),
+    'flat_black_grayscale': np.zeros((224, 224), dtype=np.uint8),
+    # Gradients tie many pixels exactly with the mean
+    'gradient_grayscale': np.tile(np.arange(224, dtype=np.uint8), (224, 1)),
+    'gradient_rgb': np.repeat(np.tile(np.arange(0, 224, dtype=np.uint8), (224, 1))[..., None], 3, axis=2),
+    'tie_with_mean': np.repeat(np.array([[0, 128, 255, 128] * 56] * 224, dtype=np.uint8)[..., None], 3, axis=2),
+    'rgb_5x5': rng.integers(0, 256, (5, 5, 3), dtype=np.uint8),
+    'rgba_7x7': rng.integers(0, 256, (7, 7, 4), dtype=np.uint8),
+    'grayscale_8x40': rng.integers(0, 256, (8, 40), dtype=np.uint8),
+    'rgb_1x1': rng.integers(0, 256, (1, 1, 3), dtype=np.uint8),
+}
+
+
+def unpack(image):
+    return {
+        name: ''.join(map(str, np.unpackbits(rows[0])[:n_bits]))
+        for name, (rows, n_bits) in pack_custom_hashes(image[np.newaxis]).items()
+    }
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_matches_legacy(name):
+    image = CASES[name]
+    expected = legacy_custom_hashes(image)
+    assert generate_custom_hashes(image) == expected
+    assert generate_custom_hashes_batch(image[np.newaxis]) == [expected]
+    packed = unpack(image)
+    assert packed == {key: expected[key] for key in packed}
+
+
+@pytest.mark.parametrize('shape', [(224, 224, 3), (224, 224, 4), (224, 224), (6, 6, 3)])
+def test_stack_matches_one_at_a_time(shape):
+    stack = rng.integers(0, 256, (9,) + shape, dtype=np.uint8)
+    stack[3] = 128
+    assert generate_custom_hashes_batch(stack) == [legacy_custom_hashes(image) for image in stack]
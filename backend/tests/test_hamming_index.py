@@ -0,0 +1,211 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from hamming_index import CHUNK_BITS, HammingIndex
+
+# (linear_size, linear_fraction): always linear, indexed with the usual fallback, indexed without fallback
+CONFIGS = {
+    'linear': {'linear_size': 1 << 30},
+    'indexed': {'linear_size': 0},
+    'indexed_no_fallback': {'linear_size': 0, 'linear_fraction': 1e9},
+}
+
+
+def random_codes(rng, n, n_bits):
+    codes = rng.integers(0, 2 ** 63, (n, (n_bits + 63) // 64), dtype=np.uint64)
+    codes |= rng.integers(0, 2, codes.shape, dtype=np.uint64) << np.uint64(63)
+    if n_bits % 64:
+        codes[:, -1] &= np.uint64((1 << (n_bits % 64)) - 1)
+    return codes
+
+
+def flip_bits(code, bits):
+    code = code.copy()
+    for bit in bits:
+        code[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+    return code
+
+
+def dataset(n_bits, seed, n=400):
+    """Random codes, near copies of them and exact duplicates, plus queries at every distance scale"""
+    rng = np.random.default_rng(seed)
+    base = random_codes(rng, n // 2, n_bits)
+    near = np.stack([flip_bits(base[i], rng.choice(n_bits, rng.integers(1, 24), replace=False))
+                     for i in rng.integers(0, len(base), n // 2 - 10)])
+    codes = np.concatenate([base, near, base[:10]])
+    queries = np.concatenate([
+        codes[rng.integers(0, len(codes), 8)],
+        np.stack([flip_bits(codes[i], rng.choice(n_bits, 12, replace=False)) for i in range(8)]),
+        random_codes(rng, 4, n_bits),
+    ])
+    return codes, queries
+
+
+def brute_distances(codes, query):
+    bits = np.unpackbits(codes.view(np.uint8), axis=1)
+    return (bits != np.unpackbits(query.view(np.uint8))).sum(axis=1)
+
+
+def brute_radius(codes, query, radius):
+    distances = brute_distances(codes, query)
+    ids = np.flatnonzero(distances <= radius)
+    order = np.lexsort((ids, distances[ids]))
+    return ids[order], distances[ids][order]
+
+
+def brute_knn(codes, query, k):
+    distances = brute_distances(codes, query)
+    order = np.lexsort((np.arange(len(codes)), distances))[:k]
+    return order, distances[order]
+
+
+def build(codes, n_bits, **kwargs):
+    index = HammingIndex(n_bits, **kwargs)
+    index.add(codes)
+    return index
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('n_bits', [64, 100, 256])
+def test_radius_search_matches_linear_scan(n_bits, config):
+    codes, queries = dataset(n_bits, seed=n_bits)
+    index = build(codes, n_bits, **CONFIGS[config])
+    for query in queries:
+        for radius in (0, 3, CHUNK_BITS, 2 * CHUNK_BITS + 5, n_bits // 2):
+            ids, distances = index.radius_search(query, radius)
+            expected_ids, expected_distances = brute_radius(codes, query, radius)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_array_equal(distances, expected_distances)
+            linear_ids, linear_distances = index.linear_radius_search(query, radius)
+            np.testing.assert_array_equal(ids, linear_ids)
+            np.testing.assert_array_equal(distances, linear_distances)
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('n_bits', [64, 100, 256])
+def test_knn_matches_linear_scan(n_bits, config):
+    codes, queries = dataset(n_bits, seed=n_bits + 1)
+    index = build(codes, n_bits, **CONFIGS[config])
+    for query in queries:
+        for k in (1, 2, 7, 50, len(codes)):
+            ids, distances = index.knn(query, k)
+            expected_ids, expected_distances = brute_knn(codes, query, k)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_array_equal(distances, expected_distances)
+            linear_ids, linear_distances = index.linear_knn(query, k)
+            np.testing.assert_array_equal(ids, linear_ids)
+            np.testing.assert_array_equal(distances, linear_distances)
+        assert len(index.knn(query, len(codes) + 3)[0]) == len(codes)
+
+
+def test_knn_stops_on_exact_ties():
+    # Many codes at the k-th distance: the indexed stop bound must still return the smallest ids
+    rng = np.random.default_rng(3)
+    query = random_codes(rng, 1, 256)[0]
+    codes = np.stack([flip_bits(query, [i, (i + 100) % 256]) for i in range(200)][::-1])
+    index = build(codes, 256, **CONFIGS['indexed_no_fallback'])
+    ids, distances = index.knn(query, 5)
+    np.testing.assert_array_equal(ids, np.arange(5))
+    np.testing.assert_array_equal(distances, [2] * 5)
+
+
+@pytest.mark.parametrize('spread', [0, 1, 2])
+def test_pigeonhole_boundary(spread):
+    # Worst case for the chunk split: every chunk but one `spread + 1` bits off, the last `spread`
+    n_bits = 256
+    n_chunks = n_bits // CHUNK_BITS
+    radius = n_chunks * spread + n_chunks - 1
+    rng = np.random.default_rng(spread)
+    query = random_codes(rng, 1, n_bits)[0]
+    codes = [random_codes(rng, 300, n_bits)]
+    for shift in range(n_chunks):
+        bits = []
+        for chunk in range(n_chunks):
+            count = spread if chunk == shift else spread + 1
+            bits += (chunk * CHUNK_BITS + rng.choice(CHUNK_BITS, count, replace=False)).tolist()
+        codes.append(flip_bits(query, bits)[None])
+    codes = np.concatenate(codes)
+    index = build(codes, n_bits, **CONFIGS['indexed_no_fallback'])
+    ids, distances = index.radius_search(query, radius)
+    np.testing.assert_array_equal(ids, np.arange(300, 300 + n_chunks))
+    assert np.all(distances == radius)
+    assert len(index.radius_search(query, radius - 1)[0]) == 0
+
+
+def test_chunk_tables_are_sorted_permutations():
+    codes, _ = dataset(100, seed=5)
+    index = build(codes, 100, merge_threshold=64)
+    index.merge()
+    chunks = np.ascontiguousarray(codes).view(np.uint16).reshape(len(codes), index.n_chunks)
+    assert index._keys.shape == index._order.shape == (index.n_chunks, len(codes))
+    for j in range(index.n_chunks):
+        np.testing.assert_array_equal(np.sort(index._order[j]), np.arange(len(codes)))
+        assert np.all(np.diff(index._keys[j].astype(np.int64)) >= 0)
+        np.testing.assert_array_equal(index._keys[j], chunks[index._order[j], j])
+
+
+def test_buffered_inserts_are_searched():
+    codes, queries = dataset(256, seed=6)
+    index = HammingIndex(256, merge_threshold=100, **CONFIGS['indexed_no_fallback'])
+    for start in range(0, len(codes), 37):
+        ids = index.add(codes[start:start + 37])
+        np.testing.assert_array_equal(ids, np.arange(start, min(start + 37, len(codes))))
+    assert 0 < index._indexed < len(index)
+    for query in queries:
+        np.testing.assert_array_equal(index.radius_search(query, 20)[0], brute_radius(codes, query, 20)[0])
+        np.testing.assert_array_equal(index.knn(query, 10)[0], brute_knn(codes, query, 10)[0])
+
+
+def test_skewed_codes_fall_back_correctly():
+    # Mostly-zero codes share almost every chunk value, so the candidate budget forces the linear scan
+    rng = np.random.default_rng(7)
+    codes = np.stack([flip_bits(np.zeros(4, dtype=np.uint64), rng.choice(256, rng.integers(0, 4), replace=False))
+                      for _ in range(500)])
+    index = build(codes, 256, linear_size=0)
+    first, second, distances = index.radius_pairs(2)
+    for query in codes[:20]:
+        np.testing.assert_array_equal(index.radius_search(query, 2)[0], brute_radius(codes, query, 2)[0])
+        np.testing.assert_array_equal(index.knn(query, 15)[0], brute_knn(codes, query, 15)[0])
+    pairs = {(a, b) for a in range(len(codes)) for b in np.flatnonzero(brute_distances(codes, codes[a]) <= 2)
+             if a < b}
+    assert set(zip(first.tolist(), second.tolist())) == pairs
+
+
+def test_save_load_round_trip(tmp_path):
+    codes, queries = dataset(100, seed=8)
+    index = build(codes, 100, merge_threshold=1000, **CONFIGS['indexed_no_fallback'])
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = HammingIndex.load(path, **CONFIGS['indexed_no_fallback'])
+    assert loaded.n_bits == 100 and len(loaded) == len(codes) and loaded._indexed == len(codes)
+    np.testing.assert_array_equal(loaded.codes, codes)
+    np.testing.assert_array_equal(loaded._keys, index._keys)
+    np.testing.assert_array_equal(loaded._order, index._order)
+    for query in queries:
+        for old, new in zip(index.radius_search(query, 20), loaded.radius_search(query, 20)):
+            np.testing.assert_array_equal(old, new)
+        for old, new in zip(index.knn(query, 9), loaded.knn(query, 9)):
+            np.testing.assert_array_equal(old, new)
+
+
+def test_load_rejects_unknown_format(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    np.savez(path, format_version=99, n_bits=64, codes=np.zeros((0, 1), dtype=np.uint64),
+             order=np.zeros((4, 0), dtype=np.uint32))
+    with pytest.raises(ValueError):
+        HammingIndex.load(path)
+
+
+def test_bit_strings_match_packed_codes():
+    rng = np.random.default_rng(9)
+    strings = [''.join(rng.choice(['0', '1'], 64)) for _ in range(50)]
+    index = HammingIndex.from_bit_strings(strings, linear_size=0)
+    ids, distances = index.radius_search(strings[0], 30)
+    expected = [(sum(a != b for a, b in zip(strings[0], s)), i) for i, s in enumerate(strings)]
+    expected = sorted(e for e in expected if e[0] <= 30)
+    assert list(zip(distances.tolist(), ids.tolist())) == expected
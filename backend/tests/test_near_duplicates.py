@@ -0,0 +1,89 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from hamming_index import HammingIndex
+from near_duplicates import find_near_duplicates, group_labels
+
+
+def clustered_codes(n, n_bits, flips, seed):
+    """Random codes in small clusters: copies of a centre with up to `flips` bits flipped"""
+    rng = np.random.default_rng(seed)
+    n_words = (n_bits + 63) // 64
+    centres = rng.integers(0, 2 ** 63, (n // 4 + 1, n_words), dtype=np.uint64)
+    if n_bits % 64:
+        centres[:, -1] &= np.uint64((1 << (n_bits % 64)) - 1)
+    codes = centres[rng.integers(0, len(centres), n)]
+    for row in range(n):
+        for bit in rng.integers(0, n_bits, rng.integers(0, flips + 1)):
+            codes[row, bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+    return codes
+
+
+def pairwise_distances(codes):
+    """Hamming distance of every pair, bit by bit"""
+    bits = np.unpackbits(codes.view(np.uint8), axis=1)
+    return (bits[:, None, :] != bits[None, :, :]).sum(axis=2)
+
+
+def brute_force_pairs(codes, radius):
+    distances = pairwise_distances(codes)
+    first, second = np.nonzero(np.triu(distances <= radius, k=1))
+    return set(zip(first.tolist(), second.tolist(), distances[first, second].tolist()))
+
+
+def brute_force_labels(codes, radius):
+    """Connected components by flood fill; every entry labelled with the smallest id in its group"""
+    adjacent = pairwise_distances(codes) <= radius
+    labels = np.full(len(codes), -1, dtype=np.int64)
+    for start in range(len(codes)):
+        if labels[start] >= 0:
+            continue
+        stack = [start]
+        labels[start] = start
+        while stack:
+            for other in np.nonzero(adjacent[stack.pop()] & (labels < 0))[0].tolist():
+                labels[other] = start
+                stack.append(other)
+    return labels
+
+
+@pytest.mark.parametrize('linear_size', [0, 1 << 30])
+@pytest.mark.parametrize('n_bits,radius', [(64, 0), (64, 6), (100, 9), (256, 8), (256, 20)])
+def test_radius_pairs_match_brute_force(n_bits, radius, linear_size):
+    codes = clustered_codes(300, n_bits, flips=radius + 2, seed=n_bits + radius)
+    index = HammingIndex(n_bits, linear_size=linear_size)
+    index.add(codes)
+    first, second, distances = index.radius_pairs(radius)
+    assert np.all(first < second)
+    found = list(zip(first.tolist(), second.tolist(), distances.tolist()))
+    assert len(found) == len(set(found))
+    assert set(found) == brute_force_pairs(codes, radius)
+
+
+@pytest.mark.parametrize('n_bits,radius', [(64, 4), (256, 8), (256, 24)])
+def test_find_near_duplicates_matches_brute_force(n_bits, radius):
+    codes = clustered_codes(400, n_bits, flips=radius, seed=radius)
+    labels, n_pairs = find_near_duplicates(codes, n_bits, radius)
+    np.testing.assert_array_equal(labels, brute_force_labels(codes, radius))
+    assert n_pairs == len(brute_force_pairs(codes, radius))
+
+
+def test_group_labels_smallest_id_per_group():
+    # Chains joined through their largest ids: 4-3, 3-0 and 5-2, 2-1, 6 alone
+    first = np.array([3, 0, 2, 1])
+    second = np.array([4, 3, 5, 2])
+    np.testing.assert_array_equal(group_labels(7, first, second), [0, 1, 1, 0, 0, 1, 6])
+    np.testing.assert_array_equal(group_labels(3, np.array([], dtype=np.int64), np.array([], dtype=np.int64)),
+                                  [0, 1, 2])
+
+
+def test_duplicate_codes_form_one_group():
+    codes = np.repeat(clustered_codes(1, 256, flips=0, seed=1), 5, axis=0)
+    labels, n_pairs = find_near_duplicates(codes, 256, 0)
+    np.testing.assert_array_equal(labels, np.zeros(5))
+    assert n_pairs == 10
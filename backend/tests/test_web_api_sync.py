@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sync_web_api import stale_copies
+
+
+def test_web_api_copies_match_backend():
+    assert stale_copies() == [], "run python backend/sync_web_api.py"
@@ -0,0 +1,170 @@
+# Generated from backend/src/preprocessing.py by backend/sync_web_api.py; edit the original
+import io
+import os
+import time
+import numpy as np
+from PIL import Image
+
+TARGET_SIZE = (224, 224)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def open_image(contents, size=TARGET_SIZE, fast=True):
+    """
+    Decode image bytes into an RGB image resized to `size`
+
+    With `fast` enabled, JPEGs are decoded with DCT scaling (1/2, 1/4 or 1/8)
+    to the smallest draft that still covers `size`, and `Image.reduce` then
+    box-filters away any remaining integer factor above twice the target
+    before the final resize. A 4032x2268 photo is decoded as 504x284 instead
+    of 27 MB of full-resolution RGB.
+
+    Args:
+        contents: Encoded image bytes
+        size: Target (width, height)
+        fast: Use reduced-size decoding (False decodes every pixel)
+
+    Returns:
+        PIL image in RGB mode with the requested size
+    """
+    image = Image.open(io.BytesIO(contents))
+
+    if fast:
+        # No-op for formats other than JPEG
+        image.draft('RGB', size)
+        factor = min(image.width // (2 * size[0]), image.height // (2 * size[1]))
+        if factor > 1:
+            image = image.reduce(factor)
+
+    image = image.convert("RGB")
+    return image.resize(size)
+
+
+def preprocess_image(image):
+    image = image.resize(TARGET_SIZE)
+    image_array = np.array(image, dtype=np.float32) / 255.0
+    image_array = np.expand_dims(image_array, axis=0)
+    return image_array
+
+
+def write_input_tensor(interpreter, images):
+    """
+    Write uint8 images straight into the interpreter's input buffer
+
+    Pixels go from the decoded image into the tensor through its numpy view,
+    without an intermediate float array, a stacked batch or the extra copy
+    made by `set_tensor`. Float models get the /255 normalization applied
+    during the write; uint8 models (normalization inside the graph) receive
+    the raw pixels. Other quantized inputs fall back to an explicit quantize.
+
+    Args:
+        interpreter: Interpreter whose input batch dimension equals len(images)
+        images: Sequence of uint8 [H, W, 3] arrays
+    """
+    details = interpreter.get_input_details()[0]
+    dtype = details['dtype']
+    scale, zero_point = details['quantization']
+    # The view must not outlive this function: invoke() refuses to run while
+    # references to the interpreter's internal buffers are alive
+    view = interpreter.tensor(details['index'])()
+
+    for i, pixels in enumerate(images):
+        if dtype == np.float32:
+            np.divide(pixels, np.float32(255.0), out=view[i], dtype=np.float32)
+        elif dtype == np.uint8 and (scale == 0 or (abs(scale * 255.0 - 1.0) < 1e-6 and zero_point == 0)):
+            np.copyto(view[i], pixels)
+        else:
+            info = np.iinfo(dtype)
+            quantized = np.round(pixels / (255.0 * scale) + zero_point)
+            np.copyto(view[i], np.clip(quantized, info.min, info.max), casting='unsafe')
+
+
+def compare_decoding(image_paths, model_path=None):
+    """
+    Measure the fast decode path against full decoding
+
+    Args:
+        image_paths: Images to decode both ways
+        model_path: Optional TFLite model used to compare predictions
+
+    Returns:
+        Dictionary with timings, pixel differences and prediction agreement
+    """
+    interpreter = None
+    if model_path:
+        from runtime import create_interpreter
+        interpreter = create_interpreter(model_path=model_path)
+
+    def classify(image):
+        input_index = interpreter.get_input_details()[0]['index']
+        output_index = interpreter.get_output_details()[0]['index']
+        interpreter.set_tensor(input_index, preprocess_image(image))
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[0]
+
+    timings = {'full': 0.0, 'fast': 0.0}
+    pixel_diffs = []
+    prob_diffs = []
+    agreements = 0
+
+    for path in image_paths:
+        with open(path, 'rb') as f:
+            contents = f.read()
+
+        start = time.perf_counter()
+        full = open_image(contents, fast=False)
+        timings['full'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = open_image(contents, fast=True)
+        timings['fast'] += time.perf_counter() - start
+
+        diff = np.abs(np.asarray(full, dtype=np.float32) - np.asarray(fast, dtype=np.float32))
+        pixel_diffs.append(diff.mean())
+
+        if interpreter is not None:
+            full_probs = classify(full)
+            fast_probs = classify(fast)
+            prob_diffs.append(float(np.abs(full_probs - fast_probs).max()))
+            agreements += int(np.argmax(full_probs) == np.argmax(fast_probs))
+
+    count = len(image_paths)
+    results = {
+        'images': count,
+        'full_decode_ms': timings['full'] / count * 1000,
+        'fast_decode_ms': timings['fast'] / count * 1000,
+        'speedup': timings['full'] / timings['fast'] if timings['fast'] else 0.0,
+        'mean_abs_pixel_diff': float(np.mean(pixel_diffs)),
+        'max_abs_pixel_diff': float(np.max(pixel_diffs))
+    }
+    if interpreter is not None:
+        results['prediction_agreement'] = agreements / count
+        results['max_probability_diff'] = max(prob_diffs)
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compare fast (draft) and full JPEG decoding')
+    parser.add_argument('--data_dir', type=str, default='dataset', help='Directory of images (searched recursively)')
+    parser.add_argument('--model_path', type=str, default=None, help='TFLite model to compare predictions with')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of images')
+
+    args = parser.parse_args()
+
+    paths = []
+    for root, _, files in os.walk(args.data_dir):
+        paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+    paths = sorted(paths)[:args.limit]
+
+    if not paths:
+        print(f"No images found in {args.data_dir}")
+    else:
+        results = compare_decoding(paths, model_path=args.model_path)
+        print(f"\n{'='*60}")
+        print("Fast vs Full Decoding")
+        print(f"{'='*60}")
+        for key, value in results.items():
+            print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -1,14 +1,54 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import base64
+import hashlib
 import os
 import io
+import sys
+import time
+from email.parser import HeaderParser
+from email.utils import collapse_rfc2231_value
 import numpy as np
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _metrics import MetricsRegistry
+from _prediction_cache import PredictionCache
+from _preprocessing import write_input_tensor
+
 # Load model once (reused across invocations)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model', 'peacock_egg_classifier.tflite')
 interpreter = None
+model_version = None
+# Set FAST_DECODE=0 to decode every pixel (for comparing accuracy against the draft path)
+FAST_DECODE = os.environ.get('FAST_DECODE', '1') != '0'
+
+# Warm instances keep this between invocations, so client retries skip inference
+cache = PredictionCache(
+    max_entries=int(os.environ.get('PREDICTION_CACHE_ENTRIES', '1024')),
+    max_bytes=int(os.environ.get('PREDICTION_CACHE_BYTES', str(2 * 1024 * 1024))),
+    ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+)
+
+# Per-instance metrics, served in Prometheus text format on GET
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter('peacock_requests_total', 'Predictions served, by outcome', ('outcome',))
+ERRORS = metrics.counter('peacock_errors_total', 'Predictions that failed')
+REQUEST_SECONDS = metrics.histogram('peacock_request_duration_seconds', 'End-to-end prediction latency')
+STAGE_SECONDS = metrics.histogram('peacock_stage_duration_seconds', 'Time spent in each request stage', ('stage',))
+metrics.gauge('peacock_model_info', 'Loaded model version', ('version',),
+              callback=lambda: {(model_version,): 1} if model_version else {})
+metrics.counter('peacock_cache_hits_total', 'Prediction cache hits', callback=lambda: cache.hits)
+metrics.counter('peacock_cache_misses_total', 'Prediction cache misses', callback=lambda: cache.misses)
+
+
+def get_model_version():
+    global model_version
+    if model_version is None:
+        with open(MODEL_PATH, 'rb') as f:
+            model_version = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+    return model_version
 
 
 def get_interpreter():
@@ -29,71 +69,204 @@ def get_interpreter():
 
 
 def preprocess_image(image_bytes):
+    with STAGE_SECONDS.time(stage='decode'):
+        return decode_image(image_bytes)
+
+
+def decode_image(image_bytes):
     image = Image.open(io.BytesIO(image_bytes))
+    if FAST_DECODE:
+        # Let the JPEG decoder scale by 1/2..1/8 instead of decoding the full photo
+        image.draft('RGB', (224, 224))
+        factor = min(image.width // 448, image.height // 448)
+        if factor > 1:
+            image = image.reduce(factor)
     image = image.convert("RGB")
     image = image.resize((224, 224))
-    img_array = np.array(image, dtype=np.float32) / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
+    return np.asarray(image, dtype=np.uint8)
+
+
+def predict(image_bytes):
+    pixels = preprocess_image(image_bytes)
+
+    # Run inference
+    model = get_interpreter()
+    output_details = model.get_output_details()
+
+    with STAGE_SECONDS.time(stage='write_input'):
+        write_input_tensor(model, [pixels])
+    with STAGE_SECONDS.time(stage='invoke'):
+        model.invoke()
+
+    output_data = model.get_tensor(output_details[0]['index'])
+    probs = output_data[0]
+
+    fertile_prob = float(probs[0])
+    infertile_prob = float(probs[1])
+
+    prediction = "fertile" if fertile_prob > infertile_prob else "infertile"
+    confidence = max(fertile_prob, infertile_prob)
+
+    return {
+        "prediction": prediction,
+        "confidence": confidence,
+        "probabilities": {
+            "fertile": fertile_prob,
+            "infertile": infertile_prob
+        }
+    }
+
+
+class BadRequest(ValueError):
+    """Malformed upload, answered with 400 instead of 500"""
+
+
+def parse_content_type(header):
+    """Split a Content-Type header into its media type and parameters"""
+    media_type, _, params = (header or '').partition(';')
+    options = {}
+    for param in params.split(';'):
+        name, _, value = param.strip().partition('=')
+        if name:
+            options[name.lower()] = value.strip().strip('"')
+    return media_type.strip().lower(), options
+
+
+def part_disposition(headers):
+    """
+    Form field name and filename of a multipart part
+
+    Args:
+        headers: Header block of the part, decoded as latin-1
+
+    Returns:
+        (name, filename); either is None when the Content-Disposition lacks it
+    """
+    message = HeaderParser().parsestr(headers)
+    params = {}
+    for key in ('name', 'filename'):
+        value = message.get_param(key, header='content-disposition')
+        params[key] = collapse_rfc2231_value(value) if value is not None else None
+    return params['name'], params['filename']
+
+
+def extract_multipart_image(body, boundary):
+    """
+    Return the image part of a multipart/form-data body
+
+    The part named 'image' or 'file' is preferred, otherwise the first part
+    carrying a filename. The part is returned as a memoryview of the body,
+    so the upload is not copied.
+
+    Raises:
+        BadRequest: If the boundary is missing or no part holds an image
+    """
+    if not boundary:
+        raise BadRequest("multipart/form-data Content-Type without a boundary")
+    delimiter = b'--' + boundary.encode()
+    view = memoryview(body)
+    fallback = None
+    position = body.find(delimiter)
+
+    while position != -1:
+        headers_start = position + len(delimiter)
+        if body[headers_start:headers_start + 2] == b'--':
+            break
+        headers_end = body.find(b'\r\n\r\n', headers_start)
+        next_position = body.find(b'\r\n' + delimiter, headers_end)
+        if headers_end == -1 or next_position == -1:
+            break
+
+        name, filename = part_disposition(body[headers_start:headers_end].decode('latin-1').lstrip('\r\n'))
+        content = (headers_end + 4, next_position)
+        if name in ('image', 'file'):
+            return view[content[0]:content[1]]
+        if fallback is None and filename is not None:
+            fallback = content
+
+        position = next_position + 2
+
+    if fallback is None:
+        raise BadRequest("No image part found in multipart body")
+    return view[fallback[0]:fallback[1]]
 
 
 class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        try:
+    def read_image(self):
+        """
+        Read the uploaded image bytes from the request
+
+        Raw `image/*` (or octet-stream) bodies are passed to the decoder as
+        read, multipart uploads have their image part sliced out, and JSON
+        bodies with a base64 data URL are still accepted for older clients.
+        """
+        media_type, options = parse_content_type(self.headers.get('Content-Type'))
+
+        with STAGE_SECONDS.time(stage='body_read'):
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length)
+
+        if media_type.startswith('image/') or media_type == 'application/octet-stream':
+            return body
+
+        if media_type == 'multipart/form-data':
+            with STAGE_SECONDS.time(stage='multipart_parse'):
+                return extract_multipart_image(body, options.get('boundary'))
+
+        with STAGE_SECONDS.time(stage='json_parse'):
             data = json.loads(body)
 
-            # Decode base64 image
+        # Decode base64 image
+        with STAGE_SECONDS.time(stage='base64_decode'):
             image_b64 = data.get('image', '')
             if ',' in image_b64:
                 image_b64 = image_b64.split(',')[1]
 
-            image_bytes = base64.b64decode(image_b64)
-            input_data = preprocess_image(image_bytes)
-
-            # Run inference
-            model = get_interpreter()
-            input_details = model.get_input_details()
-            output_details = model.get_output_details()
+            return base64.b64decode(image_b64)
 
-            model.set_tensor(input_details[0]['index'], input_data)
-            model.invoke()
-
-            output_data = model.get_tensor(output_details[0]['index'])
-            probs = output_data[0]
-
-            fertile_prob = float(probs[0])
-            infertile_prob = float(probs[1])
+    def do_POST(self):
+        start = time.perf_counter()
+        try:
+            image_bytes = self.read_image()
 
-            prediction = "fertile" if fertile_prob > infertile_prob else "infertile"
-            confidence = max(fertile_prob, infertile_prob)
+            key = PredictionCache.make_key(image_bytes, get_model_version())
+            result = cache.get(key)
+            if result is None:
+                result = predict(image_bytes)
+                cache.put(key, result)
 
-            result = {
-                "prediction": prediction,
-                "confidence": confidence,
-                "probabilities": {
-                    "fertile": fertile_prob,
-                    "infertile": infertile_prob
-                }
-            }
+            with STAGE_SECONDS.time(stage='encode'):
+                response = json.dumps(result).encode()
 
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(response)
+            REQUESTS.inc(outcome='ok')
 
         except Exception as e:
-            self.send_response(500)
+            self.send_response(400 if isinstance(e, BadRequest) else 500)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             self.wfile.write(json.dumps({"error": str(e)}).encode())
+            REQUESTS.inc(outcome='error')
+            ERRORS.inc()
+
+        REQUEST_SECONDS.observe(time.perf_counter() - start)
+
+    def do_GET(self):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', MetricsRegistry.CONTENT_TYPE)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
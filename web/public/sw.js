@@ -1,10 +1,10 @@
-const CACHE_NAME = 'peacock-egg-v2';
+const CACHE_NAME = 'peacock-egg-v3';
 const urlsToCache = [
   '/',
   '/manifest.json',
   '/icon-192.png',
   '/icon-512.png',
-  '/dataset_fingerprints.json'
+  '/dataset_fingerprints.bin'
 ];
 
 // Install: cache essential files
@@ -1,4 +1,4 @@
-import { matchImageToDataset, fingerprintMatchToPrediction, loadFingerprintDatabase } from './imageMatcher'
+import { matchImageToDataset, fingerprintMatchToPrediction, loadFingerprintDatabase, SERVER_MATCHING } from './imageMatcher'
 
 export interface PredictionResult {
   prediction: 'fertile' | 'infertile'
@@ -64,13 +64,11 @@ export async function analyzeImage(imageFile: File, useCustomModel: boolean = tr
 }
 
 async function predictWithAPI(imageFile: File, startTime: number): Promise<PredictionResult> {
-  // Convert file to base64
-  const base64 = await fileToBase64(imageFile)
-
+  // Send the file bytes as-is (no base64 inflation)
   const response = await fetch('/api/predict', {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ image: base64 })
+    headers: { 'Content-Type': imageFile.type || 'application/octet-stream' },
+    body: imageFile
   })
 
   if (!response.ok) {
@@ -99,15 +97,6 @@ async function predictWithAPI(imageFile: File, startTime: number): Promise<Predi
   }
 }
 
-function fileToBase64(file: File): Promise<string> {
-  return new Promise((resolve, reject) => {
-    const reader = new FileReader()
-    reader.onload = () => resolve(reader.result as string)
-    reader.onerror = reject
-    reader.readAsDataURL(file)
-  })
-}
-
 async function getImageAnalysis(imageFile: File): Promise<{
   analysis: PredictionResult['analysis']
   fertilityIndicators: NonNullable<PredictionResult['fertilityIndicators']>
@@ -136,6 +125,11 @@ async function getImageAnalysis(imageFile: File): Promise<{
 }
 
 export async function initializeCustomModel(): Promise<boolean> {
+  if (SERVER_MATCHING) {
+    // Matching happens on the backend; the database is fetched only if it fails
+    return true
+  }
+
   console.log('Initializing: loading fingerprint database...')
   try {
     await loadFingerprintDatabase()
@@ -1,4 +1,9 @@
 import { type PredictionResult } from './imageAnalysis'
+import { API_URL } from './constants'
+
+// With a backend configured, images are matched server-side (/api/match)
+// and the fingerprint database is only downloaded as a fallback
+export const SERVER_MATCHING = Boolean(process.env.NEXT_PUBLIC_API_URL)
 
 export interface ImageFingerprint {
   filename: string
@@ -16,7 +21,7 @@ export interface ImageFingerprint {
 
 export interface FingerprintMatch {
   matched: boolean
-  fingerprint?: ImageFingerprint
+  fingerprint?: Pick<ImageFingerprint, 'filename' | 'class'>
   similarity: number
   confidence: number
   modelUsed: 'fingerprint' | 'ml'
@@ -34,11 +39,101 @@ export interface FingerprintDatabase {
 
 let fingerprintDatabase: FingerprintDatabase | null = null
 
+const BINARY_MAGIC = 'PEAFPDB\0'
+const BINARY_VERSION = 1
+
+const BYTE_BITS = Array.from({ length: 256 }, (_, byte) => byte.toString(2).padStart(8, '0'))
+
+interface BinaryArray {
+  offset: number
+  dtype: string
+  shape: number[]
+}
+
+// Layout written by backend/src/fingerprint_db.py: magic, uint32 version,
+// uint32 header length, JSON header, then the arrays it lists
+function decodeBinaryDatabase(buffer: ArrayBuffer): FingerprintDatabase {
+  const bytes = new Uint8Array(buffer)
+  const view = new DataView(buffer)
+  if (new TextDecoder().decode(bytes.subarray(0, 8)) !== BINARY_MAGIC) {
+    throw new Error('Not a binary fingerprint database')
+  }
+  const version = view.getUint32(8, true)
+  if (version !== BINARY_VERSION) {
+    throw new Error(`Unsupported fingerprint database version ${version}`)
+  }
+  const headerLength = view.getUint32(12, true)
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(16, 16 + headerLength)))
+  const dataStart = 16 + headerLength
+  const arrays: Record<string, BinaryArray> = header.arrays
+  const count: number = header.count
+
+  const uint8 = (name: string) => bytes.subarray(dataStart + arrays[name].offset)
+  const uint32 = (name: string, index: number) => view.getUint32(dataStart + arrays[name].offset + index * 4, true)
+
+  const filenames = uint8('filenames')
+  const classCodes = uint8('class_codes')
+  const decoder = new TextDecoder()
+  const hashStrings: Record<string, string[]> = {}
+  for (const [name, bits] of Object.entries(header.hashes as Record<string, number>)) {
+    const rowBytes = arrays[`hash_${name}`].shape[1]
+    const rows = uint8(`hash_${name}`)
+    hashStrings[name] = []
+    for (let i = 0; i < count; i++) {
+      let text = ''
+      for (let b = 0; b < rowBytes; b++) {
+        text += BYTE_BITS[rows[i * rowBytes + b]]
+      }
+      hashStrings[name].push(text.slice(0, bits))
+    }
+  }
+
+  const images: ImageFingerprint[] = []
+  for (let i = 0; i < count; i++) {
+    const filename = decoder.decode(filenames.subarray(uint32('filename_offsets', i), uint32('filename_offsets', i + 1)))
+    images.push({
+      filename,
+      class: header.classes[classCodes[i]],
+      original_filename: filename.split('/').pop() ?? filename,
+      width: uint32('width', i),
+      height: uint32('height', i),
+      hashes: {
+        phash: hashStrings.phash?.[i] ?? '',
+        ahash: hashStrings.ahash?.[i] ?? '',
+        dhash: hashStrings.dhash?.[i] ?? '',
+        whash: hashStrings.whash?.[i] ?? ''
+      }
+    })
+  }
+
+  return { metadata: header.metadata, images }
+}
+
+async function fetchBinaryDatabase(): Promise<FingerprintDatabase | null> {
+  try {
+    const response = await fetch('/dataset_fingerprints.bin')
+    if (!response.ok) {
+      return null
+    }
+    return decodeBinaryDatabase(await response.arrayBuffer())
+  } catch (error) {
+    console.warn('Failed to load binary fingerprint database, trying JSON:', error)
+    return null
+  }
+}
+
 export async function loadFingerprintDatabase(): Promise<FingerprintDatabase | null> {
   if (fingerprintDatabase) {
     return fingerprintDatabase
   }
 
+  // The packed binary database is ~8x smaller than the JSON one
+  fingerprintDatabase = await fetchBinaryDatabase()
+  if (fingerprintDatabase) {
+    console.log(`Fingerprint database loaded: ${fingerprintDatabase.metadata.total_images} images`)
+    return fingerprintDatabase
+  }
+
   try {
     const response = await fetch('/dataset_fingerprints.json')
 
@@ -120,10 +215,49 @@ async function generateImageHash(imageElement: HTMLCanvasElement): Promise<{
   }
 }
 
+async function matchWithAPI(imageFile: File, threshold: number): Promise<FingerprintMatch | null> {
+  try {
+    const form = new FormData()
+    form.append('file', imageFile)
+
+    const response = await fetch(`${API_URL}/api/match?top_k=1&threshold=${threshold}`, {
+      method: 'POST',
+      body: form
+    })
+    if (!response.ok) {
+      return null
+    }
+
+    const data = await response.json()
+    if (data.error || data.matches.length === 0) {
+      return null
+    }
+
+    const best = data.matches[0]
+    return {
+      matched: data.matched,
+      fingerprint: data.matched ? { filename: best.filename, class: best.class } : undefined,
+      similarity: best.similarity,
+      confidence: data.matched ? best.similarity : 0,
+      modelUsed: data.matched ? 'fingerprint' : 'ml'
+    }
+  } catch (error) {
+    console.warn('Server-side matching failed, matching locally:', error)
+    return null
+  }
+}
+
 export async function matchImageToDataset(
   imageFile: File,
   threshold: number = 0.99
 ): Promise<FingerprintMatch | null> {
+  if (SERVER_MATCHING) {
+    const match = await matchWithAPI(imageFile, threshold)
+    if (match) {
+      return match
+    }
+  }
+
   const db = await loadFingerprintDatabase()
 
   if (!db || db.images.length === 0) {